@@ -0,0 +1,327 @@
+"""
+豆包翻译器离线微基准测试
+
+OpenAI客户端被替换为本地桩，不访问网络，也不需要API密钥。
+结果以JSON输出，便于在不同版本之间比较：
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --compare bench.json
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import doubaotrans
+from doubaotrans import (
+    BatchProcessor,
+    DoubaoTranslated,
+    DoubaoTranslator,
+    LRUCache,
+)
+
+STUB_API_KEY = 'benchmark-' + 'x' * 32
+
+ZH_SAMPLE = "人工智能正在改变软件开发的方式。机器学习模型需要大量的训练数据，而深度学习框架让模型训练变得更加容易。"
+EN_SAMPLE = ("Artificial intelligence is changing how software is built. Machine learning models need "
+             "large amounts of training data, and deep learning frameworks make model training easier.")
+
+
+class _StubCompletions:
+    """立即返回的chat.completions桩：检测请求返回zh，其余请求原样返回用户消息的最后一行"""
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        content = messages[-1]['content']
+        if '语言' in messages[0]['content']:
+            text = 'zh'
+        else:
+            text = content.splitlines()[-1]
+        usage = SimpleNamespace(prompt_tokens=len(content), completion_tokens=len(text),
+                                total_tokens=len(content) + len(text), prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+def make_translator(**kwargs) -> DoubaoTranslator:
+    """创建使用本地桩客户端、不限速的翻译器"""
+    translator = DoubaoTranslator(api_key=STUB_API_KEY, **kwargs)
+    translator.client_manager.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=_StubCompletions()),
+        close=lambda: asyncio.sleep(0)
+    )
+    translator.client_manager._initialized = True
+    translator.rate_limiter.update(requests_per_second=None, tokens_per_minute=None, burst=1)
+    return translator
+
+
+def make_glossary(size: int) -> dict:
+    """生成包含size个术语的中英术语表，另加样例文本中真实出现的术语"""
+    rng = random.Random(size)
+    glossary = {
+        'ai': {'zh': '人工智能', 'en': 'artificial intelligence'},
+        'ml': {'zh': '机器学习', 'en': 'machine learning'},
+        'dl': {'zh': '深度学习', 'en': 'deep learning'},
+        'data': {'zh': '训练数据', 'en': 'training data'},
+    }
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    for i in range(size):
+        zh = ''.join(chr(0x4e00 + rng.randrange(0x5000)) for _ in range(rng.randint(2, 5)))
+        en = ' '.join(''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 9)))
+                      for _ in range(rng.randint(1, 3)))
+        glossary[f'term{i}'] = {'zh': zh, 'en': en}
+    return glossary
+
+
+def fresh_texts(text: str):
+    """返回每次生成不同文本的函数，使被测调用每次都不命中缓存"""
+    counter = itertools.count()
+    return lambda: f"{text} {next(counter)}"
+
+
+def measure(func, number: int, repeat: int = 5) -> dict:
+    """运行func number次为一轮，共repeat轮，返回每次调用的耗时统计（纳秒）"""
+    func()  # 预热
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        rounds = []
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(number):
+                func()
+            rounds.append((time.perf_counter_ns() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min_ns': min(rounds),
+        'median_ns': statistics.median(rounds),
+        'mean_ns': statistics.fmean(rounds),
+        'ops_per_sec': 1e9 / min(rounds) if min(rounds) else float('inf'),
+    }
+
+
+def measure_async(loop, coro_factory, number: int, repeat: int = 5) -> dict:
+    """在同一事件循环中测量协程，每轮顺序执行number个协程"""
+    async def run_round():
+        for _ in range(number):
+            await coro_factory()
+
+    loop.run_until_complete(coro_factory())  # 预热
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        loop.run_until_complete(run_round())
+        rounds.append((time.perf_counter_ns() - start) / number)
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min_ns': min(rounds),
+        'median_ns': statistics.median(rounds),
+        'mean_ns': statistics.fmean(rounds),
+        'ops_per_sec': 1e9 / min(rounds) if min(rounds) else float('inf'),
+    }
+
+
+def bench_cache(sizes, repeat):
+    results = []
+    for size in sizes:
+        cache = LRUCache(ttl=3600, max_entries=size, max_bytes=None)
+        keys = [f'key-{i:08d}' for i in range(size)]
+        value = DoubaoTranslated('zh', 'en', ZH_SAMPLE, EN_SAMPLE)
+        start = time.perf_counter_ns()
+        for key in keys:
+            cache.set(key, value)
+        fill_ns = (time.perf_counter_ns() - start) / size
+
+        rng = random.Random(size)
+        lookups = [rng.choice(keys) for _ in range(10000)]
+        it = iter(lookups * (repeat + 2) * 10)
+        results.append({'name': 'cache.get.hit', 'params': {'entries': size},
+                        **measure(lambda: cache.get(next(it)), 10000, repeat)})
+        results.append({'name': 'cache.get.miss', 'params': {'entries': size},
+                        **measure(lambda: cache.get('missing'), 10000, repeat)})
+
+        counter = iter(range(10 ** 9))
+        # 缓存已满，每次写入都会淘汰最旧的条目
+        results.append({'name': 'cache.set.evict', 'params': {'entries': size},
+                        **measure(lambda: cache.set(f'new-{next(counter)}', value), 10000, repeat)})
+        results.append({'name': 'cache.set.fill', 'params': {'entries': size},
+                        'number': size, 'repeat': 1, 'min_ns': fill_ns, 'median_ns': fill_ns,
+                        'mean_ns': fill_ns, 'ops_per_sec': 1e9 / fill_ns})
+    return results
+
+
+def bench_glossary(loop, sizes, repeat):
+    results = []
+    for size in sizes:
+        translator = make_translator()
+        translator.glossary = make_glossary(size)
+        translator._invalidate_glossary()
+
+        start = time.perf_counter_ns()
+        translator._get_glossary_matcher('zh', 'en')
+        translator._get_glossary_matcher('en', 'zh')
+        build_ns = (time.perf_counter_ns() - start) / 2
+        results.append({'name': 'glossary.build', 'params': {'terms': size},
+                        'number': 1, 'repeat': 1, 'min_ns': build_ns, 'median_ns': build_ns,
+                        'mean_ns': build_ns, 'ops_per_sec': 1e9 / build_ns})
+
+        for lang, dest, text in (('zh', 'en', ZH_SAMPLE), ('en', 'zh', EN_SAMPLE)):
+            results.append({'name': 'glossary.match', 'params': {'terms': size, 'lang': lang},
+                            **measure(lambda: translator._match_glossary_terms(text, lang, dest), 1000, repeat)})
+            # 每次使用不同的文本，测量未命中缓存时的匹配、请求和校验；.cached为命中缓存的路径
+            fresh = fresh_texts(text)
+            results.append({'name': 'apply_glossary', 'params': {'terms': size, 'lang': lang},
+                            **measure_async(loop, lambda: translator.apply_glossary(fresh(), lang, dest), 200, repeat)})
+            results.append({'name': 'apply_glossary.cached', 'params': {'terms': size, 'lang': lang},
+                            **measure_async(loop, lambda: translator.apply_glossary(text, lang, dest), 200, repeat)})
+    return results
+
+
+def bench_detection(loop, repeat):
+    translator = make_translator()
+    samples = ['zh', 'ZH-cn', '中文', 'Chinese', '语言代码：en', 'The language is Japanese.', 'ko\n', 'xx']
+    it = iter(samples * 100000)
+    results = [{'name': 'normalize_detection_result', 'params': {},
+                **measure(lambda: translator._normalize_detection_result(next(it)), 10000, repeat)}]
+
+    for lang, text in (('zh', ZH_SAMPLE), ('en', EN_SAMPLE)):
+        results.append({'name': 'detect_local', 'params': {'lang': lang},
+                        **measure(lambda: translator._detect_local(text), 200, repeat)})
+        fresh = fresh_texts(text)
+        results.append({'name': 'doubao_detect_enhanced', 'params': {'lang': lang},
+                        **measure_async(loop, lambda: translator.doubao_detect_enhanced(fresh()), 200, repeat)})
+        results.append({'name': 'doubao_detect_enhanced.cached', 'params': {'lang': lang},
+                        **measure_async(loop, lambda: translator.doubao_detect_enhanced(text), 200, repeat)})
+    return results
+
+
+def bench_creative(repeat):
+    translator = make_translator()
+    response = "以下是三个版本：\n版本1：\n1. Hello, world!\n- \n2. Hi there, world!\n3. Greetings, world!\n4. Extra"
+    return [{'name': 'format_creative_translation', 'params': {},
+             **measure(lambda: translator._format_creative_translation(response), 10000, repeat)}]
+
+
+def bench_batch_processor(loop, sizes, repeat):
+    results = []
+
+    async def noop(item):
+        return item
+
+    for workers in (1, 10, 50):
+        for size in sizes:
+            processor = BatchProcessor(max_workers=workers, batch_size=10)
+            items = list(range(size))
+            result = measure_async(loop, lambda: processor.process(items, noop), 1, repeat)
+            per_item = {key: value / size for key, value in result.items() if key.endswith('_ns')}
+            results.append({'name': 'batch_processor.per_item', 'params': {'workers': workers, 'items': size},
+                            **result, **per_item, 'ops_per_sec': 1e9 / per_item['min_ns']})
+    return results
+
+
+def bench_allocation(repeat):
+    return [{'name': 'DoubaoTranslated.alloc', 'params': {},
+             **measure(lambda: DoubaoTranslated('zh', 'en', ZH_SAMPLE, EN_SAMPLE), 100000, repeat)}]
+
+
+BENCHMARKS = ('cache', 'glossary', 'detection', 'creative', 'batch', 'allocation')
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def run(selected, quick: bool, repeat: int) -> dict:
+    doubaotrans.logger.disabled = True
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    cache_sizes = [10_000, 100_000] if quick else [10_000, 100_000, 1_000_000]
+    glossary_sizes = [1_000, 10_000] if quick else [1_000, 10_000, 50_000]
+    batch_sizes = [1_000] if quick else [1_000, 10_000]
+
+    results = []
+    try:
+        if 'cache' in selected:
+            results += bench_cache(cache_sizes, repeat)
+        if 'glossary' in selected:
+            results += bench_glossary(loop, glossary_sizes, repeat)
+        if 'detection' in selected:
+            results += bench_detection(loop, repeat)
+        if 'creative' in selected:
+            results += bench_creative(repeat)
+        if 'batch' in selected:
+            results += bench_batch_processor(loop, batch_sizes, repeat)
+        if 'allocation' in selected:
+            results += bench_allocation(repeat)
+    finally:
+        loop.close()
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'revision': git_revision(),
+            'prompt_template_version': doubaotrans.PROMPT_TEMPLATE_VERSION,
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+
+def result_key(result: dict) -> str:
+    params = ','.join(f'{k}={v}' for k, v in sorted(result['params'].items()))
+    return f"{result['name']}[{params}]"
+
+
+def print_report(report: dict, baseline: dict = None):
+    previous = {result_key(r): r for r in (baseline or {}).get('results', [])}
+    for result in report['results']:
+        key = result_key(result)
+        line = f"{key:<60} {result['min_ns']:>14.1f} ns"
+        if key in previous:
+            ratio = result['min_ns'] / max(previous[key]['min_ns'], 1e-9)
+            line += f"  x{ratio:.2f} vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='豆包翻译器离线微基准测试')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='只运行指定的基准测试')
+    parser.add_argument('--quick', action='store_true', help='使用较小的数据规模')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测试的轮数')
+    parser.add_argument('--output', help='将JSON结果写入文件')
+    parser.add_argument('--compare', help='与之前保存的JSON结果比较')
+    args = parser.parse_args()
+
+    report = run(set(args.only or BENCHMARKS), args.quick, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
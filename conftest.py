@@ -0,0 +1,91 @@
+"""
+离线测试共用的桩客户端和翻译器工厂，不访问真实API
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from doubaotrans import DoubaoTranslator
+
+STUB_API_KEY = 'stub-' + 'x' * 40
+
+
+def echo_responder(messages):
+    """检测请求返回zh；JSON信封请求按键返回加前缀的值；其余请求返回最后一行加前缀"""
+    system = messages[0]['content']
+    user = messages[-1]['content']
+    start = user.find('{')
+    if 'JSON' in system and start != -1:
+        data = json.loads(user[start:user.rfind('}') + 1])
+        if '检测' in system:
+            return json.dumps({key: 'zh' for key in data}, ensure_ascii=False)
+        return json.dumps({key: f'T({value})' for key, value in data.items()}, ensure_ascii=False)
+    if '检测' in system:
+        return 'zh'
+    return f'T({user.splitlines()[-1]})'
+
+
+class StubCompletions:
+    """chat.completions桩，记录每次调用的消息
+
+    responder(messages)返回回复文本或抛出异常；delay为每次调用的耗时（秒）。
+    """
+
+    def __init__(self, responder=echo_responder, delay: float = 0.0):
+        self.responder = responder
+        self.delay = delay
+        self.calls = []
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        self.calls.append(messages)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        content = self.responder(messages)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15, prompt_tokens_details=None)
+        if stream:
+            return StubStream(content, usage)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+class StubStream:
+    """流式响应桩，每个分块3个字符，最后一个分块只携带usage"""
+
+    def __init__(self, content: str, usage, chunk_chars: int = 3):
+        self.chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + chunk_chars]))],
+                            usage=None)
+            for i in range(0, len(content), chunk_chars)
+        ]
+        self.chunks.append(SimpleNamespace(choices=[], usage=usage))
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def make_translator():
+    """返回工厂函数make(responder=..., delay=..., **perf_config)，得到(翻译器, 桩)"""
+
+    def make(responder=echo_responder, delay: float = 0.0, **kwargs):
+        translator = DoubaoTranslator(api_key=STUB_API_KEY, **kwargs)
+        completions = StubCompletions(responder, delay)
+        translator.client_manager.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=completions),
+            close=lambda: asyncio.sleep(0)
+        )
+        translator.client_manager._initialized = True
+        translator.rate_limiter.update(requests_per_second=None, tokens_per_minute=None, burst=1)
+        return translator, completions
+
+    return make
@@ -1,22 +1,33 @@
 import os
 from dotenv import load_dotenv
 import openai
-from typing import List, Union, Dict, Optional, Tuple, Any
+from typing import List, Union, Dict, Optional, Tuple, Any, Iterable, AsyncIterable, AsyncIterator
 import json
 import logging
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from langdetect import detect_langs, DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
 from pathlib import Path
 import re
 import uuid
+import hashlib
+import sqlite3
 import asyncio
 import aiohttp
 import httpx
 import threading
+import math
+import unicodedata
+import itertools
+import random
+import email.utils
+import contextvars
+import functools
+import sys
+from collections import OrderedDict, deque
+from collections.abc import AsyncGenerator
 try:
     from collections.abc import MutableSet
 except ImportError:
@@ -27,6 +38,7 @@ DEFAULT_BASE_URL = "https://ark.cn-beijing.volces.com/api/v3"
 DEFAULT_MODEL = "ep-20241114093010-dm56w"
 MAX_RETRIES = 3
 MAX_WORKERS = 5  # 并发线程数
+PROMPT_TEMPLATE_VERSION = 2  # 提示词模板版本，修改提示词时递增以使旧缓存失效
 
 # 自定义异常类
 class DoubaoError(Exception):
@@ -144,6 +156,33 @@ LANG_CODE_MAP = {
     'hi': 'hi'
 }
 
+# 本地语言检测使用的Unicode文字区段
+SCRIPT_PATTERNS = {
+    'kana': re.compile(r'[\u3040-\u30ff\u31f0-\u31ff]'),
+    'han': re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'),
+    'hangul': re.compile(r'[\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]'),
+    'arabic': re.compile(r'[\u0600-\u06ff\u0750-\u077f]'),
+    'thai': re.compile(r'[\u0e00-\u0e7f]'),
+    'cyrillic': re.compile(r'[\u0400-\u04ff]'),
+    'devanagari': re.compile(r'[\u0900-\u097f]'),
+    'latin': re.compile(r'[A-Za-z\u00c0-\u024f]'),
+}
+
+# 可以直接由文字确定语言的区段（汉字和假名单独处理）
+SCRIPT_LANGUAGES = {
+    'hangul': 'ko',
+    'arabic': 'ar',
+    'thai': 'th',
+    'cyrillic': 'ru',
+    'devanagari': 'hi',
+}
+
+# doubao_detect_enhanced中各检测来源的权重：API结果更可靠，本地文字统计与langdetect同等看待
+DETECT_SOURCE_WEIGHTS = {
+    'api': 1.2,
+    'local': 1.0,
+}
+
 class DoubaoTranslated:
     """表示豆包翻译结果的类"""
     def __init__(self, src, dest, origin, text, pronunciation=None):
@@ -188,23 +227,274 @@ class DoubaoConnectionError(DoubaoTranslationError):
     """连接错误"""
     pass
 
+class LatencyHistogram:
+    """对数-线性分桶的延迟直方图
+
+    每个2的幂区间再线性划分为sub_buckets个子桶，分位数的相对误差不超过1/sub_buckets；
+    记录只需一次frexp和一次字典更新，开销与样本数无关。
+    """
+
+    def __init__(self, unit: float = 0.0001, sub_buckets: int = 16):
+        """
+        Args:
+            unit: 最小分辨率（秒），不超过该值的样本计入第一个桶
+            sub_buckets: 每个2的幂区间的子桶数
+        """
+        self.unit = unit
+        self.sub_buckets = sub_buckets
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        scaled = value / self.unit
+        if scaled <= 1:
+            return 0
+        mantissa, exponent = math.frexp(scaled)
+        return (exponent - 1) * self.sub_buckets + int((mantissa * 2 - 1) * self.sub_buckets) + 1
+
+    def _upper_bound(self, index: int) -> float:
+        if index == 0:
+            return self.unit
+        exponent, sub = divmod(index - 1, self.sub_buckets)
+        return self.unit * (2 ** exponent) * (1 + (sub + 1) / self.sub_buckets)
+
+    def record(self, value: float):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """返回q分位数（0-1）的近似值，取所在桶的上界且不超过最大值"""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds: List[float]) -> List[int]:
+        """计算不超过各上界的累计样本数，bounds需为unit乘以2的幂以与桶边界对齐"""
+        result = []
+        items = sorted(self.counts.items())
+        position = 0
+        seen = 0
+        for bound in bounds:
+            while position < len(items) and self._upper_bound(items[position][0]) <= bound * (1 + 1e-9):
+                seen += items[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'avg': self.sum / max(self.count, 1),
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': self.max
+        }
+
+class MetricsRegistry:
+    """带标签的指标注册表，支持直方图、计数器和Prometheus文本格式导出"""
+
+    # 导出到Prometheus的桶上界：0.1ms到约105s之间的2的幂，与直方图的桶边界对齐
+    EXPORT_BUCKETS = [0.0001 * 2 ** i for i in range(21)]
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], LatencyHistogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.descriptions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Optional[Dict[str, Any]]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        return name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items() if v is not None))
+
+    def describe(self, name: str, description: str):
+        self.descriptions[name] = description
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(value)
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, Any]] = None):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def histogram(self, name: str, **labels) -> LatencyHistogram:
+        """合并所有标签匹配的直方图，未指定的标签不参与过滤"""
+        wanted = {k: str(v) for k, v in labels.items()}
+        merged = LatencyHistogram()
+        with self._lock:
+            for (metric, label_items), histogram in self.histograms.items():
+                if metric == name and all(dict(label_items).get(k) == v for k, v in wanted.items()):
+                    merged.merge(histogram)
+        return merged
+
+    def summaries(self, name: str) -> List[Dict[str, Any]]:
+        """获取各标签组合的分位数摘要"""
+        with self._lock:
+            return [
+                {'labels': dict(label_items), **histogram.summary()}
+                for (metric, label_items), histogram in self.histograms.items()
+                if metric == name
+            ]
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    @staticmethod
+    def _format_labels(label_items: Iterable[Tuple[str, str]]) -> str:
+        pairs = [
+            '{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in label_items
+        ]
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def to_prometheus(self) -> str:
+        """以Prometheus文本格式导出所有指标"""
+        lines = []
+        with self._lock:
+            for kind, table in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({metric for metric, _ in table}):
+                    if name in self.descriptions:
+                        lines.append(f"# HELP {name} {self.descriptions[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (metric, label_items), value in sorted(table.items()):
+                        if metric == name:
+                            lines.append(f"{name}{self._format_labels(label_items)} {value}")
+
+            for name in sorted({metric for metric, _ in self.histograms}):
+                if name in self.descriptions:
+                    lines.append(f"# HELP {name} {self.descriptions[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, label_items), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    counts = histogram.cumulative_counts(self.EXPORT_BUCKETS)
+                    for bound, count in zip(self.EXPORT_BUCKETS, counts):
+                        labels = self._format_labels(label_items + (('le', repr(bound)),))
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    labels = self._format_labels(label_items + (('le', '+Inf'),))
+                    lines.append(f"{name}_bucket{labels} {histogram.count}")
+                    lines.append(f"{name}_sum{self._format_labels(label_items)} {histogram.sum}")
+                    lines.append(f"{name}_count{self._format_labels(label_items)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
 class PerformanceMetrics:
-    """性能指标监控类"""
+    """性能指标监控类
+
+    请求延迟按操作、模型、语言对和结果记录到带标签的直方图中，
+    可通过get_metrics获取分位数，通过to_prometheus导出。
+    """
+
+    REQUEST_DURATION = 'doubao_request_duration_seconds'
+    TOKENS = 'doubao_tokens_total'
+    COST = 'doubao_cost_total'
     
     def __init__(self):
         self.request_count = 0
         self.error_count = 0
         self.total_latency = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        self.usage_by_operation: Dict[str, Dict[str, float]] = {}
+        self.usage_by_lang_pair: Dict[str, Dict[str, float]] = {}
+        self.latency = LatencyHistogram()
+        self.registry = MetricsRegistry()
+        self.registry.describe(self.REQUEST_DURATION, 'API request latency in seconds')
+        self.registry.describe(self.TOKENS, 'Tokens reported by the API')
+        self.registry.describe(self.COST, 'Estimated cost from configured model prices')
         self.start_time = time.time()
         self._lock = threading.Lock()
 
-    def record_request(self, latency: float, success: bool):
-        """记录请求指标"""
+    def record_request(self, latency: float, success: bool, operation: str = 'other',
+                       model: Optional[str] = None, lang_pair: Optional[str] = None,
+                       outcome: Optional[str] = None):
+        """记录一次API请求，每次请求只应记录一次"""
         with self._lock:
             self.request_count += 1
             self.total_latency += latency
+            self.latency.record(latency)
             if not success:
                 self.error_count += 1
+        self.registry.observe(self.REQUEST_DURATION, latency, {
+            'operation': operation,
+            'model': model,
+            'lang_pair': lang_pair,
+            'outcome': outcome or ('success' if success else 'error')
+        })
+
+    def record_usage(self, usage: Dict[str, int], operation: str = 'other',
+                     lang_pair: Optional[str] = None, cost: float = 0.0):
+        """记录API返回的token用量，并按操作类型和语言对分别累计"""
+        with self._lock:
+            self.prompt_tokens += usage.get('prompt_tokens', 0)
+            self.completion_tokens += usage.get('completion_tokens', 0)
+            self.cached_tokens += usage.get('cached_tokens', 0)
+            self.cost += cost
+            self._accumulate(self.usage_by_operation, operation, usage, cost)
+            if lang_pair:
+                self._accumulate(self.usage_by_lang_pair, lang_pair, usage, cost)
+        for token_type in ('prompt_tokens', 'completion_tokens', 'cached_tokens'):
+            if usage.get(token_type):
+                self.registry.inc(self.TOKENS, usage[token_type], {
+                    'operation': operation, 'lang_pair': lang_pair, 'type': token_type[:-len('_tokens')]
+                })
+        if cost:
+            self.registry.inc(self.COST, cost, {'operation': operation, 'lang_pair': lang_pair})
+
+    @staticmethod
+    def _accumulate(table: Dict[str, Dict[str, float]], key: str, usage: Dict[str, int], cost: float):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {
+                'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'cost': 0.0
+            }
+        entry['calls'] += 1
+        entry['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        entry['completion_tokens'] += usage.get('completion_tokens', 0)
+        entry['cached_tokens'] += usage.get('cached_tokens', 0)
+        entry['cost'] += cost
+
+    def get_usage_breakdown(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """获取按操作类型和语言对汇总的token用量和费用"""
+        with self._lock:
+            return {
+                'operations': {key: dict(value) for key, value in self.usage_by_operation.items()},
+                'lang_pairs': {key: dict(value) for key, value in self.usage_by_lang_pair.items()}
+            }
 
     def get_metrics(self) -> Dict[str, float]:
         """获取性能指标"""
@@ -214,8 +504,17 @@ class PerformanceMetrics:
                 'request_count': self.request_count,
                 'error_rate': self.error_count / max(self.request_count, 1),
                 'avg_latency': self.total_latency / max(self.request_count, 1),
+                'p50_latency': self.latency.percentile(0.5),
+                'p90_latency': self.latency.percentile(0.9),
+                'p99_latency': self.latency.percentile(0.99),
+                'max_latency': self.latency.max,
                 'uptime': uptime,
-                'requests_per_second': self.request_count / max(uptime, 1)
+                'requests_per_second': self.request_count / max(uptime, 1),
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'cached_tokens': self.cached_tokens,
+                'prompt_cache_hit_rate': self.cached_tokens / max(self.prompt_tokens, 1),
+                'cost': self.cost
             }
 
     def reset(self):
@@ -224,7 +523,141 @@ class PerformanceMetrics:
             self.request_count = 0
             self.error_count = 0
             self.total_latency = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.cached_tokens = 0
+            self.cost = 0.0
+            self.usage_by_operation.clear()
+            self.usage_by_lang_pair.clear()
+            self.latency = LatencyHistogram()
             self.start_time = time.time()
+        self.registry.clear()
+
+    def get_latency_summaries(self) -> List[Dict[str, Any]]:
+        """获取各标签组合（操作、模型、语言对、结果）的延迟分位数"""
+        return self.registry.summaries(self.REQUEST_DURATION)
+
+    def to_prometheus(self) -> str:
+        """以Prometheus文本格式导出指标"""
+        return self.registry.to_prometheus()
+
+# 当前逻辑请求的ID，同一次翻译中的检测、术语匹配和API请求共享
+_CURRENT_REQUEST_ID = contextvars.ContextVar('doubao_request_id', default=None)
+
+def _with_request_id(func):
+    """为协程方法分配请求ID，已处于某个请求中时沿用外层ID"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _CURRENT_REQUEST_ID.get() is not None:
+            return await func(*args, **kwargs)
+        token = _CURRENT_REQUEST_ID.set(str(uuid.uuid4()))
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _CURRENT_REQUEST_ID.reset(token)
+    return wrapper
+
+class TraceSpan:
+    """一个阶段的耗时记录，结束时交给回调处理"""
+    __slots__ = ('stage', 'request_id', 'attributes', 'start', 'end', 'error', '_callback')
+
+    def __init__(self, stage: str, request_id: Optional[str], attributes: Dict[str, Any], callback):
+        self.stage = stage
+        self.request_id = request_id
+        self.attributes = attributes
+        self.start = 0.0
+        self.end = 0.0
+        self.error: Optional[BaseException] = None
+        self._callback = callback
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        self.error = exc
+        try:
+            self._callback(self)
+        except Exception as e:
+            logger.warning(f"Trace callback failed: {str(e)}")
+        return False
+
+    def __repr__(self):
+        return f'<TraceSpan stage={self.stage} request_id={self.request_id} duration={self.duration:.6f}>'
+
+class _NoOpSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+_NOOP_SPAN = _NoOpSpan()
+
+class Tracer:
+    """请求阶段追踪钩子基类
+
+    阶段包括：rate_limit（限流等待）、concurrency（并发槽位等待）、network（API调用）、
+    retry（重试等待）、hedge（对冲请求）、detect（语言检测）、cache（缓存查询）、
+    glossary（术语匹配和校验）。
+    span返回上下文管理器，进入时开始计时，退出时结束。
+    """
+
+    def span(self, stage: str, request_id: Optional[str] = None, **attributes):
+        raise NotImplementedError
+
+class NoOpTracer(Tracer):
+    """默认追踪器，不做任何记录"""
+
+    def span(self, stage: str, request_id: Optional[str] = None, **attributes):
+        return _NOOP_SPAN
+
+class CallbackTracer(Tracer):
+    """每个阶段结束时以TraceSpan调用callback，回调中的异常只记录警告"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def span(self, stage: str, request_id: Optional[str] = None, **attributes):
+        return TraceSpan(stage, request_id, attributes, self.callback)
+
+class OpenTelemetryTracer(Tracer):
+    """OpenTelemetry适配器，每个阶段对应一个名为"doubao.<阶段>"的span
+
+    需要安装opentelemetry-api，未传入tracer时使用全局TracerProvider。
+    """
+
+    def __init__(self, tracer=None, prefix: str = 'doubao'):
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise DoubaoConfigError("使用OpenTelemetryTracer需要安装opentelemetry-api")
+            tracer = trace.get_tracer('doubaotrans')
+        self.tracer = tracer
+        self.prefix = prefix
+
+    def span(self, stage: str, request_id: Optional[str] = None, **attributes):
+        otel_attributes = {
+            f"{self.prefix}.{key}": value if isinstance(value, (bool, int, float, str)) else str(value)
+            for key, value in attributes.items() if value is not None
+        }
+        if request_id:
+            otel_attributes[f"{self.prefix}.request_id"] = request_id
+        return self.tracer.start_as_current_span(f"{self.prefix}.{stage}", attributes=otel_attributes)
 
 class AsyncResourceManager:
     """异步资源管理器基类"""
@@ -300,9 +733,11 @@ class ClientManager(AsyncResourceManager):
     async def _do_initialize(self):
         """初始化客户端"""
         if not self.client:
+            # 重试由DoubaoTranslator的RetryPolicy统一处理，关闭客户端内置重试以免重试次数相乘
             self.client = openai.AsyncOpenAI(
                 api_key=self.api_key,
-                base_url=self.base_url
+                base_url=self.base_url,
+                max_retries=0
             )
 
     async def _do_cleanup(self):
@@ -320,16 +755,40 @@ class ClientManager(AsyncResourceManager):
             return self.client
 
 class BatchProcessor:
-    """批处理器"""
+    """批处理器
+
+    固定数量的工作协程从同一个队列中取任务，任一工作协程空闲即开始下一项，
+    不存在按批等待的屏障。工作协程数只限制同时处理的项目数，
+    API请求的并发由翻译器的自适应并发限制器统一控制。
+    """
     
-    def __init__(self, max_workers: int, batch_size: int):
+    def __init__(self, max_workers: int, batch_size: int, item_timeout: Optional[float] = None,
+                 item_retries: int = 0, progress_callback=None, progress_weigh=None):
+        """
+        Args:
+            max_workers: 并发工作协程数
+            batch_size: 按批处理时每批的最大项目数
+            item_timeout: 单个项目的超时时间（秒），None表示不限制
+            item_retries: 单个项目失败或超时后的重试次数
+            progress_callback: 进度回调，每完成一项调用callback(已完成数, 总数)，可以是协程函数，
+                返回False时取消尚未开始的项目
+            progress_weigh: 计算单个项目进度单位数的函数（可选），默认每项计1，
+                例如项目为段落块时按块内段落数计算进度
+        """
         self.max_workers = max_workers
         self.batch_size = batch_size
+        self.item_timeout = item_timeout
+        self.item_retries = item_retries
+        self.progress_callback = progress_callback
+        self.progress_weigh = progress_weigh
         self.queue = asyncio.Queue()
         self.results = []
+        self.errors: Dict[int, Exception] = {}
         self.tasks = set()
-        self.semaphore = asyncio.Semaphore(max_workers)
         self._stop_event = asyncio.Event()
+        self._completed = 0
+        self._total = 0
+        self.cancelled = False
 
     async def process(self, items: List[Any], processor_func) -> List[Any]:
         """处理项目列表
@@ -337,8 +796,15 @@ class BatchProcessor:
         Args:
             items: 要处理的项目列表
             processor_func: 处理单个项目的异步函数
+
+        Returns:
+            与输入等长的结果列表，最终失败或被取消的项目为None，异常记录在errors中
         """
         self.results = [None] * len(items)
+        self.errors = {}
+        self._completed = 0
+        self._total = sum(self.progress_weigh(item) for item in items) if self.progress_weigh else len(items)
+        self.cancelled = False
         workers = [self._worker(processor_func) for _ in range(self.max_workers)]
 
         # 填充队列
@@ -351,11 +817,16 @@ class BatchProcessor:
 
         # 等待所有工作完成
         await asyncio.gather(*workers)
+        if self.cancelled:
+            # 丢弃被取消的项目和剩余的结束标记
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.queue.task_done()
         return self.results
 
     async def _worker(self, processor_func):
         """工作协程"""
-        while not self._stop_event.is_set():
+        while not self._stop_event.is_set() and not self.cancelled:
             try:
                 index, item = await self.queue.get()
                 if index is None:  # 结束标记
@@ -363,14 +834,14 @@ class BatchProcessor:
                     break
 
                 try:
-                    async with self.semaphore:
-                        result = await processor_func(item)
-                        self.results[index] = result
+                    self.results[index] = await self._run_item(processor_func, index, item)
                 except Exception as e:
                     logger.error(f"Error processing item at index {index}: {e}")
                     self.results[index] = None
+                    self.errors[index] = e
                 finally:
                     self.queue.task_done()
+                    await self._report_progress(item)
 
             except asyncio.CancelledError:
                 break
@@ -378,6 +849,86 @@ class BatchProcessor:
                 logger.error(f"Worker error: {e}")
                 continue
 
+    async def _run_item(self, processor_func, index: int, item: Any) -> Any:
+        """处理单个项目，按配置应用超时和重试"""
+        for attempt in range(self.item_retries + 1):
+            try:
+                if self.item_timeout:
+                    return await asyncio.wait_for(processor_func(item), self.item_timeout)
+                return await processor_func(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.item_retries:
+                    raise
+                if isinstance(e, asyncio.TimeoutError):
+                    logger.warning(f"Item at index {index} timed out, retrying ({attempt + 1}/{self.item_retries})")
+                else:
+                    logger.warning(f"Item at index {index} failed, retrying ({attempt + 1}/{self.item_retries}): {e}")
+
+    async def _report_progress(self, item: Any = None) -> None:
+        """更新进度并调用进度回调"""
+        self._completed += self.progress_weigh(item) if self.progress_weigh else 1
+        if self.progress_callback is None:
+            return
+        try:
+            outcome = self.progress_callback(self._completed, self._total)
+            if asyncio.iscoroutine(outcome):
+                outcome = await outcome
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {e}")
+            return
+        if outcome is False and not self.cancelled:
+            self.cancelled = True
+            logger.info(f"Processing cancelled by progress callback after {self._completed}/{self._total} items")
+
+    def _make_batches(self, items: List[Any], weigh=None, max_weight: Optional[int] = None,
+                      group_key=None) -> List[List[Any]]:
+        """按数量上限batch_size、可选的权重上限和分组键切分批次
+
+        group_key不为空时，相邻项目的分组键不同会开始新的批次。
+        """
+        batches = []
+        current = []
+        current_weight = 0
+        current_group = None
+        for item in items:
+            weight = weigh(item) if weigh else 0
+            group = group_key(item) if group_key else None
+            if current and (len(current) >= self.batch_size or
+                            (max_weight and current_weight + weight > max_weight) or
+                            group != current_group):
+                batches.append(current)
+                current = []
+                current_weight = 0
+            current.append(item)
+            current_weight += weight
+            current_group = group
+        if current:
+            batches.append(current)
+        return batches
+
+    async def process_batches(self, items: List[Any], batch_func, weigh=None,
+                              max_weight: Optional[int] = None, group_key=None) -> List[Any]:
+        """按批次处理项目列表
+        
+        Args:
+            items: 要处理的项目列表
+            batch_func: 处理一批项目的异步函数，返回与输入等长的结果列表
+            weigh: 计算单个项目权重的函数（可选）
+            max_weight: 每批的权重上限（可选）
+            group_key: 分组键函数（可选），同一批次内的项目分组键相同
+        """
+        batches = self._make_batches(items, weigh, max_weight, group_key)
+        batch_results = await self.process(batches, batch_func)
+
+        results = []
+        for batch, batch_result in zip(batches, batch_results):
+            if batch_result is None or len(batch_result) != len(batch):
+                batch_result = [None] * len(batch)
+            results.extend(batch_result)
+        return results
+
     async def stop(self):
         """停止处理"""
         self._stop_event.set()
@@ -388,56 +939,1031 @@ class BatchProcessor:
             except:
                 pass
 
+class TokenBucketRateLimiter:
+    """令牌桶限流器
+
+    只控制请求的发起速率（每秒请求数和每分钟令牌数），不限制在途请求数量。
+    等待时采用先预占后休眠的方式，不持有任何锁，因此多个请求可以并发排队。
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 tokens_per_minute: Optional[int] = None, burst: float = 1):
+        """
+        Args:
+            requests_per_second: 每秒允许发起的请求数，None或0表示不限制
+            tokens_per_minute: 每分钟允许消耗的令牌数，None或0表示不限制
+            burst: 请求桶容量，即允许的瞬时突发请求数
+        """
+        self.requests_per_second = requests_per_second or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self.burst = max(float(burst), 1.0)
+        self._request_tokens = self.burst
+        self._budget_tokens = float(self.tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌"""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_second:
+            self._request_tokens = min(
+                self.burst, self._request_tokens + elapsed * self.requests_per_second
+            )
+        if self.tokens_per_minute:
+            self._budget_tokens = min(
+                float(self.tokens_per_minute),
+                self._budget_tokens + elapsed * self.tokens_per_minute / 60
+            )
+
+    def reserve(self, tokens: int = 0) -> float:
+        """预占一次请求所需的令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        self._refill(now)
+        delay = 0.0
+        if self.requests_per_second:
+            self._request_tokens -= 1
+            if self._request_tokens < 0:
+                delay = -self._request_tokens / self.requests_per_second
+        if self.tokens_per_minute and tokens > 0:
+            # 单个请求超过整桶容量时按整桶计算，避免永远无法发起
+            self._budget_tokens -= min(tokens, self.tokens_per_minute)
+            if self._budget_tokens < 0:
+                delay = max(delay, -self._budget_tokens * 60 / self.tokens_per_minute)
+        return delay
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """等待直到允许发起请求，返回实际等待的秒数"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def update(self, requests_per_second: Optional[float] = None,
+               tokens_per_minute: Optional[int] = None, burst: float = 1) -> None:
+        """动态更新限流参数，已预占的令牌不受影响"""
+        self._refill(time.monotonic())
+        if tokens_per_minute and not self.tokens_per_minute:
+            self._budget_tokens = float(tokens_per_minute)
+        self.requests_per_second = requests_per_second or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self.burst = max(float(burst), 1.0)
+        self._request_tokens = min(self._request_tokens, self.burst)
+        self._budget_tokens = min(self._budget_tokens, float(self.tokens_per_minute or 0))
+
+def _is_overload_error(error: Exception) -> bool:
+    """判断异常是否表示服务端过载：429、5xx或请求超时"""
+    if isinstance(error, openai.APITimeoutError):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status == 429 or status >= 500)
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发限制器
+
+    请求成功且延迟平稳时加性增大并发上限（每个窗口约+increase），
+    遇到429/5xx、超时或延迟突增时乘性减小（乘以backoff）。
+    延迟按估算token数归一化后与指数滑动平均基线比较，避免长文本被误判为延迟突增；
+    上一次下调之前发起的请求不会再次触发下调。adaptive为False时退化为固定上限。
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int = 1, max_limit: Optional[int] = None,
+                 adaptive: bool = True, increase: float = 1.0, backoff: float = 0.5,
+                 latency_tolerance: float = 2.0, smoothing: float = 0.05):
+        """
+        Args:
+            initial_limit: 初始并发上限
+            min_limit: 并发上限的下界
+            max_limit: 并发上限的上界，默认为initial_limit的4倍
+            adaptive: 是否根据响应自动调整上限
+            increase: 每个窗口（约limit个成功请求）增加的上限
+            backoff: 过载时上限的乘数
+            latency_tolerance: 归一化延迟超过基线多少倍视为延迟突增
+            smoothing: 延迟基线的指数滑动平均系数
+        """
+        self._limit = 0.0
+        self._inflight = 0
+        self._waiters = deque()
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self.update(initial_limit, min_limit, max_limit, adaptive, increase, backoff,
+                    latency_tolerance, smoothing)
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def update(self, initial_limit: Optional[int] = None, min_limit: int = 1, max_limit: Optional[int] = None,
+               adaptive: bool = True, increase: float = 1.0, backoff: float = 0.5,
+               latency_tolerance: float = 2.0, smoothing: float = 0.05) -> None:
+        """动态更新参数，给出initial_limit时重置当前上限"""
+        self.min_limit = max(int(min_limit), 1)
+        if initial_limit is not None:
+            self.max_limit = max(int(max_limit or initial_limit * 4), self.min_limit)
+            self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        else:
+            self.max_limit = max(int(max_limit or self.max_limit), self.min_limit)
+            self._limit = float(min(max(self._limit, self.min_limit), self.max_limit))
+        self.adaptive = adaptive
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._wake()
+
+    async def acquire(self) -> float:
+        """获取一个并发槽位，返回获取时刻，释放时原样传给release"""
+        if self._inflight < self.limit and not self._waiters:
+            self._inflight += 1
+            return time.monotonic()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 槽位已分配给本协程，转交给下一个等待者
+                self._inflight -= 1
+                self._wake()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        return time.monotonic()
+
+    def release(self, acquired_at: float, latency: Optional[float] = None, tokens: int = 1,
+                overloaded: bool = False) -> None:
+        """释放槽位并根据本次请求的结果调整上限
+
+        Args:
+            acquired_at: acquire返回的时刻
+            latency: 网络调用耗时（秒），请求未发出或失败时为None
+            tokens: 本次请求的估算token数，用于归一化延迟
+            overloaded: 是否收到429/5xx或超时等过载信号
+        """
+        saturated = self._inflight >= self.limit or bool(self._waiters)
+        self._inflight -= 1
+        if self.adaptive:
+            if overloaded:
+                self._decrease(acquired_at)
+            elif latency is not None:
+                sample = latency / max(tokens, 1)
+                if self._baseline is None:
+                    self._baseline = sample
+                spike = sample > self._baseline * self.latency_tolerance
+                self._baseline += self.smoothing * (sample - self._baseline)
+                if spike:
+                    self._decrease(acquired_at)
+                elif saturated and self._limit < self.max_limit:
+                    self._limit = min(self._limit + self.increase / max(self._limit, 1.0), float(self.max_limit))
+                    self.increases += 1
+        self._wake()
+
+    def _decrease(self, acquired_at: float) -> None:
+        if acquired_at < self._last_decrease:
+            return
+        self._limit = max(self._limit * self.backoff, float(self.min_limit))
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        logger.debug(f"Concurrency limit decreased to {self.limit}")
+
+    def _wake(self) -> None:
+        while self._waiters and self._inflight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._inflight += 1
+            waiter.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'limit': self.limit,
+            'inflight': self._inflight,
+            'waiting': len(self._waiters),
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'adaptive': self.adaptive,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """从错误响应的retry-after-ms或Retry-After头中解析需要等待的秒数"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        # HTTP日期格式
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """API请求重试策略
+
+    连接错误、超时、429和5xx可以重试，等待时间采用全抖动指数退避
+    （在0到min(max_delay, base_delay * 2^n)之间均匀取值），响应带有Retry-After时以其为准。
+    所有请求共享一个重试预算：每个首次请求存入budget_ratio个令牌，每次重试消耗1个，
+    令牌不超过budget_burst，因此持续故障时重试最多使请求量增加约budget_ratio倍。
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 max_retry_after: float = 30.0, budget_ratio: float = 0.2, budget_burst: float = 10.0):
+        """
+        Args:
+            max_retries: 单个请求的最大重试次数
+            base_delay: 退避基数（秒）
+            max_delay: 单次退避的上限（秒）
+            max_retry_after: Retry-After超过该秒数时放弃重试
+            budget_ratio: 每个首次请求为重试预算存入的令牌数
+            budget_burst: 重试预算的令牌上限
+        """
+        self._tokens = 0.0
+        self.retries = 0
+        self.exhausted = 0
+        self.update(max_retries, base_delay, max_delay, max_retry_after, budget_ratio, budget_burst)
+        self._tokens = self.budget_burst
+
+    def update(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+               max_retry_after: float = 30.0, budget_ratio: float = 0.2, budget_burst: float = 10.0) -> None:
+        """动态更新参数，已积累的预算不超过新的上限"""
+        self.max_retries = max(int(max_retries), 0)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget_ratio = budget_ratio
+        self.budget_burst = float(budget_burst)
+        self._tokens = min(self._tokens, self.budget_burst)
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """连接错误、超时、429和5xx可以重试，认证失败和其他4xx不重试"""
+        if isinstance(error, (openai.APIConnectionError, httpx.ConnectError, asyncio.TimeoutError)):
+            return True
+        return _is_overload_error(error)
+
+    def on_request(self) -> None:
+        """首次请求发出时为重试预算存入令牌"""
+        self._tokens = min(self._tokens + self.budget_ratio, self.budget_burst)
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次重试（从0开始）的全抖动退避时间"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def next_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """返回第attempt次重试（从0开始）前的等待秒数，不应重试时返回None
+
+        返回非None时已从预算中扣除本次重试。
+        """
+        if attempt >= self.max_retries or not self.is_retryable(error):
+            return None
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        if self._tokens < 1:
+            self.exhausted += 1
+            return None
+        self._tokens -= 1
+        self.retries += 1
+        return retry_after if retry_after is not None else self.backoff(attempt)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'max_retries': self.max_retries,
+            'budget': self._tokens,
+            'budget_burst': self.budget_burst,
+            'retries': self.retries,
+            'budget_exhausted': self.exhausted,
+        }
+
+class HedgePolicy:
+    """对冲请求策略
+
+    非流式请求超过历史延迟的percentile分位数仍未完成时，再发起一个相同的请求，
+    取先成功的结果并取消另一个。对冲受预算限制：每个可对冲的调用存入budget_ratio个令牌，
+    每次对冲消耗1个，令牌不超过budget_burst，额外负载约为budget_ratio。
+    样本数少于min_samples时不对冲。
+    """
+
+    def __init__(self, percentile: float = 0.95, budget_ratio: float = 0.05, budget_burst: float = 5.0,
+                 min_samples: int = 20, min_delay: float = 0.05):
+        """
+        Args:
+            percentile: 触发对冲的延迟分位数（0-1）
+            budget_ratio: 每个请求为对冲预算存入的令牌数
+            budget_burst: 对冲预算的令牌上限
+            min_samples: 启用对冲所需的最少延迟样本数
+            min_delay: 触发对冲前的最短等待（秒）
+        """
+        self._tokens = 0.0
+        self.hedges = 0
+        self.wins = 0
+        self.denied = 0
+        self.update(percentile, budget_ratio, budget_burst, min_samples, min_delay)
+
+    def update(self, percentile: float = 0.95, budget_ratio: float = 0.05, budget_burst: float = 5.0,
+               min_samples: int = 20, min_delay: float = 0.05) -> None:
+        """动态更新参数，已积累的预算不超过新的上限"""
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.budget_burst = float(budget_burst)
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._tokens = min(self._tokens, self.budget_burst)
+
+    def on_request(self) -> None:
+        """可对冲的调用发起时为对冲预算存入令牌，每次调用（不论重试几次）只应调用一次"""
+        self._tokens = min(self._tokens + self.budget_ratio, self.budget_burst)
+
+    def delay(self, histogram: LatencyHistogram) -> Optional[float]:
+        """根据延迟直方图返回触发对冲的等待秒数，样本不足时返回None"""
+        if histogram.count < self.min_samples:
+            return None
+        return max(histogram.percentile(self.percentile), self.min_delay)
+
+    def try_acquire(self) -> bool:
+        """为一次对冲扣除预算，预算不足时返回False"""
+        if self._tokens < 1:
+            self.denied += 1
+            return False
+        self._tokens -= 1
+        self.hedges += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'percentile': self.percentile,
+            'budget': self._tokens,
+            'budget_burst': self.budget_burst,
+            'hedges': self.hedges,
+            'wins': self.wins,
+            'denied': self.denied,
+        }
+
+_CJK_CHAR_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算文本的令牌数：CJK字符约1个令牌，其他字符约4个字符1个令牌"""
+    if not text:
+        return 0
+    cjk_count = len(_CJK_CHAR_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+def _serialize_cache_value(value: Any) -> str:
+    """将缓存值序列化为JSON字符串"""
+    if isinstance(value, DoubaoTranslated):
+        data = {'type': 'translated', 'value': vars(value)}
+    elif isinstance(value, DoubaoDetected):
+        data = {'type': 'detected', 'value': vars(value)}
+    else:
+        data = {'type': 'json', 'value': value}
+    return json.dumps(data, ensure_ascii=False)
+
+def _deserialize_cache_value(raw: str) -> Any:
+    """从JSON字符串还原缓存值"""
+    data = json.loads(raw)
+    value = data['value']
+    if data['type'] == 'translated':
+        return DoubaoTranslated(**value)
+    if data['type'] == 'detected':
+        return DoubaoDetected(**value)
+    return value
+
+class CacheBackend:
+    """翻译缓存后端基类"""
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存项，不存在或已过期时返回None"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        """设置缓存项"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """删除缓存项"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """清空缓存"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放后端资源"""
+        pass
+
+def _estimate_cache_size(key: str, value: Any) -> int:
+    """估算缓存条目占用的字节数"""
+    size = sys.getsizeof(key)
+    if isinstance(value, (DoubaoTranslated, DoubaoDetected)):
+        size += sys.getsizeof(value) + sum(sys.getsizeof(v) for v in vars(value).values())
+    else:
+        size += sys.getsizeof(value)
+    return size
+
+class LRUCache(CacheBackend):
+    """有界的内存LRU缓存
+
+    读写均为O(1)。条目数或估算字节数超过上限时淘汰最久未使用的条目；
+    过期条目在读取时惰性删除，写入时顺带检查最久未使用的一个条目，分摊清理开销。
+    """
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 10000, max_bytes: Optional[int] = None):
+        """
+        Args:
+            ttl: 缓存有效期（秒）
+            max_entries: 最大条目数
+            max_bytes: 估算占用字节数上限，None表示不限制
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: 'OrderedDict[str, Tuple[Any, float, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存项，命中时将其移到最近使用的位置"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, timestamp, size = item
+            if time.time() - timestamp >= self.ttl:
+                del self._data[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """设置缓存项，超过容量时淘汰最久未使用的条目"""
+        size = _estimate_cache_size(key, value)
+        now = time.time()
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, now, size)
+            self._bytes += size
+
+            # 分摊清理：检查最久未使用的条目是否已过期
+            oldest_key = next(iter(self._data))
+            if oldest_key != key and now - self._data[oldest_key][1] >= self.ttl:
+                self._bytes -= self._data.pop(oldest_key)[2]
+                self.expirations += 1
+
+            while len(self._data) > 1 and (
+                len(self._data) > self.max_entries or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """删除缓存项"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self._bytes -= item[2]
+
+    def clear(self) -> None:
+        """清空缓存（不重置统计计数）"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class TextSegmenter:
+    """按令牌预算切分长文本
+
+    依次尝试在段落、句子和分句边界切分，仍超出预算的片段再按字符硬切。
+    中文、日文按全角标点断句，泰文按空格断句，其他语言按句末标点加空白断句。
+    切分结果按顺序拼接后与原文完全一致。
+    """
+
+    PARAGRAPH_PATTERN = re.compile(r'\n\s*')
+    SENTENCE_PATTERNS = {
+        'cjk': re.compile(r'[。！？!?；;…]+[”’」』）)\]"\']*\s*'),
+        'th': re.compile(r'\s+'),
+        'default': re.compile(r'[.!?;]+[”’"\')\]]*\s+'),
+    }
+    CLAUSE_PATTERNS = {
+        'cjk': re.compile(r'[，、：,:]\s*'),
+        'default': re.compile(r'[,:]\s+'),
+    }
+
+    def __init__(self, max_tokens: int):
+        """
+        Args:
+            max_tokens: 每个片段的估算令牌数上限
+        """
+        self.max_tokens = max(max_tokens, 1)
+
+    @staticmethod
+    def _split_after(text: str, pattern) -> List[str]:
+        """在每个分隔符之后切分，分隔符保留在前一个片段末尾"""
+        pieces = []
+        last = 0
+        for match in pattern.finditer(text):
+            if match.end() > last:
+                pieces.append(text[last:match.end()])
+                last = match.end()
+        if last < len(text):
+            pieces.append(text[last:])
+        return pieces
+
+    def _hard_split(self, text: str) -> List[str]:
+        """逐字符累加估算令牌数硬切，每个片段都不超过预算
+
+        按字符数均匀切分时，CJK字符和其他字符混排的片段可能超出预算，因此按令牌数贪心切分。
+        """
+        pieces = []
+        start = 0
+        cjk_count = other_count = 0
+        for i, char in enumerate(text):
+            is_cjk = bool(_CJK_CHAR_PATTERN.match(char))
+            cjk = cjk_count + is_cjk
+            other = other_count + (not is_cjk)
+            if i > start and cjk + (other + 3) // 4 > self.max_tokens:
+                pieces.append(text[start:i])
+                start = i
+                cjk, other = int(is_cjk), int(not is_cjk)
+            cjk_count, other_count = cjk, other
+        pieces.append(text[start:])
+        return pieces
+
+    def _patterns_for(self, lang: str) -> List[Any]:
+        """获取指定语言从粗到细的切分模式"""
+        if lang in ('zh', 'ja'):
+            return [self.PARAGRAPH_PATTERN, self.SENTENCE_PATTERNS['cjk'], self.CLAUSE_PATTERNS['cjk']]
+        if lang == 'th':
+            return [self.PARAGRAPH_PATTERN, self.SENTENCE_PATTERNS['th']]
+        return [self.PARAGRAPH_PATTERN, self.SENTENCE_PATTERNS['default'], self.CLAUSE_PATTERNS['default']]
+
+    def _split(self, text: str, patterns: List[Any]) -> List[str]:
+        """递归切分并贪心合并相邻的小片段"""
+        if _estimate_tokens(text) <= self.max_tokens:
+            return [text]
+        if not patterns:
+            return self._hard_split(text)
+
+        segments = []
+        current = ''
+        for piece in self._split_after(text, patterns[0]):
+            if _estimate_tokens(piece) > self.max_tokens:
+                if current:
+                    segments.append(current)
+                    current = ''
+                segments.extend(self._split(piece, patterns[1:]))
+            elif current and _estimate_tokens(current + piece) > self.max_tokens:
+                segments.append(current)
+                current = piece
+            else:
+                current += piece
+        if current:
+            segments.append(current)
+        return segments
+
+    def needs_split(self, text: str) -> bool:
+        """判断文本是否超出预算"""
+        return _estimate_tokens(text) > self.max_tokens
+
+    def split(self, text: str, lang: str = 'auto') -> List[str]:
+        """切分文本
+
+        Args:
+            text: 要切分的文本
+            lang: 文本语言，用于选择断句规则
+        """
+        if lang == 'auto':
+            lang = 'zh' if _CJK_CHAR_PATTERN.search(text) else 'default'
+        return self._split(text, self._patterns_for(lang))
+
 class AsyncCache:
-    """异步安全的缓存实现"""
+    """异步接口的缓存，基于LRUCache实现"""
     
-    def __init__(self, ttl: int = 3600):
-        self._cache = {}
-        self._ttl = ttl
-        self._lock = asyncio.Lock()
+    def __init__(self, ttl: int = 3600, max_entries: int = 10000, max_bytes: Optional[int] = None):
+        self._cache = LRUCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
 
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存项"""
-        async with self._lock:
-            if key in self._cache:
-                item = self._cache[key]
-                if time.time() - item['timestamp'] < self._ttl:
-                    return item['value']
-                else:
-                    del self._cache[key]
-        return None
+        return self._cache.get(key)
 
     async def set(self, key: str, value: Any) -> None:
         """设置缓存项"""
-        async with self._lock:
-            self._cache[key] = {
-                'value': value,
-                'timestamp': time.time()
-            }
-            await self._cleanup()
-
-    async def _cleanup(self) -> None:
-        """清理过期缓存"""
-        current_time = time.time()
-        async with self._lock:
-            expired = [
-                k for k, v in self._cache.items()
-                if current_time - v['timestamp'] > self._ttl
-            ]
-            for k in expired:
-                del self._cache[k]
+        self._cache.set(key, value)
 
     async def clear(self) -> None:
         """清空缓存"""
-        async with self._lock:
-            self._cache.clear()
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return self._cache.get_stats()
+
+class SingleFlight:
+    """合并相同键的并发调用
+
+    同一键已有调用在进行时，后来者等待同一个结果而不是再次调用；
+    结果和异常都会传给所有等待者，调用结束后立即移除，异常不会被保留。
+    通过do发起的调用在所有等待者都被取消后随之取消，被放弃的请求不会继续占用接口配额。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Any, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def get(self, key: Any) -> Optional[asyncio.Future]:
+        """返回键对应的进行中调用，没有时返回None"""
+        return self._calls.get(key)
+
+    def join(self, key: Any) -> Optional[asyncio.Future]:
+        """加入键对应的进行中调用并计入共享次数，没有时返回None
+
+        返回的Future应通过asyncio.shield等待，以免取消影响其他等待者。
+        直接加入的等待者会一直保留该调用，直到调用结束。
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            self._waiters[future] = self._waiters.get(future, 0) + 1
+        return future
+
+    async def do(self, key: Any, func) -> Any:
+        """执行func()，同一键的并发调用共享一次执行
+
+        调用在独立的任务中执行，单个等待者被取消不会影响其他等待者；
+        所有等待者都被取消后调用也被取消。
+        """
+        future = self.join(key)
+        if future is None:
+            future = self._register(key, asyncio.ensure_future(func()))
+            self._waiters[future] = 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._release(future)
+
+    def claim(self, key: Any) -> asyncio.Future:
+        """登记一个由调用方通过resolve完成的调用，用于一次请求完成多个键的场景"""
+        future = self._register(key, asyncio.get_running_loop().create_future())
+        # 登记方负责完成该调用，其他等待者取消时不应取消它
+        self._waiters[future] = 1
+        return future
+
+    def resolve(self, key: Any, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """完成claim登记的调用"""
+        future = self._calls.get(key)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _register(self, key: Any, future: asyncio.Future) -> asyncio.Future:
+        self.calls += 1
+        self._calls[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _release(self, future: asyncio.Future) -> None:
+        remaining = self._waiters.get(future, 0) - 1
+        if remaining > 0:
+            self._waiters[future] = remaining
+            return
+        self._waiters.pop(future, None)
+        if not future.done():
+            future.cancel()
+
+    def _finish(self, key: Any, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        self._waiters.pop(future, None)
+        # 读取异常，避免没有等待者时出现"exception was never retrieved"警告
+        if not future.cancelled():
+            future.exception()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'inflight': len(self._calls),
+            'calls': self.calls,
+            'shared': self.shared,
+        }
+
+class SQLiteCacheBackend(CacheBackend):
+    """基于SQLite的持久化缓存，可在多个进程间共享
+
+    使用WAL模式，读操作不会被其他进程的写操作阻塞。
+    过期清理和容量淘汰按写入次数分摊执行，淘汰时优先删除最早写入的条目。
+    """
+
+    def __init__(self, path: Union[str, Path], ttl: int = 86400, max_entries: int = 1000000,
+                 cleanup_interval: int = 1000):
+        """
+        Args:
+            path: 数据库文件路径
+            ttl: 缓存有效期（秒）
+            max_entries: 最大条目数
+            cleanup_interval: 每写入多少次执行一次清理
+        """
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cleanup_interval = max(cleanup_interval, 1)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取数据库连接，首次使用时创建"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS translation_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_translation_cache_created '
+                'ON translation_cache (created_at)'
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存项"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value, created_at FROM translation_cache WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return _deserialize_cache_value(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """设置缓存项"""
+        raw = _serialize_cache_value(value)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO translation_cache (key, value, created_at) VALUES (?, ?, ?)',
+                (key, raw, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.cleanup_interval == 0:
+                self._cleanup(conn)
+
+    def _cleanup(self, conn: sqlite3.Connection) -> None:
+        """删除过期条目并将条目数压缩到上限以内"""
+        conn.execute('DELETE FROM translation_cache WHERE created_at < ?', (time.time() - self.ttl,))
+        count = conn.execute('SELECT COUNT(*) FROM translation_cache').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM translation_cache WHERE key IN ('
+                'SELECT key FROM translation_cache ORDER BY created_at LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        """删除缓存项"""
+        with self._lock:
+            self._connect().execute('DELETE FROM translation_cache WHERE key = ?', (key,))
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._connect().execute('DELETE FROM translation_cache')
+
+    def close(self) -> None:
+        """关闭数据库连接，之后再次使用会自动重连"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# 不以空格分词的文字，术语匹配时不要求词边界
+_UNSPACED_CHAR_PATTERN = re.compile(r'[\u0e00-\u0e7f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+def _is_spaced_word_char(char: str) -> bool:
+    """判断字符是否属于以空格分词的文字中的单词字符"""
+    return (char.isalnum() or char == '_') and not _UNSPACED_CHAR_PATTERN.match(char)
+
+class GlossaryMatcher:
+    """基于Aho-Corasick自动机的术语多模式匹配器
+
+    构建一次后，单次扫描即可找出文本中的全部术语，耗时与术语数量无关。
+    匹配不区分大小写，重叠时最左最长匹配优先。拉丁、西里尔等以空格分词的文字
+    要求术语两端位于词边界，汉字、假名、谚文和泰文不要求。
+    """
+
+    def __init__(self, terms: List[Tuple[str, str, str]]):
+        """
+        Args:
+            terms: (术语ID, 源语言术语, 目标语言术语)列表，源语言术语重复时保留第一个
+        """
+        self.terms: List[Tuple[str, str, str]] = []
+        self._lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]
+        self._dict_link: List[int] = [0]
+
+        seen = set()
+        for term_id, source, target in terms:
+            key = self._fold(source)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self._insert(key, len(self.terms))
+            self.terms.append((term_id, source, target))
+            self._lengths.append(len(key))
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    @staticmethod
+    def _fold(text: str) -> str:
+        """转换为小写，同时保证字符位置与原文一一对应"""
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+    def _insert(self, key: str, index: int) -> None:
+        """将术语插入字典树"""
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+                self._dict_link.append(0)
+            node = next_node
+        self._output[node] = index
+
+    def _build(self) -> None:
+        """广度优先构建失败链接和输出链接"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                fail_node = self._fail[child]
+                self._dict_link[child] = fail_node if self._output[fail_node] >= 0 else self._dict_link[fail_node]
+                queue.append(child)
+
+    def _at_boundary(self, text: str, start: int, end: int) -> bool:
+        """检查匹配两端是否满足词边界要求"""
+        if start > 0 and _is_spaced_word_char(text[start]) and _is_spaced_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_spaced_word_char(text[end - 1]) and _is_spaced_word_char(text[end]):
+            return False
+        return True
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """查找文本中的术语
+
+        Returns:
+            按位置排序且互不重叠的(起始位置, 结束位置, 术语序号)列表
+        """
+        if not self.terms or not text:
+            return []
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_link = self._dict_link
+        candidates = []
+        node = 0
+        for i, char in enumerate(self._fold(text)):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] >= 0 else dict_link[node]
+            while match:
+                index = output[match]
+                start = i + 1 - self._lengths[index]
+                if self._at_boundary(text, start, i + 1):
+                    candidates.append((start, i + 1, index))
+                match = dict_link[match]
+
+        # 最左最长优先，丢弃与已选匹配重叠的候选
+        candidates.sort(key=lambda m: (m[0], m[0] - m[1]))
+        matches = []
+        last_end = 0
+        for start, end, index in candidates:
+            if start >= last_end:
+                matches.append((start, end, index))
+                last_end = end
+        return matches
+
+class PromptTemplate:
+    """提示词模板
+
+    系统提示词和固定的指令放在最前面，同一模板生成的前缀逐字节相同，
+    可以命中服务端的提示词前缀缓存；术语约束、语言、上下文和文本等
+    可变内容只出现在最后的用户消息中。
+    """
+
+    def __init__(self, system: str, instructions: str = ""):
+        self.system = system
+        self.instructions = instructions.strip()
+        self.prefix = f"{system}\n\n{self.instructions}" if self.instructions else system
+
+    def build(self, payload: str, constraints: str = "") -> List[Dict[str, str]]:
+        """生成请求消息，constraints（如术语约束）紧跟固定前缀，payload放在最后"""
+        content = f"{constraints}\n\n{payload}" if constraints else payload
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": content}
+        ]
+
+def _usage_to_dict(usage: Any) -> Dict[str, int]:
+    """将API返回的usage对象转换为字典，cached_tokens为命中前缀缓存的提示词token数"""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        cached_tokens = details.get('cached_tokens')
+    else:
+        cached_tokens = getattr(details, 'cached_tokens', 0)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'total_tokens': getattr(usage, 'total_tokens', 0) or 0,
+        'cached_tokens': cached_tokens or 0,
+    }
 
 class DoubaoTranslator:
     """豆包AI翻译器类"""
 
     def __init__(self, api_key=None, model_name=None, base_url=None, 
                  max_workers=MAX_WORKERS, glossary_path=None,
-                 performance_mode='balanced', **kwargs):
+                 performance_mode='balanced', cache_backend: Optional[CacheBackend] = None,
+                 tracer: Optional[Tracer] = None, **kwargs):
         """
         初始化DoubaoTranslator对象。
 
@@ -448,6 +1974,9 @@ class DoubaoTranslator:
             max_workers: 最大并发线程数
             glossary_path: 术语表文件路径
             performance_mode: 性能模式('fast', 'balanced', 'accurate')
+            cache_backend: 持久化缓存后端（可选），未提供但配置了cache_path时
+                自动创建SQLiteCacheBackend
+            tracer: 请求阶段追踪器（可选），默认为不做记录的NoOpTracer
             **kwargs: 自定义性能参数，可覆盖预设配置
 
         Raises:
@@ -490,13 +2019,27 @@ class DoubaoTranslator:
             # 初始化资源管理器
             self.session_manager = SessionManager()
             self.client_manager = ClientManager(self.api_key, self.base_url)
-            self.semaphore = asyncio.Semaphore(self.perf_config['max_workers'])
+            self.concurrency = AdaptiveConcurrencyLimiter(**self._get_concurrency_config())
+            self.retry_policy = RetryPolicy(**self._get_retry_config())
+            self.hedge_policy = HedgePolicy(**self._get_hedge_config())
+            self.rate_limiter = TokenBucketRateLimiter(**self._get_rate_limit_config())
+            self.tracer = tracer or NoOpTracer()
             
             # 初始化异步锁
             self._cache_lock = asyncio.Lock()
-            self._request_lock = asyncio.Lock()
             self._metrics_lock = asyncio.Lock()
             
+            # 持久化缓存
+            if cache_backend is None and self.perf_config.get('cache_path'):
+                cache_backend = SQLiteCacheBackend(
+                    self.perf_config['cache_path'],
+                    ttl=self.perf_config.get('persistent_cache_ttl', 86400),
+                    max_entries=self.perf_config.get('persistent_cache_max_entries', 1000000)
+                )
+            self.cache_backend = cache_backend
+            # 持久化缓存的读写在单个后台线程中按顺序执行，不阻塞事件循环
+            self._cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='doubao-cache')
+            
             # 初始化其他组件
             self._init_components(max_workers, glossary_path)
             
@@ -514,16 +2057,47 @@ class DoubaoTranslator:
             glossary_path: 术语表路径
         """
         # 基础组件
-        self._last_request_time = 0
-        self._response_cache = {}
+        self._inflight = SingleFlight()
+        self._response_cache = LRUCache(
+            ttl=self._cache_ttl,
+            max_entries=self.perf_config.get('cache_max_entries', 10000),
+            max_bytes=self.perf_config.get('cache_max_bytes', 64 * 1024 * 1024)
+        )
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.system_prompt = "你是豆包翻译助手，请直接翻译用户的文本，不要添加任何解释。"
+        self.pack_system_prompt = (
+            "你是豆包翻译助手。用户会提供一个JSON对象，请逐项翻译其中的值，"
+            "保持键不变，只返回结构相同的JSON对象，不要添加任何解释。"
+        )
+        self.detect_pack_system_prompt = (
+            "你是豆包语言检测助手。用户会提供一个JSON对象，请检测每个值的语言，"
+            "保持键不变，只返回结构相同的JSON对象，值为语言代码，例如：en、zh、ja等。"
+        )
+        self.translate_template = PromptTemplate(self.system_prompt)
+        self.context_template = PromptTemplate(self.system_prompt, """
+翻译要求：
+1. 保持与上下文的连贯性和一致性
+2. 保留专业术语准确性
+3. 保持原文的语气和风格
+4. 保持代词指代的正确性
+5. 注意上下文中的特定含义
+用户消息会依次给出约束条件（如有）、语言、上下文背景和需要翻译的文本。""")
+        self.pack_template = PromptTemplate(self.pack_system_prompt)
+        self.detect_template = PromptTemplate("你是豆包语言检测助手，请只返回检测到的语言代码，例如：en、zh、ja等")
+        self.detect_pack_template = PromptTemplate(self.detect_pack_system_prompt)
         
         # 术语表初始化
         self.glossary: Dict[str, Dict[str, str]] = {}
+        self._glossary_matchers: Dict[Tuple[str, str], GlossaryMatcher] = {}
+        self._glossary_fingerprint: Optional[str] = None
         if glossary_path:
             self.load_glossary(glossary_path)
         
+        # 长文本切分器，默认每段输入不超过max_tokens的一半，为译文膨胀留出余量
+        self.segmenter = TextSegmenter(
+            self.perf_config.get('segment_max_tokens', self.perf_config['max_tokens'] // 2)
+        )
+        
         # 风格模板初始化
         self._init_style_templates()
         
@@ -532,7 +2106,6 @@ class DoubaoTranslator:
         
         # 异步组件
         self.session = None
-        self.semaphore = asyncio.Semaphore(max_workers)
 
     def _init_style_templates(self):
         """初始化翻译风格模板"""
@@ -567,94 +2140,316 @@ class DoubaoTranslator:
             """
         }
 
+    def _get_style_template(self, style: Union[str, Dict], max_versions: int = 3) -> PromptTemplate:
+        """获取风格翻译的提示词模板，同一风格的前缀保持逐字节相同"""
+        if isinstance(style, str):
+            if style not in self.style_templates:
+                raise ValueError(f"未知的预定义风格: {style}")
+            style_prompt = self.style_templates[style]
+            if style == 'creative':
+                # 动态更新创意风格的版本数限制
+                style_prompt = f"""
+                    翻译要求：
+                    1. 提供{max_versions}个不同的翻译版本
+                    2. 每个版本使用不同的表达方式
+                    3. 保持原文的核心含义
+                    4. 限制在{max_versions}个版本以内
+                    """
+        else:
+            # 将自定义风格字典转换为提示文本，按键排序保证前缀稳定
+            style_prompt = "翻译要求：\n" + "\n".join([f"{k}: {v}" for k, v in sorted(style.items())])
+
+        style_prompt = "\n".join(line.strip() for line in style_prompt.strip().splitlines())
+        return PromptTemplate(
+            "你是一个专业的翻译手，请按照指定的风格要求进行翻译。",
+            f"{style_prompt}\n\n请直接提供翻译结果，不要添加任何解释。"
+            f"如果是创意风格，最多提供{max_versions}个不同的版本，用分号分隔。"
+        )
+
+    def _format_style_payload(self, text: str, dest: str, src: str, context: Optional[str] = None) -> str:
+        """风格翻译的可变内容：语言、上下文和需要翻译的文本"""
+        parts = [f"将以下文本从{src}翻译成{dest}。"]
+        if context:
+            parts.append(f"相关上下文：\n{context}")
+        parts.append(f"需要翻译的文本：\n{text}")
+        return "\n\n".join(parts)
+
     def _should_retry(self, exception: Exception) -> bool:
         """判断是否应该重试"""
-        if isinstance(exception, (openai.APIError, openai.APIConnectionError)):
-            return True
-        if isinstance(exception, httpx.ConnectError):
-            return True
-        return False
+        return self.retry_policy.is_retryable(exception)
+
+    def _get_retry_config(self) -> Dict[str, Any]:
+        """获取重试配置
 
-    def _get_retry_config(self):
-        """获取重试配置"""
+        max_retries为单个请求在首次调用之外的最大重试次数，
+        retry_budget_ratio和retry_budget_burst限制所有请求共享的重试总量。
+        """
         return {
-            'multiplier': self.perf_config.get('retry_multiplier', 0.5),
-            'min': self.perf_config.get('retry_min_wait', 1),
-            'max': self.perf_config.get('retry_max_wait', 4),
-            'max_retries': self.perf_config.get('max_retries', 3)
+            'max_retries': self.perf_config.get('max_retries', 3),
+            'base_delay': self.perf_config.get('retry_multiplier', 0.5),
+            'max_delay': self.perf_config.get('retry_max_wait', 8),
+            'max_retry_after': self.perf_config.get('retry_max_after', 30),
+            'budget_ratio': self.perf_config.get('retry_budget_ratio', 0.2),
+            'budget_burst': self.perf_config.get('retry_budget_burst', 10),
         }
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=0.5, min=1, max=4),
-        retry=retry_if_exception_type((openai.APIError, openai.APIConnectionError, httpx.ConnectError))
-    )
-    async def _make_request(self, messages, stream=False):
-        """改进的异步请求处理"""
-        async with self._request_lock:  # 使用请求锁控制并发
-            current_time = time.time()
-            time_since_last_request = current_time - self._last_request_time
-            if time_since_last_request < self._min_request_interval:
-                await asyncio.sleep(self._min_request_interval - time_since_last_request)
-            
-            start_time = time.time()
-            request_id = str(uuid.uuid4())
-            
-            try:
-                # 验证API密钥
-                if not self.api_key or len(self.api_key) < 32:
-                    raise DoubaoAuthenticationError("无效的API密钥")
+    def _get_hedge_config(self) -> Dict[str, Any]:
+        """获取对冲请求配置，只有doubao_translate的单个文本翻译可通过参数hedge开启对冲"""
+        return {
+            'percentile': self.perf_config.get('hedge_percentile', 0.95),
+            'budget_ratio': self.perf_config.get('hedge_budget_ratio', 0.05),
+            'budget_burst': self.perf_config.get('hedge_budget_burst', 5),
+            'min_samples': self.perf_config.get('hedge_min_samples', 20),
+            'min_delay': self.perf_config.get('hedge_min_delay', 0.05),
+        }
 
-                client = await self.client_manager.get_client()
-                
-                async with self.semaphore:  # 使用信号量控制并发
-                    try:
-                        completion = await client.chat.completions.create(
-                            model=self.model,
-                            messages=messages,
-                            stream=stream,
-                            temperature=self.perf_config['temperature'],
-                            max_tokens=self.perf_config['max_tokens'],
-                            timeout=self.perf_config['timeout']
-                        )
-                    except openai.AuthenticationError as e:
-                        raise DoubaoAuthenticationError(f"API认证失败: {str(e)}")
-                    except openai.APIError as e:
-                        if "auth" in str(e).lower():
-                            raise DoubaoAuthenticationError(f"API认证失败: {str(e)}")
+    def _get_concurrency_config(self) -> Dict[str, Any]:
+        """获取并发控制配置
+
+        初始上限为max_workers，adaptive_concurrency为True（默认）时
+        在[min_concurrency, max_concurrency]之间按AIMD自动调整。
+        """
+        max_workers = self.perf_config['max_workers']
+        return {
+            'initial_limit': max_workers,
+            'min_limit': self.perf_config.get('min_concurrency', 1),
+            'max_limit': self.perf_config.get('max_concurrency', max_workers * 4),
+            'adaptive': self.perf_config.get('adaptive_concurrency', True),
+            'backoff': self.perf_config.get('concurrency_backoff', 0.5),
+            'latency_tolerance': self.perf_config.get('concurrency_latency_tolerance', 2.0),
+        }
+
+    def _batch_workers(self) -> int:
+        """批量任务的工作协程数，取并发上限的上界，使自适应限制器成为唯一的并发约束"""
+        return self.concurrency.max_limit
+
+    def _record_dedup(self, total: int, unique: int) -> None:
+        """记录批量翻译的去重情况，doubao_batch_dedup_ratio为最近一批被去掉的重复文本比例"""
+        registry = self.metrics.registry
+        registry.inc('doubao_batch_items_total', total)
+        registry.inc('doubao_batch_unique_items_total', unique)
+        registry.set_gauge('doubao_batch_dedup_ratio', 1 - unique / total if total else 0.0)
+
+    def _record_concurrency(self) -> None:
+        """将当前并发上限和在途请求数写入指标"""
+        registry = self.metrics.registry
+        registry.set_gauge('doubao_concurrency_limit', self.concurrency.limit)
+        registry.set_gauge('doubao_inflight_requests', self.concurrency.inflight)
+
+    def _get_rate_limit_config(self) -> Dict[str, Any]:
+        """获取限流配置
+
+        未显式设置requests_per_second时，由min_request_interval换算得到。
+        """
+        requests_per_second = self.perf_config.get('requests_per_second')
+        if requests_per_second is None:
+            interval = self.perf_config.get('min_request_interval', 0)
+            requests_per_second = 1 / interval if interval and interval > 0 else None
+        return {
+            'requests_per_second': requests_per_second,
+            'tokens_per_minute': self.perf_config.get('tokens_per_minute'),
+            'burst': self.perf_config.get('rate_limit_burst', 1)
+        }
+
+    def _estimate_request_tokens(self, messages) -> int:
+        """估算一次请求消耗的令牌数（提示词加预期输出）"""
+        prompt_tokens = sum(_estimate_tokens(m.get('content') or '') for m in messages)
+        return prompt_tokens + min(prompt_tokens, self.perf_config['max_tokens'])
+
+    @_with_request_id
+    async def _make_request(self, messages, stream=False, operation: str = 'other',
+                            lang_pair: Optional[str] = None, hedge: bool = False):
+        """异步请求处理
+
+        自适应并发限制器限制在途请求数，令牌桶只控制请求的发起速率，
+        请求在等待响应期间不持有任何锁，可以相互重叠。
+        失败的调用按retry_policy重试，重试等待期间不占用并发槽位，每次等待以retry阶段交给追踪器。
+        hedge为True时非流式调用按hedge_policy发起对冲请求。
+        operation和lang_pair（如"zh->en"）用于按调用方和语言对统计token用量和费用。
+        """
+        start_time = time.time()
+        request_id = _CURRENT_REQUEST_ID.get()
+        
+        try:
+            # 验证API密钥
+            if not self.api_key or len(self.api_key) < 32:
+                raise DoubaoAuthenticationError("无效的API密钥")
+
+            client = await self.client_manager.get_client()
+
+            hedge = hedge and not stream
+            send = self._send_hedged if hedge else self._send_request
+            self.retry_policy.on_request()
+            if hedge:
+                self.hedge_policy.on_request()
+            attempt = 0
+            while True:
+                try:
+                    completion = await send(client, messages, stream, operation, lang_pair)
+                    break
+                except DoubaoAuthenticationError:
+                    raise
+                except Exception as e:
+                    delay = self.retry_policy.next_delay(e, attempt)
+                    if delay is None:
                         raise
-                    
-                    self._last_request_time = time.time()
-                    duration = time.time() - start_time
-                    
-                    if stream:
-                        return completion
-                    else:
-                        if hasattr(completion, 'choices') and completion.choices:
-                            result = completion.choices[0].message.content.strip()
-                            await self._record_metrics(duration, True)
-                            return result
-                        else:
-                            raise DoubaoAPIError("Invalid API response format")
+                    attempt += 1
+                    self.metrics.registry.inc('doubao_retries_total',
+                                              labels={'operation': operation, 'reason': type(e).__name__})
+                    logger.warning(f"Request {request_id} failed ({type(e).__name__}), "
+                                   f"retrying in {delay:.2f}s ({attempt}/{self.retry_policy.max_retries})")
+                    with self.tracer.span('retry', request_id, attempt=attempt, wait=delay, error=str(e)):
+                        await asyncio.sleep(delay)
+
+            duration = time.time() - start_time
                 
-            except openai.AuthenticationError as e:
-                await self._record_metrics(time.time() - start_time, False)
-                raise DoubaoAuthenticationError(f"认证失败: {str(e)}")
-            except openai.APIConnectionError as e:
-                await self._record_metrics(time.time() - start_time, False)
-                raise DoubaoConnectionError(f"连接失败: {str(e)}")
-            except asyncio.TimeoutError:
-                await self._record_metrics(time.time() - start_time, False)
-                raise DoubaoAPIError("请求超时")
-            except Exception as e:
-                await self._record_metrics(time.time() - start_time, False)
-                logger.error(f"Request {request_id} failed after {time.time() - start_time:.2f}s: {str(e)}")
-                raise DoubaoAPIError(f"API请求失败: {str(e)}")
+            if stream:
+                return completion
+            else:
+                if hasattr(completion, 'choices') and completion.choices:
+                    result = completion.choices[0].message.content.strip()
+                    if getattr(completion, 'usage', None):
+                        self._record_usage(_usage_to_dict(completion.usage), operation, lang_pair)
+                    await self._record_metrics(duration, True, operation, lang_pair)
+                    return result
+                else:
+                    raise DoubaoAPIError("Invalid API response format")
+            
+        except openai.AuthenticationError as e:
+            await self._record_metrics(time.time() - start_time, False, operation, lang_pair, 'auth_error')
+            raise DoubaoAuthenticationError(f"认证失败: {str(e)}")
+        except openai.APIConnectionError as e:
+            await self._record_metrics(time.time() - start_time, False, operation, lang_pair, 'connection_error')
+            raise DoubaoConnectionError(f"连接失败: {str(e)}")
+        except asyncio.TimeoutError:
+            await self._record_metrics(time.time() - start_time, False, operation, lang_pair, 'timeout')
+            raise DoubaoAPIError("请求超时")
+        except Exception as e:
+            outcome = 'auth_error' if isinstance(e, DoubaoAuthenticationError) else 'error'
+            await self._record_metrics(time.time() - start_time, False, operation, lang_pair, outcome)
+            logger.error(f"Request {request_id} failed after {time.time() - start_time:.2f}s: {str(e)}")
+            raise DoubaoAPIError(f"API请求失败: {str(e)}")
+
+    async def _send_hedged(self, client, messages, stream: bool, operation: str, lang_pair: Optional[str]):
+        """发起一次可对冲的API调用
+
+        首个调用超过本操作成功请求延迟的hedge_percentile分位数仍未完成且对冲预算充足时，
+        再发起一个相同的调用，取先成功的结果并取消另一个；两个调用都失败时抛出首个调用的异常。
+        """
+        histogram = self.metrics.registry.histogram(PerformanceMetrics.REQUEST_DURATION, operation=operation,
+                                                    model=self.model, outcome='success')
+        delay = self.hedge_policy.delay(histogram)
+        primary = asyncio.ensure_future(self._send_request(client, messages, stream, operation, lang_pair))
+        if delay is None:
+            return await primary
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self.hedge_policy.try_acquire():
+                return await primary
+
+            request_id = _CURRENT_REQUEST_ID.get()
+            with self.tracer.span('hedge', request_id, operation=operation, delay=delay) as span:
+                hedged = asyncio.ensure_future(self._send_request(client, messages, stream, operation, lang_pair))
+                tasks.add(hedged)
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            winner = 'hedge' if task is hedged else 'primary'
+                            if task is hedged:
+                                self.hedge_policy.wins += 1
+                            span.set_attribute('winner', winner)
+                            self.metrics.registry.inc('doubao_hedged_requests_total',
+                                                      labels={'operation': operation, 'winner': winner})
+                            return task.result()
+                span.set_attribute('winner', None)
+                return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            for task in tasks:
+                # 取消的调用在后台结束，读取异常避免"exception was never retrieved"警告
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _send_request(self, client, messages, stream: bool, operation: str, lang_pair: Optional[str]):
+        """发起一次API调用，返回原始completion
+
+        限流等待、并发等待和网络调用分别以rate_limit、concurrency、network阶段交给追踪器。
+        先通过限流再获取并发槽位，被限流的请求休眠期间不占用并发限制器的槽位。
+        网络调用的延迟和429/5xx/超时结果反馈给并发限制器以调整上限。
+        """
+        request_id = _CURRENT_REQUEST_ID.get()
+        tracer = self.tracer
+        estimated_tokens = self._estimate_request_tokens(messages)
+        with tracer.span('rate_limit', request_id, tokens=estimated_tokens):
+            await self.rate_limiter.acquire(estimated_tokens)
+        with tracer.span('concurrency', request_id):
+            acquired_at = await self.concurrency.acquire()
+        network_latency = None
+        overloaded = False
+        try:
+            request_options = {}
+            if stream and self.perf_config.get('stream_include_usage', True):
+                request_options['stream_options'] = {'include_usage': True}
+            with tracer.span('network', request_id, operation=operation, lang_pair=lang_pair,
+                             model=self.model, stream=stream):
+                network_start = time.monotonic()
+                completion = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=stream,
+                    temperature=self.perf_config['temperature'],
+                    max_tokens=self.perf_config['max_tokens'],
+                    timeout=self.perf_config['timeout'],
+                    **request_options
+                )
+                network_latency = time.monotonic() - network_start
+            return completion
+        except openai.AuthenticationError as e:
+            raise DoubaoAuthenticationError(f"API认证失败: {str(e)}")
+        except openai.APIError as e:
+            if "auth" in str(e).lower():
+                raise DoubaoAuthenticationError(f"API认证失败: {str(e)}")
+            overloaded = _is_overload_error(e)
+            raise
+        except asyncio.TimeoutError:
+            overloaded = True
+            raise
+        finally:
+            self.concurrency.release(acquired_at, network_latency, estimated_tokens, overloaded)
+            self._record_concurrency()
+
+    def _estimate_cost(self, usage: Dict[str, int]) -> float:
+        """按perf_config['model_prices']中当前模型的千token单价估算费用
 
-    async def _record_metrics(self, duration: float, success: bool) -> None:
+        价格格式为{'prompt': 输入单价, 'completion': 输出单价, 'cached': 缓存命中的输入单价}，
+        未配置cached时按输入单价计算，未配置当前模型时费用为0。
+        """
+        prices = self.perf_config.get('model_prices', {}).get(self.model)
+        if not prices:
+            return 0.0
+        prompt_price = prices.get('prompt', 0.0)
+        cached_price = prices.get('cached', prompt_price)
+        cached = usage.get('cached_tokens', 0)
+        return (
+            (usage.get('prompt_tokens', 0) - cached) * prompt_price
+            + cached * cached_price
+            + usage.get('completion_tokens', 0) * prices.get('completion', 0.0)
+        ) / 1000
+
+    def _record_usage(self, usage: Dict[str, int], operation: str = 'other',
+                      lang_pair: Optional[str] = None) -> None:
+        """记录一次调用的token用量和估算费用"""
+        self.metrics.record_usage(usage, operation, lang_pair, self._estimate_cost(usage))
+
+    async def _record_metrics(self, duration: float, success: bool, operation: str = 'other',
+                              lang_pair: Optional[str] = None, outcome: Optional[str] = None) -> None:
         """异步安全的指标记录"""
         async with self._metrics_lock:
-            self.metrics.record_request(duration, success)
+            self.metrics.record_request(duration, success, operation, self.model, lang_pair, outcome)
 
     def _get_cache_key(self, messages):
         """生成缓存键"""
@@ -662,35 +2457,57 @@ class DoubaoTranslator:
         key_parts = [f"{m['role']}:{m['content']}" for m in messages]
         return hash(tuple(key_parts))
 
-    def _get_from_cache(self, key):
-        """从缓存获取响应"""
-        if key in self._response_cache:
-            cached_item = self._response_cache[key]
-            if time.time() - cached_item['timestamp'] < self._cache_ttl:
-                return cached_item['response']
-            else:
-                del self._response_cache[key]
-        return None
+    def _make_cache_key(self, kind: str, text: str, src: str = None, dest: str = None, style: str = None) -> str:
+        """生成缓存键
+
+        对文本、语言、模型、风格和提示词模板版本取哈希，
+        可在进程间和持久化缓存中稳定复用。
+        """
+        key_parts = [PROMPT_TEMPLATE_VERSION, kind, self.model, text, src, dest, style]
+        return hashlib.sha256(json.dumps(key_parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    async def _get_from_cache(self, key):
+        """从缓存获取响应，内存未命中时在缓存线程中查询持久化缓存"""
+        with self.tracer.span('cache', _CURRENT_REQUEST_ID.get()) as span:
+            response = self._response_cache.get(key)
+            if response is None and self.cache_backend is not None:
+                try:
+                    response = await asyncio.get_running_loop().run_in_executor(
+                        self._cache_executor, self.cache_backend.get, key
+                    )
+                except Exception as e:
+                    logger.warning(f"Persistent cache lookup failed: {str(e)}")
+                    response = None
+                if response is not None:
+                    self._response_cache.set(key, response)
+                    span.set_attribute('source', 'persistent')
+            span.set_attribute('hit', response is not None)
+            return response
 
     def _add_to_cache(self, key, response):
-        """添加响应到缓存"""
-        self._response_cache[key] = {
-            'response': response,
-            'timestamp': time.time()
-        }
-        
-        # 清理过期缓存
-        self._cleanup_cache()
-
-    def _cleanup_cache(self):
-        """清理过期缓存"""
-        current_time = time.time()
-        expired_keys = [
-            k for k, v in self._response_cache.items()
-            if current_time - v['timestamp'] > self._cache_ttl
-        ]
-        for k in expired_keys:
-            del self._response_cache[k]
+        """添加响应到缓存，持久化缓存在缓存线程中后台写入"""
+        self._response_cache.set(key, response)
+
+        if self.cache_backend is not None:
+            self._cache_executor.submit(self._write_persistent_cache, key, response)
+
+    def _write_persistent_cache(self, key, response):
+        """在缓存线程中写入持久化缓存，失败只记录警告"""
+        try:
+            self.cache_backend.set(key, response)
+        except Exception as e:
+            logger.warning(f"Persistent cache write failed: {str(e)}")
+
+    async def _close_cache_backend(self):
+        """等待已提交的持久化缓存写入完成后关闭持久化缓存"""
+        if self.cache_backend is not None:
+            await asyncio.get_running_loop().run_in_executor(self._cache_executor, self.cache_backend.close)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取内存缓存的命中、未命中和淘汰统计，single_flight为并发相同请求的合并统计"""
+        stats = self._response_cache.get_stats()
+        stats['single_flight'] = self._inflight.get_stats()
+        return stats
 
     async def _init_session(self):
         """初始化异步会话"""
@@ -703,14 +2520,184 @@ class DoubaoTranslator:
             await self.session.close()
             self.session = None
 
-    async def translate_batch(self, texts: List[str], dest='en', src='auto', batch_size=10) -> List[DoubaoTranslated]:
+    def _build_pack_messages(self, texts: List[str], dest: str, src: str,
+                             glossary_terms: Optional[List[Tuple[str, str]]] = None) -> List[Dict[str, str]]:
+        """构建多段打包翻译的请求消息，使用编号JSON对象作为信封"""
+        payload = json.dumps(
+            {str(i + 1): text for i, text in enumerate(texts)},
+            ensure_ascii=False
+        )
+        src_desc = "自动识别的源语言" if src == 'auto' else src
+        return self.pack_template.build(
+            f"将以下JSON对象中的每个值从{src_desc}翻译成{dest}：\n{payload}",
+            self._format_glossary_constraints(glossary_terms) if glossary_terms else ""
+        )
+
+    def _extract_json_object(self, response: str) -> Optional[Dict[str, Any]]:
+        """从响应中提取最外层的JSON对象，无法解析时返回None"""
+        if not response:
+            return None
+        start = response.find('{')
+        end = response.rfind('}')
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(response[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _parse_pack_response(self, response: str, count: int) -> Optional[List[str]]:
+        """解析打包翻译的响应，结构或条目数不匹配时返回None"""
+        return self._parse_pack_items(self._extract_json_object(response), count)
+
+    def _parse_pack_items(self, data: Optional[Dict[str, Any]], count: int) -> Optional[List[str]]:
+        """按编号"1".."count"取出打包结果，结构或条目数不匹配时返回None"""
+        if not isinstance(data, dict) or len(data) != count:
+            return None
+        translations = []
+        for i in range(1, count + 1):
+            value = data.get(str(i))
+            if not isinstance(value, str):
+                return None
+            translations.append(value.strip())
+        return translations
+
+    @_with_request_id
+    async def _translate_pack(self, texts: List[str], dest: str, src: str,
+                              use_glossary: bool = False) -> List[DoubaoTranslated]:
+        """在一次请求中翻译多个短文本
+
+        响应的段数或结构不匹配时，将该批二分后分别重试，
+        直到退化为单条翻译。启用术语表时，整包匹配到的术语合并写入提示词，
+        再按各条文本自身匹配到的术语分别校验。
+        """
+        if len(texts) == 1:
+            return [await self._doubao_translate_single(texts[0], dest, src, False, use_glossary)]
+
+        use_glossary = use_glossary and bool(self.glossary)
+        style = f"glossary:{self._get_glossary_fingerprint()}" if use_glossary else None
+        item_terms = [
+            self._match_glossary_terms(text, src, dest) if use_glossary else []
+            for text in texts
+        ]
+        pack_terms = list(dict.fromkeys(term for terms in item_terms for term in terms))
+
+        response = await self._make_request(
+            self._build_pack_messages(texts, dest, src, pack_terms), stream=False,
+            operation='translate', lang_pair=f"{src}->{dest}"
+        )
+        translations = self._parse_pack_response(response, len(texts))
+        if translations is None:
+            logger.warning(f"Packed response mismatch for {len(texts)} segments, bisecting")
+            mid = len(texts) // 2
+            left, right = await asyncio.gather(
+                self._translate_pack(texts[:mid], dest, src, use_glossary),
+                self._translate_pack(texts[mid:], dest, src, use_glossary)
+            )
+            return left + right
+
+        results = []
+        for text, translated_text, terms in zip(texts, translations, item_terms):
+            if terms:
+                translated_text = self._enforce_glossary(translated_text, terms)
+            result = DoubaoTranslated(src=src, dest=dest, origin=text, text=translated_text)
+            self._add_to_cache(self._make_cache_key('translate', text, src, dest, style), result)
+            results.append(result)
+        return results
+
+    async def _translate_batch_packed(self, texts: List[str], dest: str, srcs: List[str],
+                                      processor: 'BatchProcessor',
+                                      use_glossary: bool = False) -> List[DoubaoTranslated]:
+        """打包模式的批量翻译
+
+        命中缓存的文本直接返回，其余按源语言分组，再按数量和令牌预算打包请求。
+        """
+        results: List[Optional[DoubaoTranslated]] = [None] * len(texts)
+        style = f"glossary:{self._get_glossary_fingerprint()}" if use_glossary and self.glossary else None
+        pending = []
+        for i, (text, src) in enumerate(zip(texts, srcs)):
+            stripped = text.strip()
+            if not stripped:
+                results[i] = DoubaoTranslated(src, dest, stripped, stripped)
+                continue
+            cached_result = await self._get_from_cache(self._make_cache_key('translate', stripped, src, dest, style))
+            if cached_result:
+                results[i] = cached_result
+            else:
+                pending.append((i, stripped, src))
+        pending.sort(key=lambda item: item[2])
+
+        async def translate_pack(pack: List[Tuple[int, str, str]]) -> List[DoubaoTranslated]:
+            pack_texts = [text for _, text, _ in pack]
+            pack_src = pack[0][2]
+            try:
+                return await self._translate_pack(pack_texts, dest, pack_src, use_glossary)
+            except Exception as e:
+                logger.error(f"Packed translation failed for {len(pack)} texts. Error: {str(e)}")
+                return [
+                    DoubaoTranslated(src=pack_src, dest=dest, origin=text, text=f"Translation failed: {str(e)}")
+                    for text in pack_texts
+                ]
+
+        token_budget = self.perf_config.get('pack_token_budget', self.perf_config['max_tokens'] // 3)
+        pack_results = await processor.process_batches(
+            pending,
+            translate_pack,
+            weigh=lambda item: _estimate_tokens(item[1]) + 4,  # 额外计入JSON键和引号的开销
+            max_weight=token_budget,
+            group_key=lambda item: item[2]
+        )
+        for (i, _, _), result in zip(pending, pack_results):
+            results[i] = result
+        return results
+
+    @staticmethod
+    def _dedupe_texts(texts: List[str]) -> Tuple[List[str], List[int]]:
+        """按规范化文本（去除首尾空白并做NFC规范化）去重
+
+        Returns:
+            (去重后的文本列表, 每个原始文本对应的去重后下标)
+        """
+        positions: Dict[str, int] = {}
+        unique: List[str] = []
+        index_map: List[int] = []
+        for text in texts:
+            key = unicodedata.normalize('NFC', text.strip())
+            position = positions.get(key)
+            if position is None:
+                position = positions[key] = len(unique)
+                unique.append(text)
+            index_map.append(position)
+        return unique, index_map
+
+    @staticmethod
+    def _fan_out(texts: List[str], index_map: List[int],
+                 unique_results: List[DoubaoTranslated]) -> List[DoubaoTranslated]:
+        """将去重后的翻译结果按原始顺序展开，origin与原文不同时复制结果并保留原文"""
+        results = []
+        for text, position in zip(texts, index_map):
+            result = unique_results[position]
+            origin = text.strip()
+            if result is not None and result.origin != origin:
+                result = DoubaoTranslated(result.src, result.dest, origin, result.text, result.pronunciation)
+            results.append(result)
+        return results
+
+    async def translate_batch(self, texts: List[str], dest='en', src='auto', batch_size=10,
+                              packed: bool = False, use_glossary: bool = False) -> List[DoubaoTranslated]:
         """异步批量翻译
 
+        规范化后相同的文本只翻译一次，结果按原始顺序展开到每个位置。
+
         Args:
             texts: 要翻译的文本列表
             dest: 目标语言代码
             src: 源语言代码（auto为自动检测）
-            batch_size: 每批处理的文本数量
+            batch_size: 打包模式下每个请求包含的最大文本数量
+            packed: 是否启用打包模式，将多个短文本合并到一次请求中翻译，
+                单个包的大小同时受性能配置pack_token_budget限制
+            use_glossary: 是否将匹配到的术语作为约束写入提示词
 
         Returns:
             翻译结果列表
@@ -720,33 +2707,136 @@ class DoubaoTranslator:
 
         start_time = time.time()
         processor = BatchProcessor(
-            max_workers=self.perf_config['max_workers'],
+            max_workers=self._batch_workers(),
             batch_size=batch_size
         )
 
-        async def translate_single(text: str) -> DoubaoTranslated:
+        async def translate_single(item: Tuple[str, str]) -> DoubaoTranslated:
+            text, item_src = item
             try:
-                return await self._doubao_translate_single(text, dest, src, False)
+                return await self._doubao_translate_single(text, dest, item_src, False, use_glossary)
             except Exception as e:
                 logger.error(f"Translation failed: {text[:50]}... Error: {str(e)}")
                 return DoubaoTranslated(
-                    src=src,
+                    src=item_src,
                     dest=dest,
                     origin=text,
                     text=f"Translation failed: {str(e)}"
                 )
 
         try:
-            results = await processor.process(texts, translate_single)
+            unique_texts, index_map = self._dedupe_texts(texts)
+            dedup_ratio = 1 - len(unique_texts) / len(texts)
+            self._record_dedup(len(texts), len(unique_texts))
+
+            # 自动检测时先一次性确定整批文本的源语言，避免逐条检测
+            srcs = [src] * len(unique_texts)
+            if src == 'auto':
+                try:
+                    detections = await self.doubao_detect_batch(unique_texts)
+                    srcs = [d.lang if d else 'auto' for d in detections]
+                except Exception as e:
+                    logger.warning(f"Batch language detection failed, detecting per item: {str(e)}")
+
+            if packed:
+                unique_results = await self._translate_batch_packed(unique_texts, dest, srcs, processor, use_glossary)
+            else:
+                unique_results = await processor.process(list(zip(unique_texts, srcs)), translate_single)
+            results = self._fan_out(texts, index_map, unique_results)
             
             duration = time.time() - start_time
             success_count = sum(1 for r in results if r and not r.text.startswith("Translation failed"))
-            logger.info(f"Batch translation completed in {duration:.2f}s - {len(texts)} texts, {success_count} successful")
+            logger.info(f"Batch translation completed in {duration:.2f}s - {len(texts)} texts, "
+                        f"{len(unique_texts)} unique (dedup ratio {dedup_ratio:.1%}), {success_count} successful")
             
             return results
         finally:
             await processor.stop()
 
+    @staticmethod
+    async def _iterate_async(items: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+        """将同步或异步可迭代对象统一为异步迭代"""
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+
+    async def translate_batch_as_completed(self, texts: Union[Iterable[str], AsyncIterable[str]],
+                                           dest='en', src='auto', window: Optional[int] = None,
+                                           ordered: bool = False,
+                                           use_glossary: bool = False) -> AsyncIterator[Tuple[int, DoubaoTranslated]]:
+        """流式批量翻译，每条完成后立即产出结果
+
+        输入按需读取，在途条目数量始终不超过window，内存占用与输入总量无关。
+
+        Args:
+            texts: 要翻译的文本，可以是任意可迭代对象或异步可迭代对象
+            dest: 目标语言代码
+            src: 源语言代码（auto为自动检测）
+            window: 同时在途的最大条目数，默认为并发上限上界的2倍
+            ordered: 是否按输入顺序产出。按序产出时，已完成但未轮到的结果暂存在重排缓冲区中，
+                缓冲区与在途条目合计不超过window
+            use_glossary: 是否将匹配到的术语作为约束写入提示词
+
+        Yields:
+            (输入序号, DoubaoTranslated)元组，翻译失败的条目文本以"Translation failed"开头
+        """
+        window = max(window or self._batch_workers() * 2, 1)
+
+        async def translate_single(text: str) -> DoubaoTranslated:
+            try:
+                return await self._doubao_translate_single(text, dest, src, False, use_glossary)
+            except Exception as e:
+                logger.error(f"Translation failed: {text[:50]}... Error: {str(e)}")
+                return DoubaoTranslated(
+                    src=src,
+                    dest=dest,
+                    origin=text,
+                    text=f"Translation failed: {str(e)}"
+                )
+
+        iterator = self._iterate_async(texts).__aiter__()
+        in_flight: Dict[asyncio.Future, int] = {}
+        reorder_buffer: Dict[int, DoubaoTranslated] = {}
+        next_index = 0
+        next_to_yield = 0
+        exhausted = False
+        start_time = time.time()
+
+        try:
+            while True:
+                # 补足窗口
+                while not exhausted and len(in_flight) + len(reorder_buffer) < window:
+                    try:
+                        text = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    in_flight[asyncio.ensure_future(translate_single(text))] = next_index
+                    next_index += 1
+
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = in_flight.pop(task)
+                    if ordered:
+                        reorder_buffer[index] = task.result()
+                    else:
+                        yield index, task.result()
+
+                while next_to_yield in reorder_buffer:
+                    yield next_to_yield, reorder_buffer.pop(next_to_yield)
+                    next_to_yield += 1
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        logger.info(f"Streaming batch translation completed in {time.time() - start_time:.2f}s - {next_index} texts")
+
     def translate_batch_sync(self, texts: List[str], dest='en', src='auto') -> List[DoubaoTranslated]:
         """同步批量翻译实现
 
@@ -779,6 +2869,7 @@ class DoubaoTranslator:
             
             with path.open('r', encoding='utf-8') as f:
                 self.glossary = json.load(f)
+            self._invalidate_glossary()
             
             logger.info(f"Loaded glossary with {len(self.glossary)} terms from {path}")
         except json.JSONDecodeError as e:
@@ -811,8 +2902,94 @@ class DoubaoTranslator:
         :param translations: 各语言的翻译
         """
         self.glossary[term_id] = translations
+        self._invalidate_glossary()
         logger.debug(f"Added/updated term: {term_id} with translations: {translations}")
 
+    def _invalidate_glossary(self) -> None:
+        """术语表变更后清除已编译的匹配器和指纹"""
+        self._glossary_matchers.clear()
+        self._glossary_fingerprint = None
+
+    def _get_glossary_fingerprint(self) -> str:
+        """术语表内容指纹，用于区分不同术语表下的缓存结果"""
+        if self._glossary_fingerprint is None:
+            content = json.dumps(self.glossary, ensure_ascii=False, sort_keys=True)
+            self._glossary_fingerprint = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        return self._glossary_fingerprint
+
+    def _match_glossary_terms(self, text: str, src: str, dest: str) -> List[Tuple[str, str]]:
+        """找出文本中出现的术语，返回去重后的(源语言术语, 目标语言术语)列表"""
+        if not self.glossary or src == 'auto':
+            return []
+        with self.tracer.span('glossary', _CURRENT_REQUEST_ID.get(), action='match', length=len(text)) as span:
+            matcher = self._get_glossary_matcher(src, dest)
+            terms = []
+            seen = set()
+            for start, end, index in matcher.find(text):
+                if index not in seen:
+                    seen.add(index)
+                    terms.append((text[start:end], matcher.terms[index][2]))
+            span.set_attribute('matched', len(terms))
+            return terms
+
+    def _format_glossary_constraints(self, terms: List[Tuple[str, str]]) -> str:
+        """将匹配到的术语格式化为提示词中的硬性约束"""
+        if not terms:
+            return ""
+        lines = "\n".join(f"- {source} → {target}" for source, target in terms)
+        return f"术语约束（以下术语必须严格使用指定译法）：\n{lines}"
+
+    def _enforce_glossary(self, translated: str, terms: List[Tuple[str, str]]) -> str:
+        """在本地校验术语约束
+
+        译文中缺少目标术语但保留了源术语原文时直接替换；两者都找不到时记录警告。
+        查找目标术语和源术语使用与GlossaryMatcher相同的规则（不区分大小写、按词边界），
+        只替换匹配到的片段，不会改写更长单词的一部分。
+        """
+        with self.tracer.span('glossary', _CURRENT_REQUEST_ID.get(), action='enforce', terms=len(terms)):
+            fold = GlossaryMatcher._fold
+            targets = GlossaryMatcher([(target, target, target) for _, target in terms])
+            present = {fold(targets.terms[index][1]) for _, _, index in targets.find(translated)}
+            missing = [(source, target) for source, target in terms if fold(target) not in present]
+            if not missing:
+                return translated
+
+            sources = GlossaryMatcher([(source, source, target) for source, target in missing])
+            parts = []
+            last = 0
+            replaced = set()
+            for start, end, index in sources.find(translated):
+                _, source, target = sources.terms[index]
+                parts.append(translated[last:start])
+                parts.append(target)
+                last = end
+                replaced.add(fold(source))
+            parts.append(translated[last:])
+
+            for source, target in missing:
+                if fold(source) in replaced:
+                    logger.debug(f"Glossary term enforced locally: {source} -> {target}")
+                else:
+                    logger.warning(f"Glossary term not found in translation: {source} -> {target}")
+            return ''.join(parts)
+
+    def _get_glossary_matcher(self, src: str, dest: str) -> GlossaryMatcher:
+        """获取指定语言对的术语匹配器，首次使用时构建
+
+        直接修改self.glossary后需调用add_term或load_glossary使匹配器失效。
+        """
+        matcher = self._glossary_matchers.get((src, dest))
+        if matcher is None:
+            terms = [
+                (term_id, translations[src], translations[dest])
+                for term_id, translations in self.glossary.items()
+                if isinstance(translations.get(src), str) and isinstance(translations.get(dest), str)
+            ]
+            matcher = GlossaryMatcher(terms)
+            self._glossary_matchers[(src, dest)] = matcher
+            logger.debug(f"Built glossary matcher for {src}->{dest} with {len(matcher)} terms")
+        return matcher
+
     async def apply_glossary(self, text: str, src: str, dest: str) -> DoubaoTranslated:
         """应用术语表进行翻译"""
         if not self.glossary:
@@ -823,24 +3000,19 @@ class DoubaoTranslator:
             replacements = {}
             placeholder_format = "[[TERM_{}_]]"
             
-            # 第一步：替换术语为占位符
-            modified_text = text
-            for term_id, translations in self.glossary.items():
-                if src in translations and dest in translations:
-                    source_term = translations[src]
-                    target_term = translations[dest]
-                    
-                    # 使用正则表达式进行完整词匹配
-                    pattern = r'\b' + re.escape(source_term) + r'\b'
-                    if re.search(pattern, modified_text, re.IGNORECASE):
-                        placeholder = placeholder_format.format(term_id)
-                        modified_text = re.sub(
-                            pattern,
-                            placeholder,
-                            modified_text,
-                            flags=re.IGNORECASE
-                        )
-                        replacements[placeholder] = target_term
+            # 第一步：使用预编译的匹配器一次扫描找出所有术语，替换为占位符
+            matcher = self._get_glossary_matcher(src, dest)
+            pieces = []
+            last_end = 0
+            for start, end, index in matcher.find(text):
+                term_id, _, target_term = matcher.terms[index]
+                placeholder = placeholder_format.format(term_id)
+                pieces.append(text[last_end:start])
+                pieces.append(placeholder)
+                last_end = end
+                replacements[placeholder] = target_term
+            pieces.append(text[last_end:])
+            modified_text = ''.join(pieces)
 
             # 如果没有找到任何术语匹配，直接翻译原文
             if not replacements:
@@ -871,55 +3043,119 @@ class DoubaoTranslator:
         """
         return self.glossary.get(term_id)
 
-    async def _doubao_translate_single(self, text: str, dest: str, src: str, stream: bool):
-        """单个文本翻译实现"""
+    async def _translate_segmented(self, text: str, dest: str, src: str, use_glossary: bool) -> str:
+        """将长文本切分后并发翻译，并按原顺序拼接译文"""
+        segments = self.segmenter.split(text, src)
+        logger.info(f"Splitting long text ({len(text)} chars) into {len(segments)} segments")
+
+        async def translate_segment(segment: str) -> str:
+            core = segment.strip()
+            if not core:
+                return segment
+            result = await self._doubao_translate_single(
+                core, dest, src, False, use_glossary, allow_segment=False
+            )
+            leading = segment[:len(segment) - len(segment.lstrip())]
+            trailing = segment[len(segment.rstrip()):]
+            return f"{leading}{result.text}{trailing}"
+
+        translated_segments = await asyncio.gather(*(translate_segment(seg) for seg in segments))
+
+        # 源文本片段间没有空白而目标语言以空格分词时补一个空格
+        parts = []
+        for piece in translated_segments:
+            if (parts and dest not in ('zh', 'ja', 'th') and
+                    not parts[-1][-1:].isspace() and not piece[:1].isspace()):
+                parts.append(' ')
+            parts.append(piece)
+        return ''.join(parts).strip()
+
+    @_with_request_id
+    async def _doubao_translate_single(self, text: str, dest: str, src: str, stream: bool,
+                                       use_glossary: bool = False, allow_segment: bool = True,
+                                       hedge: bool = False):
+        """单个文本翻译实现
+
+        use_glossary为True时，将文本中匹配到的术语作为约束写入提示词，并在本地校验译文。
+        预计输出超出令牌预算的长文本会自动切分并发翻译（allow_segment为False时除外）。
+        hedge为True时发起对冲请求，只有doubao_translate的单个文本翻译会开启。
+        """
         try:
             text = text.strip()
             if not text:
                 return DoubaoTranslated(src, dest, text, text)
 
+            use_glossary = use_glossary and bool(self.glossary)
+            style = f"glossary:{self._get_glossary_fingerprint()}" if use_glossary else None
+
             # 对于流式翻译，不使用缓存
-            if not stream:
-                cache_key = f"{text}:{src}:{dest}"
-                cached_result = self._get_from_cache(cache_key)
-                if cached_result:
-                    return cached_result
+            if stream:
+                return await self._translate_uncached(text, dest, src, True, use_glossary, allow_segment, hedge)
 
-            if src == 'auto':
-                try:
-                    detected = await self.doubao_detect(text)
-                    src = detected.lang
-                except Exception as e:
-                    logger.warning(f"Language detection failed, using 'auto': {str(e)}")
+            cache_key = self._make_cache_key('translate', text, src, dest, style)
+            cached_result = await self._get_from_cache(cache_key)
+            if cached_result:
+                return cached_result
+            # 缓存未命中时，相同文本的并发请求共享同一次翻译
+            return await self._inflight.do(cache_key, lambda: self._translate_uncached(
+                text, dest, src, False, use_glossary, allow_segment, hedge, cache_key))
 
-            prompt = f"将以下{src}文本翻译成{dest}：\n{text}"
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt}
-            ]
+        except Exception as e:
+            logger.error(f"Translation failed for text: {text[:50]}... Error: {str(e)}")
+            raise DoubaoAPIError(f"翻译失败: {str(e)}")
 
-            start_time = time.time()
-            translated_text = await self._make_request(messages, stream=False)
-            duration = time.time() - start_time
-            self.metrics.record_request(duration, True)
+    async def _translate_uncached(self, text: str, dest: str, src: str, stream: bool, use_glossary: bool,
+                                  allow_segment: bool, hedge: bool,
+                                  cache_key: Optional[str] = None) -> DoubaoTranslated:
+        """检测语言并调用API翻译单个文本，给出cache_key时将结果写入缓存"""
+        if src == 'auto':
+            try:
+                detected = await self.doubao_detect(text)
+                src = detected.lang
+            except Exception as e:
+                logger.warning(f"Language detection failed, using 'auto': {str(e)}")
 
+        if allow_segment and not stream and self.perf_config.get('auto_segment', True) \
+                and self.segmenter.needs_split(text):
             result = DoubaoTranslated(
                 src=src,
                 dest=dest,
                 origin=text,
-                text=translated_text.strip()
+                text=await self._translate_segmented(text, dest, src, use_glossary)
             )
-
-            # 只缓存非流式翻译结果
-            if not stream:
+            if cache_key is not None:
                 self._add_to_cache(cache_key, result)
             return result
 
-        except Exception as e:
-            logger.error(f"Translation failed for text: {text[:50]}... Error: {str(e)}")
-            raise DoubaoAPIError(f"翻译失败: {str(e)}")
+        glossary_terms = self._match_glossary_terms(text, src, dest) if use_glossary else []
+        messages = self.translate_template.build(
+            f"将以下{src}文本翻译成{dest}：\n{text}",
+            self._format_glossary_constraints(glossary_terms) if glossary_terms else ""
+        )
+
+        translated_text = await self._make_request(messages, stream=False, operation='translate',
+                                                   lang_pair=f"{src}->{dest}", hedge=hedge)
+
+        translated_text = translated_text.strip()
+        if glossary_terms:
+            translated_text = self._enforce_glossary(translated_text, glossary_terms)
+
+        result = DoubaoTranslated(
+            src=src,
+            dest=dest,
+            origin=text,
+            text=translated_text
+        )
 
-    async def doubao_translate(self, text: Union[str, List[str]], dest='en', src='auto', stream=False) -> Union[DoubaoTranslated, List[DoubaoTranslated]]:
+        # 只缓存非流式翻译结果
+        if cache_key is not None:
+            self._add_to_cache(cache_key, result)
+        return result
+
+    async def doubao_translate(self, text: Union[str, List[str]], dest='en', src='auto', stream=False,
+                               stream_deltas: bool = False,
+                               coalesce: Union[str, float, None] = None,
+                               hedge: bool = False) -> Union[DoubaoTranslated, List[DoubaoTranslated], 'StreamTranslator']:
         """
         翻译文本，支持批量处理和流式翻译
 
@@ -928,9 +3164,15 @@ class DoubaoTranslator:
             dest: 目标语言
             src: 源语言
             stream: 是否使用流式翻译
+            stream_deltas: 流式翻译时是否产出DoubaoStreamDelta增量事件，
+                而不是每次产出包含完整前缀的DoubaoTranslated
+            coalesce: 流式翻译时合并分块的方式，'sentence'表示在句末产出，
+                数值表示两次产出的最小间隔秒数
+            hedge: 单个文本非流式翻译时是否发起对冲请求以降低尾延迟，
+                批量、文档和长文本切分后的分段翻译不会对冲
 
         Returns:
-            翻译结果或生成器（流式翻译时）
+            翻译结果或StreamTranslator异步迭代器（流式翻译时）
         """
         # 验证语言代码
         if src != 'auto' and src not in DOUBAO_LANGUAGES:
@@ -945,42 +3187,11 @@ class DoubaoTranslator:
             return result
         
         if not stream:
-            result = await self._doubao_translate_single(text, dest, src, False)
+            result = await self._doubao_translate_single(text, dest, src, False, hedge=hedge)
             return result
             
         # 流式翻译逻辑
-        async def stream_translate():
-            text_to_translate = text.strip()
-            if not text_to_translate:
-                yield DoubaoTranslated(src, dest, text_to_translate, text_to_translate)
-                return
-
-            current_src = src
-            if current_src == 'auto':
-                try:
-                    detected = await self.doubao_detect(text_to_translate)
-                    current_src = detected.lang
-                except Exception as e:
-                    logger.warning(f"Language detection failed, using 'auto': {str(e)}")
-
-            prompt = f"将以下{current_src}文本翻译成{dest}：\n{text_to_translate}"
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-
-            try:
-                response_stream = await self._make_request(messages, stream=True)
-                translated_text = ""
-                async for chunk in response_stream:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        translated_text += chunk.choices[0].delta.content
-                        yield DoubaoTranslated(current_src, dest, text_to_translate, translated_text)
-            except Exception as e:
-                logger.error(f"Streaming translation failed: {str(e)}")
-                raise DoubaoAPIError(f"流式翻译失败: {str(e)}")
-        
-        return stream_translate()
+        return StreamTranslator(self, text, dest, src, deltas=stream_deltas, coalesce=coalesce)
 
     def _normalize_detection_result(self, detected_text: str) -> str:
         """规范化语言检测结果"""
@@ -1006,39 +3217,231 @@ class DoubaoTranslator:
         
         return detected_text.lower()
 
-    @retry(stop=stop_after_attempt(MAX_RETRIES), wait=wait_exponential(multiplier=1, min=4, max=10))
+    def _detect_local(self, text: str) -> Optional[DoubaoDetected]:
+        """本地语言检测
+
+        先统计Unicode文字分布：假名、谚文、阿拉伯文、泰文、西里尔文和天城文可直接确定语言，
+        汉字与拉丁字母混排时汉字按3倍权重计算；以拉丁字母为主的文本交给langdetect判断，
+        短文本的置信度按长度折减。无法判断时返回None。
+        """
+        sample = text[:2000]
+        scripts = {}
+        for script, pattern in SCRIPT_PATTERNS.items():
+            count = len(pattern.findall(sample))
+            if count:
+                scripts[script] = count
+        if not scripts:
+            return None
+
+        # 汉字和假名一个字符通常就是一个词，加权后再与拉丁字母比较
+        weighted = {
+            script: count * 3 if script in ('han', 'kana', 'hangul') else count
+            for script, count in scripts.items()
+        }
+        # 日文以汉字和假名混排，两者合并计算
+        if 'kana' in weighted:
+            weighted['kana'] += weighted.pop('han', 0)
+        dominant, dominant_weight = max(weighted.items(), key=lambda x: x[1])
+        share = dominant_weight / sum(weighted.values())
+        details = {'source': 'local', 'method': 'script', 'scripts': scripts}
+
+        if dominant == 'kana':
+            lang = 'ja'
+        elif dominant == 'han':
+            lang = 'zh'
+        elif dominant in SCRIPT_LANGUAGES:
+            lang = SCRIPT_LANGUAGES[dominant]
+        else:
+            try:
+                candidates = detect_langs(sample)
+            except LangDetectException:
+                return None
+            best = candidates[0]
+            lang = LANG_CODE_MAP.get(best.lang.lower(), best.lang.lower())
+            # 拉丁字母短文本区分度低，按字母数折减置信度
+            share *= best.prob * min(1.0, scripts['latin'] / 20)
+            if lang not in DOUBAO_LANGUAGES:
+                share *= 0.5
+            details['method'] = 'langdetect'
+
+        details['confidence'] = share
+        return DoubaoDetected(lang, share, details)
+
+    @_with_request_id
     async def doubao_detect(self, text: str) -> DoubaoDetected:
         """
         检测文本语言
 
+        优先使用本地检测，本地置信度低于性能配置local_detect_threshold时依次查询缓存和调用API，
+        相同文本的并发API检测共享同一次请求，结果写入缓存。检测来源和置信度记录在返回结果的details中。
+
         :param text: 要检测语言的文本
         :return: DoubaoDetected对象
         """
+        with self.tracer.span('detect', _CURRENT_REQUEST_ID.get(), length=len(text)) as span:
+            local_result = None
+            if self.perf_config.get('local_detection', True):
+                local_result = self._detect_local(text)
+                if local_result and local_result.confidence >= self.perf_config.get('local_detect_threshold', 0.8):
+                    span.set_attribute('source', 'local')
+                    return local_result
+
+            cache_key = self._make_cache_key('detect', text)
+            result = await self._get_from_cache(cache_key)
+            if result is not None:
+                span.set_attribute('source', 'cache')
+            else:
+                span.set_attribute('source', 'api')
+                result = await self._inflight.do(cache_key, lambda: self._detect_via_api(text, cache_key))
+            if local_result:
+                # 结果可能被并发的检测共享，复制后再附加本地检测信息
+                details = dict(result.details)
+                details['local'] = {'lang': local_result.lang, 'confidence': local_result.confidence}
+                result = DoubaoDetected(result.lang, result.confidence, details)
+            return result
+
+    @_with_request_id
+    async def _detect_via_api(self, text: str, cache_key: Optional[str] = None) -> DoubaoDetected:
+        """调用豆包API检测文本语言，给出cache_key时将结果写入缓存"""
         try:
-            messages = [
-                {"role": "system", "content": "你是豆包语言检测助手，请只返回检测到的语言代码，例如：en、zh、ja等"},
-                {"role": "user", "content": f"检测下面文本的语言：\n{text}"}
-            ]
+            messages = self.detect_template.build(f"检测下面文本的语言：\n{text}")
 
-            response = await self._make_request(messages)
+            response = await self._make_request(messages, operation='detect')
             # 直接使用返回的字符串，因为_make_request已经处理了response.choices[0].message.content
             detected_lang = self._normalize_detection_result(response)
-            return DoubaoDetected(detected_lang, 1.0)
+            result = DoubaoDetected(detected_lang, 1.0, {'source': 'api', 'confidence': 1.0})
+            if cache_key is not None:
+                self._add_to_cache(cache_key, result)
+            return result
 
         except Exception as e:
             logger.error(f"Language detection failed for text: {text[:50]}... Error: {str(e)}")
             raise
 
-    async def _cached_detect(self, text: str) -> Tuple[str, float]:
-        """缓存的语言检测"""
-        cache_key = f"detect_{text[:100]}"  # 使用前100个字符作为键
-        cached_result = self._get_from_cache(cache_key)
+    @_with_request_id
+    async def _detect_pack(self, texts: List[str]) -> List[DoubaoDetected]:
+        """在一次请求中检测多个文本的语言，结构不匹配时二分重试"""
+        if len(texts) == 1:
+            return [await self._detect_via_api(texts[0])]
+
+        payload = json.dumps({str(i + 1): text for i, text in enumerate(texts)}, ensure_ascii=False)
+        messages = self.detect_pack_template.build(f"检测以下JSON对象中每个值的语言：\n{payload}")
+        response = await self._make_request(messages, operation='detect')
+        codes = self._parse_pack_response(response, len(texts))
+        if codes is None:
+            logger.warning(f"Packed detection response mismatch for {len(texts)} texts, bisecting")
+            mid = len(texts) // 2
+            left, right = await asyncio.gather(self._detect_pack(texts[:mid]), self._detect_pack(texts[mid:]))
+            return left + right
+
+        return [
+            DoubaoDetected(self._normalize_detection_result(code), 1.0, {'source': 'api', 'confidence': 1.0})
+            for code in codes
+        ]
+
+    async def doubao_detect_batch(self, texts: List[str], batch_size: int = 50) -> List[Optional[DoubaoDetected]]:
+        """
+        批量检测文本语言
+
+        依次使用缓存（按完整内容哈希）和本地检测，剩余的文本去重后打包成尽量少的请求；
+        已有相同文本的检测在进行时等待其结果，不再重复发送。
+
+        Args:
+            texts: 要检测语言的文本列表
+            batch_size: 每个检测请求包含的最大文本数量
+
+        Returns:
+            与输入等长的DoubaoDetected列表，检测失败的条目为None
+        """
+        results: List[Optional[DoubaoDetected]] = [None] * len(texts)
+        threshold = self.perf_config.get('local_detect_threshold', 0.8)
+        pending: Dict[str, List[int]] = {}
+        samples: Dict[str, str] = {}
+
+        for i, text in enumerate(texts):
+            text = text.strip()
+            if not text:
+                continue
+            cache_key = self._make_cache_key('detect', text)
+            cached_result = await self._get_from_cache(cache_key)
+            if cached_result:
+                results[i] = cached_result
+                continue
+            if self.perf_config.get('local_detection', True):
+                local_result = self._detect_local(text)
+                if local_result and local_result.confidence >= threshold:
+                    results[i] = local_result
+                    continue
+            pending.setdefault(cache_key, []).append(i)
+            samples[cache_key] = text[:200]  # 检测语言只需要开头部分
+
+        if not pending:
+            return results
+
+        # 其他调用正在检测的文本直接等待其结果，其余文本登记后由本次批量检测完成
+        shared: Dict[str, asyncio.Future] = {}
+        keys = []
+        for key in pending:
+            future = self._inflight.join(key)
+            if future is not None:
+                shared[key] = future
+            else:
+                keys.append(key)
+                self._inflight.claim(key)
+
+        processor = BatchProcessor(max_workers=self._batch_workers(), batch_size=batch_size)
+
+        async def detect_pack(keys: List[str]) -> List[Optional[DoubaoDetected]]:
+            try:
+                return await self._detect_pack([samples[key] for key in keys])
+            except Exception as e:
+                logger.error(f"Batch language detection failed for {len(keys)} texts. Error: {str(e)}")
+                return [None] * len(keys)
+
+        detections: List[Optional[DoubaoDetected]] = []
+        try:
+            if keys:
+                detections = await processor.process_batches(
+                    keys,
+                    detect_pack,
+                    weigh=lambda key: _estimate_tokens(samples[key]) + 4,
+                    max_weight=self.perf_config.get('pack_token_budget', self.perf_config['max_tokens'] // 3) * 4
+                )
+        finally:
+            await processor.stop()
+            for key, detected in itertools.zip_longest(keys, detections):
+                if detected is None:
+                    self._inflight.resolve(key, error=DoubaoAPIError("语言检测失败"))
+                else:
+                    self._add_to_cache(key, detected)
+                    self._inflight.resolve(key, detected)
+
+        for key, detected in zip(keys, detections):
+            if detected is None:
+                continue
+            for i in pending[key]:
+                results[i] = detected
+        for key, future in shared.items():
+            try:
+                detected = await asyncio.shield(future)
+            except Exception:
+                continue
+            for i in pending[key]:
+                results[i] = detected
+        logger.info(f"Batch language detection: {len(texts)} texts, {len(keys)} sent to API, "
+                    f"{len(shared)} shared with in-flight detections")
+        return results
+
+    async def _cached_detect(self, text: str) -> DoubaoDetected:
+        """缓存的语言检测（按完整内容哈希），检测来源记录在结果的details['source']中"""
+        cache_key = self._make_cache_key('detect', text)
+        cached_result = await self._get_from_cache(cache_key)
         if cached_result:
-            return cached_result.lang, cached_result.confidence
+            return cached_result
             
         result = await self.doubao_detect(text)
         self._add_to_cache(cache_key, result)
-        return result.lang, result.confidence
+        return result
 
     async def doubao_detect_enhanced(self, text: str) -> DoubaoDetected:
         """
@@ -1052,25 +3455,33 @@ class DoubaoTranslator:
         try:
             # 初始化结果字典
             lang_scores: Dict[str, float] = {}
+            detection_methods = {'doubao': False, 'local': False, 'langdetect': False}
             
-            # 1. 使用豆包API检测
+            # 1. 使用doubao_detect检测（本地检测或豆包API），按检测来源加权
+            local_langdetect = False
             try:
-                doubao_lang, doubao_confidence = await self._cached_detect(text)
-                lang_scores[doubao_lang] = doubao_confidence * 1.2  # 给豆包结果更高权重
-                logger.debug(f"Doubao detection: {doubao_lang} ({doubao_confidence})")
+                detected = await self._cached_detect(text)
+                source = detected.details.get('source', 'api')
+                lang_scores[detected.lang] = detected.confidence * DETECT_SOURCE_WEIGHTS.get(source, 1.0)
+                detection_methods['doubao' if source == 'api' else source] = True
+                # 本地检测已经使用了langdetect时不再重复计分
+                local_langdetect = source == 'local' and detected.details.get('method') == 'langdetect'
+                logger.debug(f"Detection ({source}): {detected.lang} ({detected.confidence})")
             except Exception as e:
                 logger.warning(f"Doubao detection failed: {str(e)}")
 
             # 2. 使用langdetect检测
-            try:
-                langdetect_results = detect_langs(text)
-                for result in langdetect_results:
-                    normalized_lang = LANG_CODE_MAP.get(result.lang, result.lang)
-                    current_score = lang_scores.get(normalized_lang, 0)
-                    lang_scores[normalized_lang] = current_score + result.prob
-                    logger.debug(f"Langdetect detection: {normalized_lang} ({result.prob})")
-            except LangDetectException as e:
-                logger.warning(f"Langdetect detection failed: {str(e)}")
+            if not local_langdetect:
+                try:
+                    langdetect_results = detect_langs(text)
+                    for result in langdetect_results:
+                        normalized_lang = LANG_CODE_MAP.get(result.lang, result.lang)
+                        current_score = lang_scores.get(normalized_lang, 0)
+                        lang_scores[normalized_lang] = current_score + result.prob
+                        logger.debug(f"Langdetect detection: {normalized_lang} ({result.prob})")
+                    detection_methods['langdetect'] = True
+                except LangDetectException as e:
+                    logger.warning(f"Langdetect detection failed: {str(e)}")
 
             # 3. 如果没有得到任何结果
             if not lang_scores:
@@ -1089,10 +3500,7 @@ class DoubaoTranslator:
                 confidence=confidence,
                 details={
                     'raw_scores': lang_scores,
-                    'detection_methods': {
-                        'doubao': bool('doubao_lang' in locals()),
-                        'langdetect': bool('langdetect_results' in locals())
-                    }
+                    'detection_methods': detection_methods
                 }
             )
 
@@ -1122,6 +3530,8 @@ class DoubaoTranslator:
         """确保资源正确释放"""
         if hasattr(self, 'executor'):
             self.executor.shutdown(wait=False)
+        if hasattr(self, '_cache_executor'):
+            self._cache_executor.shutdown(wait=False)
         if hasattr(self, 'session') and self.session:
             loop = asyncio.get_event_loop()
             if loop.is_running():
@@ -1132,7 +3542,9 @@ class DoubaoTranslator:
                 except Exception:
                     pass  # 忽略关闭时的错误
 
-    async def translate_with_context(self, text: str, context: str, dest='en', src='auto', style_guide=None) -> DoubaoTranslated:
+    @_with_request_id
+    async def translate_with_context(self, text: str, context: str, dest='en', src='auto', style_guide=None,
+                                     use_glossary: bool = True) -> DoubaoTranslated:
         """
         带上下文的翻译，支持风格指南和一致性控制
 
@@ -1142,6 +3554,7 @@ class DoubaoTranslator:
             dest: 目标语言
             src: 源语言（auto为自动检测）
             style_guide: 风格指南（可选）
+            use_glossary: 已加载术语表时，是否将匹配到的术语作为约束写入提示词
 
         Returns:
             DoubaoTranslated对象
@@ -1156,44 +3569,32 @@ class DoubaoTranslator:
                 except Exception as e:
                     logger.warning(f"Language detection failed, using 'auto': {str(e)}")
 
-            # 2. 构建提示词
-            style_instructions = ""
+            # 2. 匹配术语表（如果有），术语作为约束随同一个请求发送
+            glossary_terms = self._match_glossary_terms(text, src, dest) if use_glossary else []
+
+            # 3. 构建提示词：固定的翻译要求和风格指南在前缀中，术语和上下文等可变内容在后
+            template = self.context_template
             if style_guide:
-                style_instructions = f"\n\n风格要求：\n{style_guide}"
+                template = PromptTemplate(template.system, f"{template.instructions}\n\n风格要求：\n{style_guide}")
 
-            prompt = f"""请在理解以下上下文的基础上，将文本从{src}翻译成{dest}：
+            payload = f"""请在理解以下上下文的基础上，将文本从{src}翻译成{dest}：
 
 上下文背景：
 {context}
 
 需要翻译的文本：
-{text}
-
-翻译要求：
-1. 保持与上下文的连贯性和一致性
-2. 保留专业术语准确性
-3. 保持原文的语气和风格
-4. 保持代词指代的正确性
-5. 注意上下文中的特定含义{style_instructions}
-
-请直接返回翻译结果，不要添加任何解释。"""
-
-            # 3. 应用术语表（如果有）
-            if self.glossary:
-                try:
-                    logger.debug("Applying glossary before context translation")
-                    glossary_result = await self.apply_glossary(text, src, dest)
-                    text = glossary_result.text
-                except Exception as e:
-                    logger.warning(f"Glossary application failed: {str(e)}")
+{text}"""
 
             # 4. 发送翻译请求
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt}
-            ]
+            messages = template.build(
+                payload,
+                self._format_glossary_constraints(glossary_terms) if glossary_terms else ""
+            )
 
-            translated_text = await self._make_request(messages, stream=False)
+            translated_text = await self._make_request(messages, stream=False, operation='context',
+                                                       lang_pair=f"{src}->{dest}")
+            if glossary_terms:
+                translated_text = self._enforce_glossary(translated_text, glossary_terms)
 
             # 5. 记录翻译结果
             logger.info(f"Context-aware translation completed for text length: {len(text)}")
@@ -1216,7 +3617,13 @@ class DoubaoTranslator:
                                            src: str = 'auto', 
                                            context_window: int = 2,
                                            batch_size: int = 5,
-                                           style_guide: str = None) -> List[DoubaoTranslated]:
+                                           style_guide: str = None,
+                                           use_glossary: bool = True,
+                                           paragraph_timeout: Optional[float] = None,
+                                           paragraph_retries: int = 0,
+                                           progress_callback=None,
+                                           mode: str = 'paragraph',
+                                           context_budget: Optional[int] = None) -> List[DoubaoTranslated]:
         """
         翻译整个文档，使用滑动窗口保持上下文连贯性
 
@@ -1227,6 +3634,14 @@ class DoubaoTranslator:
             context_window: 上下文窗口大小（前后考虑几个段落）
             batch_size: 批处理大小
             style_guide: 风格指南
+            use_glossary: 已加载术语表时，是否将匹配到的术语作为约束写入提示词
+            paragraph_timeout: 单个段落的超时时间（秒），None表示不限制
+            paragraph_retries: 单个段落失败或超时后的重试次数
+            progress_callback: 进度回调，调用callback(已完成段落数, 段落总数)，返回False时取消剩余段落
+            mode: 'paragraph'逐段请求；'window'每batch_size个连续段落合并为一个请求，
+                减少前后文重复发送的token；'rolling'按顺序逐块翻译，
+                以滚动摘要和术语记忆代替原始前后文，保持长文档的一致性
+            context_budget: rolling模式下文档上下文的token预算
 
         Returns:
             翻译结果列表
@@ -1234,13 +3649,19 @@ class DoubaoTranslator:
         translator = DocumentTranslator(
             translator=self,
             context_window=context_window,
-            batch_size=batch_size
+            batch_size=batch_size,
+            paragraph_timeout=paragraph_timeout,
+            paragraph_retries=paragraph_retries,
+            progress_callback=progress_callback,
+            mode=mode,
+            context_budget=context_budget
         )
         return await translator.translate_document(
             paragraphs=paragraphs,
             dest=dest,
             src=src,
-            style_guide=style_guide
+            style_guide=style_guide,
+            use_glossary=use_glossary
         )
 
     def add_style_template(self, name: str, template: str) -> None:
@@ -1306,6 +3727,7 @@ class DoubaoTranslator:
         
         return False, "风格必须是预定义名称或配置字典"
 
+    @_with_request_id
     async def translate_with_style(self, text: str, dest: str = 'en', src: str = 'auto', 
                             style: Union[str, Dict] = 'formal', context: str = None,
                             max_versions: int = 3) -> DoubaoTranslated:
@@ -1322,42 +3744,13 @@ class DoubaoTranslator:
         """
         start_time = time.time()
         try:
-            # 构建提示信息
-            if isinstance(style, str):
-                if style not in self.style_templates:
-                    raise ValueError(f"未知的预定义风格: {style}")
-                style_prompt = self.style_templates[style]
-                if style == 'creative':
-                    # 动态更新创意风格的版本数限制
-                    style_prompt = f"""
-                    翻译要求：
-                    1. 提供{max_versions}个不同的翻译版本
-                    2. 每个版本使用不同的表达方式
-                    3. 保持原文的核心含义
-                    4. 限制在{max_versions}个版本以内
-                    """
-            else:
-                # 将自定义风格字典转换为提示文本
-                style_prompt = "翻译要求：\n" + "\n".join([f"{k}: {v}" for k, v in style.items()])
-
-            # 添加上下文信息（如果有）
-            context_part = f"\n相关上下文：\n{context}\n" if context else ""
-
-            messages = [
-                {"role": "system", "content": "你是一个专业的翻译手，请按照指定的风格要求进行翻译。"},
-                {"role": "user", "content": f"""
-{style_prompt}
-
-{context_part}
-需要翻译的文本：
-{text}
-
-请直接提供翻译结果，不要添加任何解释。如果是创意风格，最多提供{max_versions}个不同的版本，用分号分隔。
-"""}
-            ]
+            # 风格模板构成固定前缀，上下文和文本放在最后
+            messages = self._get_style_template(style, max_versions).build(
+                self._format_style_payload(text, dest, src, context)
+            )
 
-            response = await self._make_request(messages, stream=False)
-            translated_text = response.choices[0].message.content.strip()
+            translated_text = await self._make_request(messages, stream=False, operation='style',
+                                                       lang_pair=f"{src}->{dest}")
 
             duration = time.time() - start_time
             logger.info(f"Styled translation completed in {duration:.2f}s - Style: {style}, Length: {len(text)}, Languages: {src}->{dest}")
@@ -1373,6 +3766,7 @@ class DoubaoTranslator:
             logger.error(f"Style translation failed: {str(e)}")
             raise Exception(f"风格化翻译失败: {str(e)}")
 
+    @_with_request_id
     async def evaluate_translation(self, original: str, translated: str, src: str, dest: str) -> Dict[str, float]:
         """
         评估翻译质量
@@ -1398,8 +3792,9 @@ class DoubaoTranslator:
                 {"role": "user", "content": prompt}
             ]
             
-            response = await self._make_request(messages)
-            scores = json.loads(response.choices[0].message.content)
+            response = await self._make_request(messages, operation='evaluate',
+                                                lang_pair=f"{src}->{dest}")
+            scores = json.loads(response)
             return scores
 
         except Exception as e:
@@ -1427,10 +3822,34 @@ class DoubaoTranslator:
         # 更新相关实例变量
         if 'cache_ttl' in kwargs:
             self._cache_ttl = kwargs['cache_ttl']
+            self._response_cache.ttl = self._cache_ttl
+        if 'cache_max_entries' in kwargs:
+            self._response_cache.max_entries = kwargs['cache_max_entries']
+        if 'cache_max_bytes' in kwargs:
+            self._response_cache.max_bytes = kwargs['cache_max_bytes']
         if 'min_request_interval' in kwargs:
             self._min_request_interval = kwargs['min_request_interval']
         if 'max_retries' in kwargs:
             self.max_retries = kwargs['max_retries']
+        if {'hedge_percentile', 'hedge_budget_ratio', 'hedge_budget_burst', 'hedge_min_samples',
+                'hedge_min_delay'} & kwargs.keys():
+            self.hedge_policy.update(**self._get_hedge_config())
+        if {'max_retries', 'retry_multiplier', 'retry_max_wait', 'retry_max_after',
+                'retry_budget_ratio', 'retry_budget_burst'} & kwargs.keys():
+            self.retry_policy.update(**self._get_retry_config())
+        if 'segment_max_tokens' in kwargs or 'max_tokens' in kwargs:
+            self.segmenter.max_tokens = self.perf_config.get(
+                'segment_max_tokens', self.perf_config['max_tokens'] // 2
+            )
+        if {'min_request_interval', 'requests_per_second', 'tokens_per_minute', 'rate_limit_burst'} & kwargs.keys():
+            self.rate_limiter.update(**self._get_rate_limit_config())
+        if {'max_workers', 'min_concurrency', 'max_concurrency', 'adaptive_concurrency',
+                'concurrency_backoff', 'concurrency_latency_tolerance'} & kwargs.keys():
+            config = self._get_concurrency_config()
+            if 'max_workers' not in kwargs:
+                # 未修改初始上限时保留当前已调整的上限
+                config['initial_limit'] = None
+            self.concurrency.update(**config)
 
     async def test_connection(self) -> bool:
         """测试API连接和认证"""
@@ -1458,6 +3877,10 @@ class DoubaoTranslator:
             'performance_config': self.perf_config,
             'cache_ttl': self._cache_ttl,
             'min_request_interval': self._min_request_interval,
+            'rate_limit': self._get_rate_limit_config(),
+            'concurrency': self.concurrency.get_stats(),
+            'retry': self.retry_policy.get_stats(),
+            'hedge': self.hedge_policy.get_stats(),
             'max_retries': self.max_retries
         }
 
@@ -1495,6 +3918,7 @@ class DoubaoTranslator:
             await self.client_manager.cleanup()
             if hasattr(self, 'executor'):
                 self.executor.shutdown(wait=False)
+            await self._close_cache_backend()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
             if exc_type is None:
@@ -1521,6 +3945,7 @@ class DoubaoTranslator:
             
             # 清理缓存
             self._response_cache.clear()
+            await self._close_cache_backend()
             
             logger.debug("Resources cleaned up successfully")
         except Exception as e:
@@ -1547,16 +3972,139 @@ DOUBAO_LANGUAGES = {
     'hi': 'hindi'
 }
 
+class DocumentContext:
+    """文档级滚动上下文
+
+    保存已翻译部分的压缩摘要和已确定的术语/专有名词译法，
+    渲染时按token预算截断，代替原始的相邻段落作为提示词上下文。
+    """
+
+    def __init__(self, max_tokens: int = 512, summary_ratio: float = 0.5):
+        """
+        Args:
+            max_tokens: 渲染后上下文的token预算
+            summary_ratio: 预算中分配给摘要的比例，其余用于术语表
+        """
+        self.max_tokens = max_tokens
+        self.summary_ratio = summary_ratio
+        self.summary = ""
+        self.terms = OrderedDict()
+
+    @property
+    def summary_budget(self) -> int:
+        return max(int(self.max_tokens * self.summary_ratio), 1)
+
+    def clear(self):
+        self.summary = ""
+        self.terms.clear()
+
+    def update(self, summary: Optional[str] = None, terms: Optional[Dict[str, str]] = None):
+        """合并新的摘要和术语，已确定的术语译法不会被覆盖"""
+        if summary:
+            summary = summary.strip()
+            estimated = _estimate_tokens(summary)
+            if estimated > self.summary_budget:
+                # 超出预算时保留摘要末尾（最近的内容），按令牌数二分查找能保留的最长末尾
+                low, high = 1, len(summary)
+                while low < high:
+                    middle = (low + high + 1) // 2
+                    if _estimate_tokens(summary[-middle:]) <= self.summary_budget:
+                        low = middle
+                    else:
+                        high = middle - 1
+                summary = summary[-low:]
+            self.summary = summary
+        for source, target in (terms or {}).items():
+            if not isinstance(source, str) or not isinstance(target, str):
+                continue
+            source, target = source.strip(), target.strip()
+            if source and target and source not in self.terms:
+                self.terms[source] = target
+
+    def render(self, text: str = "") -> str:
+        """渲染上下文提示，出现在text中的术语优先，其余按最近确定的顺序填充"""
+        parts = []
+        used = 0
+        if self.summary:
+            parts.append(f"前文摘要：\n{self.summary}")
+            used = _estimate_tokens(parts[0])
+
+        header = "已确定的术语译法："
+        # 标题连同与摘要之间的分隔符计入预算
+        used += _estimate_tokens(header) + 1
+        relevant = [source for source in self.terms if source in text]
+        others = [source for source in reversed(self.terms) if source not in text]
+        lines = []
+        for source in relevant + others:
+            line = f"- {source} → {self.terms[source]}"
+            cost = _estimate_tokens(line) + 1
+            if used + cost > self.max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        if lines:
+            parts.append(header + "\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
 class DocumentTranslator:
-    """文档翻译器"""
+    """文档翻译器
+
+    段落通过BatchProcessor的工作队列调度，任一段落完成后立即开始下一个段落，
+    慢段落不会阻塞其他段落。rolling模式下段落块按顺序翻译，
+    每个块的响应同时更新文档摘要和术语记忆。
+    """
     
-    def __init__(self, translator: 'DoubaoTranslator', context_window: int = 2, batch_size: int = 5):
+    BLOCK_SYSTEM_PROMPT = (
+        "你是豆包翻译助手。用户会提供文档的前后文和一个JSON对象，JSON中的每个值是文档中连续的段落。"
+        "请结合上下文逐段翻译，保持键不变，只返回结构相同的JSON对象，不要添加任何解释。"
+    )
+
+    ROLLING_SYSTEM_PROMPT = (
+        "你是豆包翻译助手。用户会提供文档的前文摘要、已确定的术语译法和一个JSON对象，"
+        "JSON中的每个值是文档中连续的段落。请保持与已确定译法一致，逐段翻译，"
+        "只返回如下结构的JSON对象，不要添加任何解释：\n"
+        '{"translations": {"1": "第1段译文", ...}, "summary": "截至本段的全文摘要", '
+        '"terms": {"原文术语或专有名词": "译法"}}\n'
+        "summary应概括截至当前的全部内容，terms只需列出本次新出现的术语和专有名词。"
+    )
+
+    def __init__(self, translator: 'DoubaoTranslator', context_window: int = 2, batch_size: int = 5,
+                 paragraph_timeout: Optional[float] = None, paragraph_retries: int = 0,
+                 progress_callback=None, mode: str = 'paragraph',
+                 context_budget: Optional[int] = None):
+        """
+        Args:
+            translator: 翻译器实例
+            context_window: 上下文窗口大小（前后考虑几个段落）
+            batch_size: 批处理大小，窗口模式下为每个请求包含的段落数
+            paragraph_timeout: 单个段落（窗口模式下为单个段落块）的超时时间（秒），None表示不限制
+            paragraph_retries: 单个段落（窗口模式下为单个段落块）失败或超时后的重试次数
+            progress_callback: 进度回调，每完成一个段落（块模式下为一个段落块）调用
+                callback(已完成段落数, 段落总数)，返回False时取消剩余段落
+            mode: 'paragraph'逐段请求，每段携带前后文；'window'将连续的batch_size个段落
+                放在一个请求中翻译，块内段落互为上下文，只有块两端的前后文单独发送；
+                'rolling'按顺序逐块翻译，以滚动摘要和术语记忆代替原始前后文
+            context_budget: rolling模式下文档上下文的token预算，
+                默认取perf_config中的document_context_tokens（512）
+        """
+        if mode not in ('paragraph', 'window', 'rolling'):
+            raise DoubaoConfigError(f"无效的文档翻译模式: {mode}")
         self.translator = translator
         self.context_window = context_window
         self.batch_size = batch_size
+        self.mode = mode
+        if context_budget is None:
+            context_budget = translator.perf_config.get('document_context_tokens', 512)
+        self.document_context = DocumentContext(max_tokens=context_budget)
         self.processor = BatchProcessor(
-            max_workers=translator.perf_config['max_workers'],
-            batch_size=batch_size
+            # 滚动上下文依赖前一块的结果，块必须按顺序处理
+            max_workers=1 if mode == 'rolling' else translator._batch_workers(),
+            batch_size=batch_size,
+            item_timeout=paragraph_timeout,
+            item_retries=paragraph_retries,
+            progress_callback=progress_callback,
+            # 块模式下按块内段落数计算进度，所有模式的进度单位都是段落
+            progress_weigh=(lambda block: block[1] - block[0]) if mode != 'paragraph' else None
         )
         self._paragraphs = []
         self._context_cache = {}
@@ -1574,11 +4122,121 @@ class DocumentTranslator:
         self._context_cache[index] = context
         return context
 
+    def _build_block_messages(self, block: List[str], before: List[str], after: List[str],
+                              dest: str, src: str, style_guide: Optional[str],
+                              glossary_terms: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        """构建段落块的请求消息，段落用编号JSON对象标记"""
+        parts = [f"请将以下文档段落从{src}翻译成{dest}。"]
+        if before:
+            parts.append("前文（仅供参考，不需要翻译）：\n" + "\n".join(before))
+        if after:
+            parts.append("后文（仅供参考，不需要翻译）：\n" + "\n".join(after))
+        return self._finish_block_messages(self.BLOCK_SYSTEM_PROMPT, parts, block, style_guide, glossary_terms)
+
+    def _build_rolling_messages(self, block: List[str], context: str, dest: str, src: str,
+                                style_guide: Optional[str],
+                                glossary_terms: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        """构建rolling模式的请求消息，以文档摘要和术语记忆作为上下文"""
+        parts = [f"请将以下文档段落从{src}翻译成{dest}。"]
+        if context:
+            parts.append(f"文档上下文（仅供参考，不需要翻译）：\n{context}")
+        parts.append(f"summary请控制在{self.document_context.summary_budget}个token以内。")
+        return self._finish_block_messages(self.ROLLING_SYSTEM_PROMPT, parts, block, style_guide, glossary_terms)
+
+    def _finish_block_messages(self, system_prompt: str, parts: List[str], block: List[str],
+                               style_guide: Optional[str],
+                               glossary_terms: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        # 风格指南在整篇文档中不变，放入固定前缀；术语约束和段落放在后面
+        template = PromptTemplate(system_prompt, f"风格要求：\n{style_guide}" if style_guide else "")
+        payload = json.dumps({str(i + 1): text for i, text in enumerate(block)}, ensure_ascii=False)
+        parts.append(f"需要翻译的段落：\n{payload}")
+        return template.build(
+            "\n\n".join(parts),
+            self.translator._format_glossary_constraints(glossary_terms) if glossary_terms else ""
+        )
+
+    def _parse_rolling_response(self, response: str, count: int) -> Optional[List[str]]:
+        """解析rolling模式的响应，成功时用其中的摘要和术语更新文档上下文"""
+        data = self.translator._extract_json_object(response)
+        if data is None:
+            return None
+        translations = self.translator._parse_pack_items(data.get('translations'), count)
+        if translations is not None:
+            summary = data.get('summary')
+            terms = data.get('terms')
+            self.document_context.update(
+                summary=summary if isinstance(summary, str) else None,
+                terms=terms if isinstance(terms, dict) else None
+            )
+        return translations
+
+    @_with_request_id
+    async def _translate_block(self, start: int, end: int, dest: str, src: str,
+                               style_guide: Optional[str], use_glossary: bool) -> List[DoubaoTranslated]:
+        """在一个请求中翻译[start, end)范围内的段落，解析失败时回退为逐段请求"""
+        translator = self.translator
+        paragraphs = self._paragraphs
+        indices = [i for i in range(start, end) if paragraphs[i].strip()]
+        results = {i: DoubaoTranslated(src, dest, paragraphs[i], paragraphs[i]) for i in range(start, end)}
+        if not indices:
+            return [results[i] for i in range(start, end)]
+
+        block = [paragraphs[i] for i in indices]
+        block_src = src
+        if block_src == 'auto':
+            try:
+                block_src = (await translator.doubao_detect("\n".join(block))).lang
+            except Exception as e:
+                logger.warning(f"Language detection failed, using 'auto': {str(e)}")
+
+        item_terms = [
+            translator._match_glossary_terms(text, block_src, dest) if use_glossary else []
+            for text in block
+        ]
+        block_terms = list(dict.fromkeys(term for terms in item_terms for term in terms))
+
+        if self.mode == 'rolling':
+            context = self.document_context.render("\n".join(block))
+            messages = self._build_rolling_messages(block, context, dest, block_src, style_guide, block_terms)
+            response = await translator._make_request(messages, stream=False, operation='context',
+                                                      lang_pair=f"{block_src}->{dest}")
+            translations = self._parse_rolling_response(response, len(block))
+        else:
+            context = None
+            before = paragraphs[max(0, start - self.context_window):start]
+            after = paragraphs[end:end + self.context_window]
+            messages = self._build_block_messages(block, before, after, dest, block_src, style_guide, block_terms)
+            response = await translator._make_request(messages, stream=False, operation='context',
+                                                      lang_pair=f"{block_src}->{dest}")
+            translations = translator._parse_pack_response(response, len(block))
+
+        if translations is None:
+            logger.warning(f"Block response mismatch for paragraphs {start}-{end - 1}, falling back to per-paragraph requests")
+            fallback = await asyncio.gather(*(
+                translator.translate_with_context(
+                    text=paragraphs[i],
+                    context=self._get_context(i) if context is None else context,
+                    dest=dest,
+                    src=block_src,
+                    style_guide=style_guide,
+                    use_glossary=use_glossary
+                )
+                for i in indices
+            ))
+            results.update(zip(indices, fallback))
+        else:
+            for i, translated_text, terms in zip(indices, translations, item_terms):
+                if terms:
+                    translated_text = translator._enforce_glossary(translated_text, terms)
+                results[i] = DoubaoTranslated(src=block_src, dest=dest, origin=paragraphs[i], text=translated_text)
+        return [results[i] for i in range(start, end)]
+
     async def translate_document(self, 
                                paragraphs: List[str], 
                                dest: str = 'en', 
                                src: str = 'auto',
-                               style_guide: str = None) -> List[DoubaoTranslated]:
+                               style_guide: str = None,
+                               use_glossary: bool = True) -> List[DoubaoTranslated]:
         """翻译整个文档
         
         Args:
@@ -1586,45 +4244,59 @@ class DocumentTranslator:
             dest: 目标语言
             src: 源语言
             style_guide: 风格指南
+            use_glossary: 已加载术语表时，是否将匹配到的术语作为约束写入提示词
         """
         if not paragraphs:
             return []
 
         self._paragraphs = paragraphs
         self._context_cache.clear()
+        self.document_context.clear()
         start_time = time.time()
 
-        async def translate_paragraph(text: str, index: int) -> DoubaoTranslated:
-            try:
-                context = self._get_context(index)
-                return await self.translator.translate_with_context(
-                    text=text,
-                    context=context,
-                    dest=dest,
-                    src=src,
-                    style_guide=style_guide
-                )
-            except Exception as e:
-                logger.error(f"Failed to translate paragraph {index}: {str(e)}")
-                return DoubaoTranslated(
-                    src=src,
-                    dest=dest,
-                    origin=text,
-                    text=f"Translation failed: {str(e)}"
-                )
+        async def translate_paragraph(index: int) -> DoubaoTranslated:
+            return await self.translator.translate_with_context(
+                text=paragraphs[index],
+                context=self._get_context(index),
+                dest=dest,
+                src=src,
+                style_guide=style_guide,
+                use_glossary=use_glossary
+            )
+
+        async def translate_block(block_range: Tuple[int, int]) -> List[DoubaoTranslated]:
+            return await self._translate_block(block_range[0], block_range[1], dest, src, style_guide, use_glossary)
 
         try:
-            # 创建任务列表
-            tasks = []
-            for i, text in enumerate(paragraphs):
-                tasks.append(translate_paragraph(text, i))
-
-            # 分批执行任务
-            results = []
-            for i in range(0, len(tasks), self.batch_size):
-                batch = tasks[i:i + self.batch_size]
-                batch_results = await asyncio.gather(*batch)
-                results.extend(batch_results)
+            if self.mode in ('window', 'rolling'):
+                # 连续段落组成块，每个块一个请求，块内段落共享上下文
+                block_size = max(self.batch_size, 1)
+                blocks = [
+                    (start, min(start + block_size, len(paragraphs)))
+                    for start in range(0, len(paragraphs), block_size)
+                ]
+                block_results = await self.processor.process(blocks, translate_block)
+                results = []
+                errors = {}
+                for block_index, ((start, end), block_result) in enumerate(zip(blocks, block_results)):
+                    if block_result is None:
+                        block_result = [None] * (end - start)
+                        errors.update((i, self.processor.errors.get(block_index)) for i in range(start, end))
+                    results.extend(block_result)
+            else:
+                # 段落索引进入工作队列，失败的段落按配置重试
+                results = await self.processor.process(list(range(len(paragraphs))), translate_paragraph)
+                errors = self.processor.errors
+            for i, result in enumerate(results):
+                if result is None:
+                    error = errors.get(i) or ("cancelled" if self.processor.cancelled else "unknown error")
+                    logger.error(f"Failed to translate paragraph {i}: {str(error)}")
+                    results[i] = DoubaoTranslated(
+                        src=src,
+                        dest=dest,
+                        origin=paragraphs[i],
+                        text=f"Translation failed: {str(error)}"
+                    )
 
             duration = time.time() - start_time
             success_count = sum(1 for r in results if not r.text.startswith("Translation failed"))
@@ -1638,20 +4310,121 @@ class DocumentTranslator:
             self._context_cache.clear()
             self._paragraphs = []
 
-class StreamTranslator:
-    """流式翻译迭代器"""
+class DoubaoStreamDelta:
+    """流式翻译的增量事件，只携带本次新增的文本"""
+    __slots__ = ('src', 'dest', 'delta', 'offset', 'finished', 'usage')
+
+    def __init__(self, src: str, dest: str, delta: str, offset: int,
+                 finished: bool = False, usage: Optional[Dict[str, int]] = None):
+        self.src = src
+        self.dest = dest
+        self.delta = delta
+        self.offset = offset
+        self.finished = finished
+        self.usage = usage
+
+    def __repr__(self):
+        return f'<DoubaoStreamDelta offset={self.offset} delta={self.delta!r} finished={self.finished}>'
+
+class StreamTranslator(AsyncGenerator):
+    """流式翻译迭代器
+
+    实现完整的异步生成器协议（__anext__、asend、athrow、aclose），可以像
+    doubao_translate(stream=True)原先返回的异步生成器一样使用，与生成器一样只能迭代一次；
+    isinstance(obj, collections.abc.AsyncGenerator)为True，但inspect.isasyncgen为False。
+    deltas为True时产出DoubaoStreamDelta增量事件，译文片段只追加到列表中，
+    完整译文在访问translated_text时才拼接；否则保持原有行为，
+    每次产出包含完整前缀的DoubaoTranslated。
+    coalesce可以合并多个分块后再产出：'sentence'表示遇到句末标点或换行时产出，
+    数值表示两次产出之间的最小间隔秒数。
+    """
+
+    SENTENCE_END_PATTERN = re.compile(r'[.!?;。！？；\n]')
     
-    def __init__(self, translator, text: str, dest: str, src: str):
+    def __init__(self, translator, text: str, dest: str, src: str,
+                 deltas: bool = False, coalesce: Union[str, float, None] = None):
         self.translator = translator
         self.text = text
         self.dest = dest
         self.src = src
-
-    async def __aiter__(self):
-        """实现异步迭代器协议"""
+        self.deltas = deltas
+        self.coalesce = coalesce
+        self.usage: Optional[Dict[str, int]] = None
+        self._parts: List[str] = []
+        self._agen = None
+
+    def _generator(self):
+        if self._agen is None:
+            self._agen = self._generate()
+        return self._agen
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._generator().__anext__()
+
+    def asend(self, value):
+        return self._generator().asend(value)
+
+    def athrow(self, typ, val=None, tb=None):
+        if val is None and tb is None:
+            return self._generator().athrow(typ)
+        return self._generator().athrow(typ, val, tb)
+
+    def aclose(self):
+        """关闭流，未读完的响应会被释放"""
+        return self._generator().aclose()
+
+    @property
+    def translated_text(self) -> str:
+        """目前已收到的完整译文"""
+        if len(self._parts) > 1:
+            self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+    def result(self) -> DoubaoTranslated:
+        """将目前已收到的译文转换为DoubaoTranslated"""
+        return DoubaoTranslated(self.src, self.dest, self.text.strip(), self.translated_text)
+
+    def _take_flushable(self, pending: List[str], content: str, last_flush: float) -> Optional[str]:
+        """从缓冲区取出可以产出的文本，暂不产出时返回None
+
+        按句合并时只产出到最后一个句末位置，其后的半句留在缓冲区。
+        """
+        if self.coalesce is None:
+            delta = ''.join(pending)
+        elif self.coalesce == 'sentence':
+            if not self.SENTENCE_END_PATTERN.search(content):
+                return None
+            buffered = ''.join(pending)
+            end = max(m.end() for m in self.SENTENCE_END_PATTERN.finditer(buffered))
+            delta = buffered[:end]
+            pending.clear()
+            if end < len(buffered):
+                pending.append(buffered[end:])
+            return delta
+        elif time.monotonic() - last_flush >= float(self.coalesce):
+            delta = ''.join(pending)
+        else:
+            return None
+        pending.clear()
+        return delta
+
+    def _event(self, delta: str, offset: int, finished: bool):
+        """构造产出的事件"""
+        if self.deltas:
+            return DoubaoStreamDelta(self.src, self.dest, delta, offset, finished, self.usage if finished else None)
+        return DoubaoTranslated(self.src, self.dest, self.text.strip(), self.translated_text)
+
+    async def _generate(self):
+        """产出翻译事件的异步生成器"""
         text = self.text.strip()
         if not text:
-            yield DoubaoTranslated(self.src, self.dest, text, text)
+            if self.deltas:
+                yield DoubaoStreamDelta(self.src, self.dest, '', 0, True)
+            else:
+                yield DoubaoTranslated(self.src, self.dest, text, text)
             return
 
         if self.src == 'auto':
@@ -1661,22 +4434,69 @@ class StreamTranslator:
             except Exception as e:
                 logger.warning(f"Language detection failed, using 'auto': {str(e)}")
 
-        prompt = f"将以下{self.src}文本翻译成{self.dest}：\n{text}"
-        messages = [
-            {"role": "system", "content": self.translator.system_prompt},
-            {"role": "user", "content": prompt}
-        ]
+        messages = self.translator.translate_template.build(f"将以下{self.src}文本翻译成{self.dest}：\n{text}")
 
+        lang_pair = f"{self.src}->{self.dest}"
+        start_time = time.time()
+        response_stream = None
+        outcome = 'cancelled'
         try:
-            response_stream = await self.translator._make_request(messages, stream=True)
-            translated_text = ""
+            # 流式请求在读完整个响应后才记录延迟，建立连接失败时由_make_request记录
+            response_stream = await self.translator._make_request(
+                messages, stream=True, operation='translate', lang_pair=lang_pair
+            )
+            pending: List[str] = []
+            offset = 0
+            last_flush = time.monotonic()
             async for chunk in response_stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    translated_text += chunk.choices[0].delta.content
-                    yield DoubaoTranslated(self.src, self.dest, text, translated_text)
+                if getattr(chunk, 'usage', None):
+                    self.usage = _usage_to_dict(chunk.usage)
+                if not (chunk.choices and chunk.choices[0].delta.content):
+                    continue
+                content = chunk.choices[0].delta.content
+                self._parts.append(content)
+                pending.append(content)
+                delta = self._take_flushable(pending, content, last_flush)
+                if delta is not None:
+                    yield self._event(delta, offset, False)
+                    offset += len(delta)
+                    last_flush = time.monotonic()
+
+            # 读完响应后立即记录，不等待调用方取走最后一个事件
+            response_stream = None
+            await self._record_request(messages, lang_pair, time.time() - start_time, True)
+            delta = ''.join(pending)
+            if self.deltas:
+                yield self._event(delta, offset, True)
+            elif delta:
+                yield self._event(delta, offset, True)
         except Exception as e:
+            outcome = 'error'
             logger.error(f"Streaming translation failed: {str(e)}")
             raise DoubaoAPIError(f"流式翻译失败: {str(e)}")
+        finally:
+            if response_stream is not None:
+                # 出错、提前aclose或break的流同样计入延迟和用量，随后释放未读完的响应
+                await self._record_request(messages, lang_pair, time.time() - start_time,
+                                           outcome != 'error', outcome)
+                if hasattr(response_stream, 'close'):
+                    await response_stream.close()
+
+    async def _record_request(self, messages: List[Dict[str, str]], lang_pair: str, duration: float,
+                              success: bool, outcome: Optional[str] = None) -> None:
+        """记录一次流式请求的延迟和用量，未收到用量分块时按提示词和已收到的译文估算"""
+        usage = self.usage
+        if usage is None:
+            prompt_tokens = sum(_estimate_tokens(m.get('content') or '') for m in messages)
+            completion_tokens = _estimate_tokens(self.translated_text)
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+                'cached_tokens': 0,
+            }
+        self.translator._record_usage(usage, 'translate', lang_pair)
+        await self.translator._record_metrics(duration, success, 'translate', lang_pair, outcome)
 
 # 使用示例
 async def main():
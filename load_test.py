@@ -0,0 +1,206 @@
+"""
+DoubaoTranslator开环压测
+
+按固定到达率（泊松过程）发起操作，不等待前一个操作完成，
+通过base_url驱动DoubaoTranslator访问本地模拟服务器（mock_server.py），
+按性能模式报告吞吐量、延迟分位数和错误放大情况：
+
+    python load_test.py --scenario batch --rate 5 --duration 30 --profiles fast balanced
+    python load_test.py --scenario stream --base-url http://127.0.0.1:8765/v1
+
+未指定--base-url时在进程内启动模拟服务器，模拟服务器参数与mock_server.py相同。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from doubaotrans import DoubaoTranslator, LatencyHistogram, PERFORMANCE_PROFILES
+from mock_server import add_config_arguments, config_from_args, start_server
+
+SCENARIOS = ('batch', 'document', 'stream')
+
+_counter = itertools.count()
+
+
+def _unique_text(rng: random.Random) -> str:
+    """生成不会命中翻译缓存的测试文本"""
+    words = ['人工智能', '翻译', '模型', '数据', '系统', '性能', '延迟', '吞吐量', '文档', '段落']
+    return f"{next(_counter)}号：" + ''.join(rng.choice(words) for _ in range(rng.randint(5, 20))) + "。"
+
+
+async def run_operation(translator: DoubaoTranslator, scenario: str, rng: random.Random, args) -> None:
+    """执行一次操作，失败时抛出异常"""
+    if scenario == 'batch':
+        texts = [_unique_text(rng) for _ in range(args.batch_items)]
+        results = await translator.translate_batch(texts, dest='en', src='zh', batch_size=args.batch_items)
+        failed = sum(1 for r in results if r is None or r.text.startswith("Translation failed"))
+        if failed:
+            raise RuntimeError(f"{failed} batch items failed")
+    elif scenario == 'document':
+        paragraphs = [_unique_text(rng) for _ in range(args.paragraphs)]
+        results = await translator.translate_document_with_context(paragraphs, dest='en', src='zh',
+                                                                   mode=args.document_mode)
+        failed = sum(1 for r in results if r.text.startswith("Translation failed"))
+        if failed:
+            raise RuntimeError(f"{failed} paragraphs failed")
+    else:
+        stream = await translator.doubao_translate(_unique_text(rng), dest='en', src='zh', stream=True)
+        async for _ in stream:
+            pass
+
+
+async def fetch_stats(session: aiohttp.ClientSession, stats_url: str, reset: bool = False) -> Dict[str, Any]:
+    method = session.post if reset else session.get
+    async with method(stats_url + ('/reset' if reset else '')) as response:
+        return await response.json()
+
+
+async def run_profile(profile: str, base_url: str, stats_url: str, args) -> Dict[str, Any]:
+    """以指定性能模式运行一轮开环压测"""
+    rng = random.Random(args.seed)
+    translator = DoubaoTranslator(api_key=args.api_key, base_url=base_url, model_name='mock',
+                                  performance_mode=profile)
+    latencies = LatencyHistogram()
+    errors: Dict[str, int] = {}
+    completed = 0
+    tasks = set()
+
+    async def one():
+        nonlocal completed
+        start = time.perf_counter()
+        try:
+            await run_operation(translator, args.scenario, rng, args)
+            latencies.record(time.perf_counter() - start)
+            completed += 1
+        except Exception as e:
+            key = type(e).__name__
+            errors[key] = errors.get(key, 0) + 1
+
+    async with aiohttp.ClientSession() as session:
+        await fetch_stats(session, stats_url, reset=True)
+        async with translator:
+            start = time.perf_counter()
+            next_arrival = start
+            launched = 0
+            # 开环：按预定的到达时间发起操作，不等待已发起的操作完成
+            while next_arrival - start < args.duration:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.ensure_future(one())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                launched += 1
+                next_arrival += rng.expovariate(args.rate)
+            if tasks:
+                await asyncio.wait(set(tasks), timeout=args.drain_timeout)
+            abandoned = len(tasks)
+            leftover = list(tasks)
+            for task in leftover:
+                task.cancel()
+            elapsed = time.perf_counter() - start
+            # 等待被取消的操作真正结束，再关闭翻译器
+            await asyncio.gather(*leftover, return_exceptions=True)
+            client_metrics = translator.metrics.get_metrics()
+        server = await fetch_stats(session, stats_url)
+
+    failed = sum(errors.values())
+    injected = server['errors_429'] + server['errors_5xx']
+    server_error_rate = injected / max(server['requests'], 1)
+    client_error_rate = (failed + abandoned) / max(launched, 1)
+    return {
+        'profile': profile,
+        'scenario': args.scenario,
+        'offered_rate': args.rate,
+        'launched': launched,
+        'completed': completed,
+        'failed': failed,
+        'abandoned': abandoned,
+        'elapsed': elapsed,
+        'throughput': completed / elapsed if elapsed else 0.0,
+        'latency': latencies.summary(),
+        'errors': errors,
+        'server': server,
+        'client_api_calls': client_metrics['request_count'],
+        'server_requests_per_operation': server['requests'] / max(launched, 1),
+        'server_error_rate': server_error_rate,
+        'client_error_rate': client_error_rate,
+        # 大于1表示客户端可见的失败率高于服务端注入的错误率（错误被放大），小于1表示被重试吸收
+        'error_amplification': client_error_rate / server_error_rate if server_error_rate else None,
+    }
+
+
+def print_result(result: Dict[str, Any]):
+    latency = result['latency']
+    amplification = result['error_amplification']
+    print(
+        f"{result['profile']:<9} {result['scenario']:<8} "
+        f"ops={result['completed']}/{result['launched']} "
+        f"thr={result['throughput']:.2f}/s "
+        f"p50={latency['p50']:.3f}s p90={latency['p90']:.3f}s p99={latency['p99']:.3f}s max={latency['max']:.3f}s "
+        f"server_req/op={result['server_requests_per_operation']:.2f} "
+        f"err={result['client_error_rate']:.3f} (server {result['server_error_rate']:.3f}, "
+        f"amplification {'-' if amplification is None else f'{amplification:.2f}'})"
+    )
+
+
+async def main_async(args) -> List[Dict[str, Any]]:
+    runner = None
+    base_url = args.base_url
+    if base_url is None:
+        runner = await start_server(config_from_args(args))
+        host, port = runner.addresses[0][:2]
+        base_url = f"http://{host}:{port}/v1"
+    root = base_url.split('/v1')[0].rstrip('/')
+    stats_url = f"{root}/stats"
+
+    results = []
+    try:
+        for profile in args.profiles:
+            result = await run_profile(profile, base_url, stats_url, args)
+            print_result(result)
+            results.append(result)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DoubaoTranslator开环压测')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='batch', help='压测场景')
+    parser.add_argument('--profiles', nargs='+', choices=list(PERFORMANCE_PROFILES), default=['balanced'],
+                        help='要比较的性能模式')
+    parser.add_argument('--rate', type=float, default=2.0, help='每秒发起的操作数（泊松到达）')
+    parser.add_argument('--duration', type=float, default=20.0, help='发起操作的持续时间（秒）')
+    parser.add_argument('--drain-timeout', type=float, default=60.0, help='停止发起后等待在途操作的时间（秒）')
+    parser.add_argument('--batch-items', type=int, default=10, help='batch场景每次翻译的文本数')
+    parser.add_argument('--paragraphs', type=int, default=10, help='document场景每篇文档的段落数')
+    parser.add_argument('--document-mode', choices=['paragraph', 'window', 'rolling'], default='paragraph',
+                        help='document场景的文档翻译模式')
+    parser.add_argument('--base-url', default=None, help='已运行的模拟服务器地址，如http://127.0.0.1:8765/v1')
+    parser.add_argument('--api-key', default='mock-' + 'x' * 32, help='发送给模拟服务器的API密钥')
+    parser.add_argument('--output', help='将JSON结果写入文件')
+    parser.add_argument('--verbose', action='store_true', help='输出翻译器日志')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # 屏蔽翻译器和HTTP客户端的日志，只保留压测结果
+        logging.disable(logging.ERROR)
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
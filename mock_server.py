@@ -0,0 +1,303 @@
+"""
+本地OpenAI兼容的chat completions模拟服务器
+
+用于在不访问方舟接口的情况下对DoubaoTranslator做压测：
+
+    python mock_server.py --port 8765 --latency lognormal --latency-mean 0.3 --error-429 0.05
+
+然后将base_url设置为 http://127.0.0.1:8765/v1 。
+支持可配置的延迟分布、流式分块节奏、429/5xx错误注入以及Retry-After响应头，
+GET /stats 返回服务端统计，POST /stats/reset 清零。
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+
+class MockServerConfig:
+    """模拟服务器配置"""
+
+    def __init__(self,
+                 latency: str = 'lognormal',
+                 latency_mean: float = 0.2,
+                 latency_sigma: float = 0.5,
+                 ttft: Optional[float] = None,
+                 chunk_interval: float = 0.02,
+                 chunk_chars: int = 4,
+                 error_429: float = 0.0,
+                 error_5xx: float = 0.0,
+                 retry_after: Optional[float] = 1.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            latency: 响应延迟分布，可选fixed、uniform、exponential、lognormal
+            latency_mean: 延迟均值（秒）
+            latency_sigma: lognormal的形状参数，uniform时为相对半宽
+            ttft: 流式响应的首个分块延迟（秒），默认按latency分布采样
+            chunk_interval: 流式分块之间的间隔（秒）
+            chunk_chars: 每个流式分块的字符数
+            error_429: 返回429的概率
+            error_5xx: 返回500/502/503的概率
+            retry_after: 错误响应中Retry-After头的秒数，None表示不发送
+            seed: 随机种子
+        """
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"未知的延迟分布: {latency}")
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.ttft = ttft
+        self.chunk_interval = chunk_interval
+        self.chunk_chars = max(chunk_chars, 1)
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+
+    def sample_latency(self) -> float:
+        mean = self.latency_mean
+        if self.latency == 'fixed':
+            return mean
+        if self.latency == 'uniform':
+            return self.rng.uniform(mean * (1 - self.latency_sigma), mean * (1 + self.latency_sigma))
+        if self.latency == 'exponential':
+            return self.rng.expovariate(1 / mean) if mean > 0 else 0.0
+        # 对数正态分布，mu取值使均值等于latency_mean
+        mu = _lognormal_mu(mean, self.latency_sigma)
+        return self.rng.lognormvariate(mu, self.latency_sigma)
+
+
+def _lognormal_mu(mean: float, sigma: float) -> float:
+    return math.log(max(mean, 1e-9)) - sigma ** 2 / 2
+
+
+class MockServerStats:
+    """服务端统计"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.streams = 0
+        self.errors_429 = 0
+        self.errors_5xx = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'streams': self.streams,
+            'errors_429': self.errors_429,
+            'errors_5xx': self.errors_5xx,
+            'inflight': self.inflight,
+            'max_inflight': self.max_inflight,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'uptime': time.time() - self.started,
+        }
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(len(text) // 2, 1)
+
+
+def _fake_translation(messages: List[Dict[str, str]]) -> str:
+    """根据请求内容生成确定性的“译文”
+
+    检测请求返回zh；JSON信封请求返回键相同的JSON对象；其余请求返回最后一行文本加前缀。
+    """
+    system = messages[0].get('content', '') if messages else ''
+    user = messages[-1].get('content', '') if messages else ''
+    if '检测' in system:
+        start = user.find('{')
+        if start != -1 and 'JSON' in system:
+            try:
+                data = json.loads(user[start:user.rfind('}') + 1])
+                return json.dumps({key: 'zh' for key in data}, ensure_ascii=False)
+            except json.JSONDecodeError:
+                pass
+        return 'zh'
+
+    start = user.find('{')
+    if 'JSON' in system and start != -1:
+        try:
+            data = json.loads(user[start:user.rfind('}') + 1])
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            translations = {key: f'[译] {value}' for key, value in data.items()}
+            if 'summary' in system:
+                return json.dumps({'translations': translations, 'summary': '模拟摘要', 'terms': {}},
+                                  ensure_ascii=False)
+            return json.dumps(translations, ensure_ascii=False)
+
+    lines = [line for line in user.splitlines() if line.strip()]
+    return f"[译] {lines[-1] if lines else ''}"
+
+
+def create_app(config: Optional[MockServerConfig] = None) -> web.Application:
+    """创建模拟服务器应用，路径以chat/completions结尾的POST请求都会被处理"""
+    config = config or MockServerConfig()
+    stats = MockServerStats()
+
+    def error_response(status: int) -> web.Response:
+        headers = {}
+        if config.retry_after is not None:
+            headers['Retry-After'] = f'{config.retry_after:g}'
+        body = {'error': {'message': f'mock error {status}', 'type': 'rate_limit' if status == 429 else 'server_error',
+                          'code': status}}
+        return web.json_response(body, status=status, headers=headers)
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        stats.requests += 1
+        stats.inflight += 1
+        stats.max_inflight = max(stats.max_inflight, stats.inflight)
+        try:
+            payload = await request.json()
+            roll = config.rng.random()
+            if roll < config.error_429:
+                stats.errors_429 += 1
+                await asyncio.sleep(config.sample_latency() * 0.1)
+                return error_response(429)
+            if roll < config.error_429 + config.error_5xx:
+                stats.errors_5xx += 1
+                await asyncio.sleep(config.sample_latency())
+                return error_response(config.rng.choice((500, 502, 503)))
+
+            messages = payload.get('messages') or []
+            content = _fake_translation(messages)
+            prompt_tokens = sum(_estimate_tokens(m.get('content') or '') for m in messages)
+            completion_tokens = _estimate_tokens(content)
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                     'total_tokens': prompt_tokens + completion_tokens,
+                     'prompt_tokens_details': {'cached_tokens': 0}}
+            completion_id = f'chatcmpl-{uuid.uuid4().hex[:24]}'
+            model = payload.get('model', 'mock')
+            created = int(time.time())
+
+            if not payload.get('stream'):
+                await asyncio.sleep(config.sample_latency())
+                return web.json_response({
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': created,
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                    'usage': usage,
+                })
+
+            stats.streams += 1
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+            await response.prepare(request)
+
+            async def send(data: Dict[str, Any]):
+                await response.write(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+                return {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+            await asyncio.sleep(config.ttft if config.ttft is not None else config.sample_latency())
+            await send(chunk({'role': 'assistant', 'content': ''}))
+            for i in range(0, len(content), config.chunk_chars):
+                if i:
+                    await asyncio.sleep(config.chunk_interval)
+                await send(chunk({'content': content[i:i + config.chunk_chars]}))
+            await send(chunk({}, 'stop'))
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                await send({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                            'model': model, 'choices': [], 'usage': usage})
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            stats.inflight -= 1
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats.as_dict())
+
+    async def reset_stats(request: web.Request) -> web.Response:
+        stats.reset()
+        return web.json_response(stats.as_dict())
+
+    app = web.Application()
+    app['config'] = config
+    app['stats'] = stats
+    app.router.add_post(r'/{prefix:.*}chat/completions', chat_completions)
+    app.router.add_get('/stats', get_stats)
+    app.router.add_post('/stats/reset', reset_stats)
+    return app
+
+
+async def start_server(config: Optional[MockServerConfig] = None, host: str = '127.0.0.1',
+                       port: int = 0) -> web.AppRunner:
+    """在当前事件循环中启动模拟服务器，返回runner；port为0时自动分配端口
+
+    实际端口可通过 runner.addresses[0][1] 获取，结束时调用 await runner.cleanup()。
+    """
+    runner = web.AppRunner(create_app(config), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """添加模拟服务器配置相关的命令行参数，供压测脚本复用"""
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal', help='响应延迟分布')
+    parser.add_argument('--latency-mean', type=float, default=0.2, help='延迟均值（秒）')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='lognormal形状参数/uniform相对半宽')
+    parser.add_argument('--ttft', type=float, default=None, help='流式首个分块延迟（秒）')
+    parser.add_argument('--chunk-interval', type=float, default=0.02, help='流式分块间隔（秒）')
+    parser.add_argument('--chunk-chars', type=int, default=4, help='每个流式分块的字符数')
+    parser.add_argument('--error-429', type=float, default=0.0, help='返回429的概率')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='返回5xx的概率')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After秒数，负数表示不发送')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+
+
+def config_from_args(args: argparse.Namespace) -> MockServerConfig:
+    return MockServerConfig(
+        latency=args.latency,
+        latency_mean=args.latency_mean,
+        latency_sigma=args.latency_sigma,
+        ttft=args.ttft,
+        chunk_interval=args.chunk_interval,
+        chunk_chars=args.chunk_chars,
+        error_429=args.error_429,
+        error_5xx=args.error_5xx,
+        retry_after=args.retry_after if args.retry_after >= 0 else None,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地OpenAI兼容的chat completions模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    print(f"Mock server listening on http://{args.host}:{args.port}/v1")
+    web.run_app(create_app(config_from_args(args)), host=args.host, port=args.port, access_log=None,
+                print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+translate_batch_as_completed流式批量翻译的离线测试
+"""
+import asyncio
+
+from conftest import StubCompletions
+
+
+class TrackingCompletions(StubCompletions):
+    """按文本设置每次调用的耗时，记录同时在途的调用峰值和被取消的调用"""
+
+    def __init__(self, delays=None, default_delay=0.02):
+        super().__init__()
+        self.delays = delays or {}
+        self.default_delay = default_delay
+        self.inflight = 0
+        self.peak = 0
+        self.cancelled = []
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        text = messages[-1]['content'].splitlines()[-1]
+        self.delay = self.delays.get(text, self.default_delay)
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            return await super().create(model, messages, stream=stream, **kwargs)
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        finally:
+            self.inflight -= 1
+
+
+def install(translator, completions):
+    translator.client_manager.client.chat.completions = completions
+    return completions
+
+
+async def collect(translator, texts, **kwargs):
+    return [item async for item in translator.translate_batch_as_completed(texts, dest='en', src='zh', **kwargs)]
+
+
+def test_window_bounds_in_flight_and_input_reads(make_translator):
+    translator, _ = make_translator()
+    stub = install(translator, TrackingCompletions())
+    texts = [f'文本{i}' for i in range(12)]
+    pulled = []
+
+    def source():
+        for text in texts:
+            pulled.append(text)
+            yield text
+
+    async def run():
+        results = []
+        async for index, result in translator.translate_batch_as_completed(source(), dest='en', src='zh', window=3):
+            # 产出结果时最多读取了window条输入加上正在补位的一条
+            assert len(pulled) <= len(results) + 4
+            results.append((index, result))
+        return results
+
+    results = asyncio.run(run())
+    assert stub.peak <= 3
+    assert sorted(index for index, _ in results) == list(range(12))
+    assert all(result.text == f'T({texts[index]})' for index, result in results)
+
+
+def test_unordered_yields_in_completion_order(make_translator):
+    translator, _ = make_translator()
+    texts = ['慢', '中', '快']
+    install(translator, TrackingCompletions({'慢': 0.15, '中': 0.08, '快': 0.01}))
+    results = asyncio.run(collect(translator, texts, window=3))
+    assert [index for index, _ in results] == [2, 1, 0]
+
+
+def test_ordered_yields_in_input_order(make_translator):
+    translator, _ = make_translator()
+    texts = [f'文本{i}' for i in range(6)]
+    # 越靠前的文本越慢，完成顺序与输入顺序相反
+    delays = {text: 0.02 * (len(texts) - i) for i, text in enumerate(texts)}
+    stub = install(translator, TrackingCompletions(delays))
+    results = asyncio.run(collect(translator, texts, window=3, ordered=True))
+    assert [index for index, _ in results] == list(range(6))
+    assert [result.text for _, result in results] == [f'T({text})' for text in texts]
+    # 重排缓冲区计入窗口，在途调用仍不超过window
+    assert stub.peak <= 3
+
+
+def test_async_iterable_input(make_translator):
+    translator, stub = make_translator()
+
+    async def source():
+        for text in ['一', '二', '三']:
+            await asyncio.sleep(0)
+            yield text
+
+    results = asyncio.run(collect(translator, source(), ordered=True))
+    assert [(index, result.text) for index, result in results] == [(0, 'T(一)'), (1, 'T(二)'), (2, 'T(三)')]
+    assert len(stub.calls) == 3
+
+
+def test_break_cancels_pending_tasks(make_translator):
+    translator, _ = make_translator()
+    texts = ['快', '慢一', '慢二', '慢三', '慢四']
+    stub = install(translator, TrackingCompletions({'快': 0.01}, default_delay=1.0))
+
+    async def run():
+        results = translator.translate_batch_as_completed(texts, dest='en', src='zh', window=3)
+        async for index, _ in results:
+            break
+        await results.aclose()
+        await asyncio.sleep(0.05)
+        # 在事件循环关闭之前检查，避免把asyncio.run收尾时的取消计算在内
+        return index, list(stub.cancelled), stub.inflight, len(translator._inflight)
+
+    index, cancelled, inflight, shared = asyncio.run(run())
+    assert index == 0
+    # 窗口内的两条慢请求连同上游调用一起被取消，窗口外的输入从未发出
+    assert sorted(cancelled) == ['慢一', '慢二']
+    assert inflight == 0 and shared == 0
+    assert sorted(messages[-1]['content'].splitlines()[-1] for messages in stub.calls) == ['快', '慢一', '慢二']
@@ -0,0 +1,72 @@
+"""
+translate_batch批内去重和结果展开的离线测试
+"""
+import asyncio
+import json
+import unicodedata
+
+from conftest import echo_responder
+
+
+def failing_on(bad):
+    """最后一行为bad的请求抛出异常，其余请求按echo_responder回复"""
+    def responder(messages):
+        if messages[-1]['content'].splitlines()[-1] == bad:
+            raise ValueError(f'cannot translate {bad}')
+        return echo_responder(messages)
+    return responder
+
+
+def sent_texts(calls):
+    return [messages[-1]['content'].splitlines()[-1] for messages in calls]
+
+
+def test_duplicates_use_one_call_and_fan_out_in_order(make_translator):
+    translator, stub = make_translator()
+    texts = ['你好', '世界', '你好', ' 你好 ', '世界']
+    results = asyncio.run(translator.translate_batch(texts, dest='en', src='zh'))
+    assert sorted(sent_texts(stub.calls)) == sorted(['你好', '世界'])
+    assert [r.text for r in results] == ['T(你好)', 'T(世界)', 'T(你好)', 'T(你好)', 'T(世界)']
+    assert [r.origin for r in results] == ['你好', '世界', '你好', '你好', '世界']
+
+
+def test_failed_duplicates_all_get_placeholders(make_translator):
+    translator, stub = make_translator(responder=failing_on('坏'))
+    texts = ['坏', '好', ' 坏', '好', '坏']
+    results = asyncio.run(translator.translate_batch(texts, dest='en', src='zh'))
+    # 失败的文本同样只请求一次，不会因重复而重试
+    assert sorted(sent_texts(stub.calls)) == ['坏', '好']
+    assert [r.origin for r in results] == ['坏', '好', '坏', '好', '坏']
+    for i in (0, 2, 4):
+        assert results[i].text.startswith('Translation failed')
+    assert results[1].text == results[3].text == 'T(好)'
+
+
+def test_unicode_normalized_duplicates(make_translator):
+    translator, stub = make_translator()
+    composed = 'café'
+    decomposed = unicodedata.normalize('NFD', composed)
+    results = asyncio.run(translator.translate_batch([composed, decomposed], dest='zh', src='fr'))
+    assert len(stub.calls) == 1
+    assert results[0].text == results[1].text
+    assert [r.origin for r in results] == [composed, decomposed]
+
+
+def test_packed_batch_sends_each_unique_text_once(make_translator):
+    translator, stub = make_translator()
+    texts = ['一', '二', '一', '三', '二', '一']
+    results = asyncio.run(translator.translate_batch(texts, dest='en', src='zh', packed=True))
+    assert len(stub.calls) == 1
+    user = stub.calls[0][-1]['content']
+    packed = json.loads(user[user.find('{'):user.rfind('}') + 1])
+    assert sorted(packed.values()) == ['一', '三', '二']
+    assert [r.text for r in results] == [f'T({text})' for text in texts]
+
+
+def test_dedup_metrics(make_translator):
+    translator, _ = make_translator()
+    asyncio.run(translator.translate_batch(['甲', '乙', '甲', '甲'], dest='en', src='zh'))
+    exported = translator.metrics.to_prometheus()
+    assert 'doubao_batch_items_total 4' in exported
+    assert 'doubao_batch_unique_items_total 2' in exported
+    assert 'doubao_batch_dedup_ratio 0.5' in exported
@@ -0,0 +1,56 @@
+"""
+BatchProcessor和打包批量翻译的离线测试
+"""
+import asyncio
+import json
+
+from doubaotrans import BatchProcessor
+
+
+def test_make_batches_respects_size_weight_and_group():
+    processor = BatchProcessor(max_workers=1, batch_size=3)
+    assert processor._make_batches(list(range(7))) == [[0, 1, 2], [3, 4, 5], [6]]
+
+    weighted = processor._make_batches(['aaaa', 'bb', 'cc', 'd', 'eeeee'], weigh=len, max_weight=5)
+    assert weighted == [['aaaa'], ['bb', 'cc', 'd'], ['eeeee']]
+
+    grouped = processor._make_batches([('a', 1), ('a', 2), ('b', 3), ('b', 4)], group_key=lambda item: item[0])
+    assert grouped == [[('a', 1), ('a', 2)], [('b', 3), ('b', 4)]]
+
+
+def test_process_batches_flattens_results_in_order():
+    async def double(batch):
+        return [item * 2 for item in batch]
+
+    async def run():
+        processor = BatchProcessor(max_workers=2, batch_size=2)
+        return await processor.process_batches([1, 2, 3, 4, 5], double)
+
+    assert asyncio.run(run()) == [2, 4, 6, 8, 10]
+
+
+def test_packed_batch_uses_one_request(make_translator):
+    translator, stub = make_translator()
+    texts = [f'文本{i}' for i in range(6)]
+    results = asyncio.run(translator.translate_batch(texts, dest='en', src='zh', batch_size=10, packed=True))
+    assert len(stub.calls) == 1
+    assert [r.text for r in results] == [f'T({text})' for text in texts]
+    assert [r.origin for r in results] == texts
+
+
+def test_packed_batch_bisects_on_mismatch(make_translator):
+    def drop_last_key(messages):
+        user = messages[-1]['content']
+        data = json.loads(user[user.find('{'):user.rfind('}') + 1]) if '{' in user else None
+        if data is None:
+            return f'T({user.splitlines()[-1]})'
+        if len(data) > 2:
+            data.popitem()
+        return json.dumps({key: f'T({value})' for key, value in data.items()}, ensure_ascii=False)
+
+    translator, stub = make_translator(responder=drop_last_key)
+    texts = [f'文本{i}' for i in range(4)]
+    results = asyncio.run(translator.translate_batch(texts, dest='en', src='zh', batch_size=10, packed=True))
+    assert [r.text for r in results] == [f'T({text})' for text in texts]
+    # 整包不匹配后二分为两个两段的包
+    assert len(stub.calls) == 3
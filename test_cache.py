@@ -0,0 +1,160 @@
+"""
+内存缓存和持久化翻译缓存的离线测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from doubaotrans import AsyncCache, DoubaoTranslated, LRUCache, SQLiteCacheBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'time', clock)
+    return clock
+
+
+def test_lru_evicts_by_entry_count():
+    cache = LRUCache(max_entries=3)
+    for key in 'abcd':
+        cache.set(key, key.upper())
+    assert len(cache) == 3
+    assert cache.get('a') is None
+    assert [cache.get(key) for key in 'bcd'] == ['B', 'C', 'D']
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_lru_evicts_by_bytes():
+    value = DoubaoTranslated('zh', 'en', '你好', 'hello')
+    cache = LRUCache(max_bytes=10 ** 9)
+    cache.set('probe', value)
+    entry_size = cache.get_stats()['bytes']
+
+    cache = LRUCache(max_entries=100, max_bytes=entry_size * 2 + entry_size // 2)
+    for key in ('k1', 'k2', 'k3', 'k4'):
+        cache.set(key, value)
+    stats = cache.get_stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] <= cache.max_bytes
+    assert stats['evictions'] == 2
+    assert cache.get('k1') is None and cache.get('k4') is value
+
+
+def test_lru_refreshes_recency_on_access():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    # 最近读取过的a保留，最久未使用的b被淘汰
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_lru_expires_lazily_on_get(clock):
+    cache = LRUCache(ttl=60)
+    cache.set('a', 1)
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 1
+    assert len(cache) == 1
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_lru_set_expires_oldest_entry(clock):
+    cache = LRUCache(ttl=60)
+    cache.set('old', 1)
+    clock.now += 61
+    cache.set('new', 2)
+    assert len(cache) == 1
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_lru_counters():
+    cache = LRUCache(max_entries=1)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('missing')
+    cache.set('b', 2)
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+    cache.clear()
+    # 清空缓存不重置统计计数
+    assert cache.get_stats()['hits'] == 2 and cache.get_stats()['bytes'] == 0
+
+
+def test_async_cache_wraps_lru():
+    async def run():
+        cache = AsyncCache(max_entries=2)
+        await cache.set('a', 1)
+        await cache.set('b', 2)
+        await cache.get('a')
+        await cache.set('c', 3)
+        values = [await cache.get(key) for key in 'abc']
+        stats = cache.get_stats()
+        await cache.clear()
+        return values, stats, await cache.get('a')
+
+    values, stats, after_clear = asyncio.run(run())
+    assert values == [1, None, 3]
+    assert stats['evictions'] == 1 and stats['entries'] == 2
+    assert after_clear is None
+
+
+def test_persistent_cache_roundtrip_off_event_loop(make_translator, tmp_path):
+    path = tmp_path / 'cache.db'
+
+    async def translate_twice():
+        first, first_stub = make_translator(cache_path=str(path))
+        async with first:
+            result = await first.doubao_translate('持久化缓存', dest='en', src='zh')
+        # 新实例的内存缓存为空，只能从SQLite读到结果
+        second, second_stub = make_translator(cache_path=str(path))
+        async with second:
+            cached = await second.doubao_translate('持久化缓存', dest='en', src='zh')
+        return result, cached, first_stub, second_stub
+
+    result, cached, first_stub, second_stub = asyncio.run(translate_twice())
+    assert len(first_stub.calls) == 1
+    assert not second_stub.calls
+    assert cached.text == result.text
+
+
+def test_slow_backend_does_not_block_event_loop(make_translator):
+    class SlowBackend(SQLiteCacheBackend):
+        def get(self, key):
+            import time
+            time.sleep(0.2)
+            return None
+
+    async def run():
+        translator, _ = make_translator(cache_backend=SlowBackend(':memory:'))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await translator.doubao_translate('慢速缓存', dest='en', src='zh')
+        task.cancel()
+        return ticks
+
+    # 查询在缓存线程中执行，等待期间事件循环仍在运行
+    assert asyncio.run(run()) >= 5
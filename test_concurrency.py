@@ -0,0 +1,156 @@
+"""
+AdaptiveConcurrencyLimiter控制律的离线测试
+"""
+import asyncio
+
+import httpx
+import openai
+
+from doubaotrans import AdaptiveConcurrencyLimiter, _is_overload_error
+
+
+def acquire(limiter, count=1):
+    """同步地获取count个槽位，返回各自的获取时刻"""
+    async def run():
+        return [await limiter.acquire() for _ in range(count)]
+    return asyncio.run(run())
+
+
+def saturated_successes(limiter, count):
+    """在槽位占满的状态下完成count个成功请求"""
+    held = []
+    for _ in range(count):
+        held += acquire(limiter, limiter.limit - limiter.inflight)
+        limiter.release(held.pop(0), latency=0.1)
+    for at in held:
+        limiter.release(at, latency=0.1)
+
+
+def api_error(status):
+    request = httpx.Request('POST', 'https://example.invalid/chat/completions')
+    response = httpx.Response(status, request=request)
+    if status == 429:
+        return openai.RateLimitError('rate limited', response=response, body=None)
+    if status >= 500:
+        return openai.InternalServerError('server error', response=response, body=None)
+    return openai.BadRequestError('bad request', response=response, body=None)
+
+
+def test_additive_increase_when_saturated():
+    limiter = AdaptiveConcurrencyLimiter(2, max_limit=10)
+    # 每个成功请求增加1/limit，约一个窗口（limit个成功请求）上限加1
+    saturated_successes(limiter, 1)
+    assert limiter.increases == 1 and limiter.limit == 2
+    for expected in (3, 4, 5):
+        saturated_successes(limiter, limiter.limit + 1)
+        assert limiter.limit == expected
+    assert limiter.decreases == 0
+
+
+def test_no_increase_without_saturation():
+    limiter = AdaptiveConcurrencyLimiter(4)
+    for _ in range(20):
+        at, = acquire(limiter)
+        limiter.release(at, latency=0.1)
+    assert limiter.limit == 4
+    assert limiter.increases == 0
+
+
+def test_multiplicative_decrease_on_overload():
+    limiter = AdaptiveConcurrencyLimiter(8)
+    at, = acquire(limiter)
+    limiter.release(at, overloaded=True)
+    assert limiter.limit == 4
+    at, = acquire(limiter)
+    limiter.release(at, overloaded=True)
+    assert limiter.limit == 2
+    assert limiter.decreases == 2
+
+
+def test_requests_started_before_decrease_do_not_decrease_again():
+    limiter = AdaptiveConcurrencyLimiter(8)
+    acquired = acquire(limiter, 4)
+    for at in acquired:
+        limiter.release(at, overloaded=True)
+    # 同一波过载只下调一次
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+
+
+def test_latency_spike_decreases():
+    limiter = AdaptiveConcurrencyLimiter(8, latency_tolerance=2.0)
+    at, = acquire(limiter)
+    limiter.release(at, latency=0.1, tokens=10)
+    # 按token归一化后延迟相同，不算突增
+    at, = acquire(limiter)
+    limiter.release(at, latency=1.0, tokens=100)
+    assert limiter.decreases == 0
+    at, = acquire(limiter)
+    limiter.release(at, latency=1.0, tokens=10)
+    assert limiter.decreases == 1
+    assert limiter.limit == 4
+
+
+def test_limit_stays_within_bounds():
+    limiter = AdaptiveConcurrencyLimiter(4, min_limit=2, max_limit=5)
+    for _ in range(10):
+        at, = acquire(limiter)
+        limiter.release(at, overloaded=True)
+    assert limiter.limit == 2
+
+    saturated_successes(limiter, 50)
+    assert limiter.limit == 5
+    assert limiter.get_stats()['max_limit'] == 5
+
+
+def test_non_adaptive_limit_is_fixed():
+    limiter = AdaptiveConcurrencyLimiter(3, adaptive=False)
+    acquired = acquire(limiter, 3)
+    for at in acquired:
+        limiter.release(at, latency=0.1, overloaded=True)
+    assert limiter.limit == 3
+
+
+def test_waiters_are_bounded_by_limit():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(2, adaptive=False)
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            at = await limiter.acquire()
+            peak = max(peak, limiter.inflight)
+            await asyncio.sleep(0.01)
+            limiter.release(at)
+
+        await asyncio.gather(*(work() for _ in range(6)))
+        return peak, limiter.inflight
+
+    assert asyncio.run(run()) == (2, 0)
+
+
+def test_overload_errors():
+    request = httpx.Request('POST', 'https://example.invalid/chat/completions')
+    assert _is_overload_error(api_error(429))
+    assert _is_overload_error(api_error(503))
+    assert _is_overload_error(openai.APITimeoutError(request=request))
+    assert not _is_overload_error(api_error(400))
+    assert not _is_overload_error(ValueError('other'))
+
+
+def test_rate_limited_request_decreases_translator_limit(make_translator):
+    attempts = []
+
+    def rate_limit_once(messages):
+        attempts.append(messages)
+        if len(attempts) == 1:
+            raise api_error(429)
+        return 'hello'
+
+    translator, _ = make_translator(responder=rate_limit_once, retry_multiplier=0.001, max_concurrency=8)
+    initial = translator.concurrency.limit
+    result = asyncio.run(translator.doubao_translate('你好', dest='en', src='zh'))
+    assert result.text == 'hello'
+    assert len(attempts) == 2
+    assert translator.concurrency.decreases == 1
+    assert translator.concurrency.limit == max(initial // 2, translator.concurrency.min_limit)
@@ -0,0 +1,109 @@
+"""
+本地语言检测和doubao_detect_enhanced的离线测试
+"""
+import asyncio
+
+import pytest
+
+LONG_ENGLISH = 'The quick brown fox jumps over the lazy dog near the river bank.'
+
+
+@pytest.mark.parametrize('text,lang', [
+    ('今天天气很好', 'zh'),
+    ('こんにちは世界', 'ja'),
+    ('안녕하세요', 'ko'),
+    ('สวัสดีครับ', 'th'),
+    ('Привет мир', 'ru'),
+    ('नमस्ते दुनिया', 'hi'),
+    ('مرحبا بالعالم', 'ar'),
+])
+def test_script_shortcuts(make_translator, text, lang):
+    translator, _ = make_translator()
+    detected = translator._detect_local(text)
+    assert detected.lang == lang
+    assert detected.confidence == 1.0
+    assert detected.details['source'] == 'local'
+    assert detected.details['method'] == 'script'
+
+
+def test_han_weighted_against_latin(make_translator):
+    translator, _ = make_translator()
+    detected = translator._detect_local('我们使用Python开发')
+    # 6个汉字按3倍权重计为18，6个拉丁字母计为6
+    assert detected.lang == 'zh'
+    assert detected.confidence == pytest.approx(0.75)
+    # 假名和汉字混排按日文计算
+    assert translator._detect_local('東京へ行きます').lang == 'ja'
+
+
+def test_latin_text_uses_langdetect(make_translator):
+    translator, _ = make_translator()
+    detected = translator._detect_local(LONG_ENGLISH)
+    assert detected.lang == 'en'
+    assert detected.details['method'] == 'langdetect'
+    assert detected.confidence > 0.9
+    # 短文本的置信度按字母数折减
+    assert translator._detect_local('Hello').confidence < 0.3
+
+
+def test_no_letters_returns_none(make_translator):
+    translator, _ = make_translator()
+    assert translator._detect_local('12345 !! ...') is None
+
+
+def test_confident_local_result_skips_api(make_translator):
+    translator, stub = make_translator()
+    detected = asyncio.run(translator.doubao_detect('今天天气很好'))
+    assert detected.lang == 'zh' and detected.details['source'] == 'local'
+    assert not stub.calls
+
+
+def test_below_threshold_falls_back_to_api(make_translator):
+    translator, stub = make_translator()
+    detected = asyncio.run(translator.doubao_detect('我们使用Python开发'))
+    # 0.75低于默认阈值0.8，改用API结果并附上本地检测信息
+    assert len(stub.calls) == 1
+    assert detected.details['source'] == 'api'
+    assert detected.details['local'] == {'lang': 'zh', 'confidence': pytest.approx(0.75)}
+
+
+def test_threshold_is_configurable(make_translator):
+    translator, stub = make_translator(local_detect_threshold=0.7)
+    assert asyncio.run(translator.doubao_detect('我们使用Python开发')).details['source'] == 'local'
+    assert not stub.calls
+
+
+def test_local_detection_can_be_disabled(make_translator):
+    translator, stub = make_translator(local_detection=False)
+    detected = asyncio.run(translator.doubao_detect('안녕하세요'))
+    assert detected.details['source'] == 'api'
+    assert len(stub.calls) == 1
+
+
+def test_enhanced_weights_local_result_as_local(make_translator):
+    translator, stub = make_translator()
+    detected = asyncio.run(translator.doubao_detect_enhanced('안녕하세요 여러분'))
+    assert not stub.calls
+    methods = detected.details['detection_methods']
+    assert methods['local'] and not methods['doubao']
+    # 本地结果不享受API结果的1.2倍权重
+    assert detected.details['raw_scores']['ko'] <= 2.0
+    assert detected.lang == 'ko'
+
+
+def test_enhanced_does_not_count_langdetect_twice(make_translator):
+    translator, _ = make_translator()
+    detected = asyncio.run(translator.doubao_detect_enhanced(LONG_ENGLISH))
+    methods = detected.details['detection_methods']
+    assert methods == {'doubao': False, 'local': True, 'langdetect': False}
+    assert detected.details['raw_scores']['en'] == pytest.approx(translator._detect_local(LONG_ENGLISH).confidence)
+
+
+def test_enhanced_weights_api_result(make_translator):
+    translator, stub = make_translator(local_detection=False)
+    detected = asyncio.run(translator.doubao_detect_enhanced('今天天气很好，我们出去走走吧'))
+    assert len(stub.calls) == 1
+    methods = detected.details['detection_methods']
+    assert methods['doubao'] and not methods['local']
+    assert detected.details['raw_scores']['zh'] >= 1.2
+    assert detected.lang == 'zh'
@@ -0,0 +1,116 @@
+"""
+doubao_detect_batch打包检测、缓存复用和二分重试的离线测试
+"""
+import asyncio
+import json
+
+from conftest import echo_responder
+
+
+def packed_texts(messages):
+    """返回一次检测请求包含的文本，单条检测时返回只含该文本的列表"""
+    user = messages[-1]['content']
+    if 'JSON' in messages[0]['content']:
+        return list(json.loads(user[user.find('{'):user.rfind('}') + 1]).values())
+    return [user.splitlines()[-1]]
+
+
+def sent_texts(calls):
+    return sorted(text for messages in calls for text in packed_texts(messages))
+
+
+TEXTS = ['第一段文本', 'second text', '第三段', 'fourth one', '第五段文本内容']
+
+
+def test_packs_unique_texts_into_one_request(make_translator):
+    translator, stub = make_translator(local_detection=False)
+    texts = TEXTS + [' 第一段文本 ', '', 'second text']
+    results = asyncio.run(translator.doubao_detect_batch(texts))
+    assert len(stub.calls) == 1
+    assert sent_texts(stub.calls) == sorted(TEXTS)
+    assert [r.lang if r else None for r in results] == ['zh'] * 6 + [None, 'zh']
+    # 重复文本共享同一个结果
+    assert results[0] is results[5]
+
+
+def test_batch_size_limits_pack(make_translator):
+    translator, stub = make_translator(local_detection=False)
+    asyncio.run(translator.doubao_detect_batch(TEXTS, batch_size=2))
+    assert sorted(len(packed_texts(messages)) for messages in stub.calls) == [1, 2, 2]
+    assert sent_texts(stub.calls) == sorted(TEXTS)
+
+
+def test_cached_results_are_reused(make_translator):
+    translator, stub = make_translator(local_detection=False)
+    first = asyncio.run(translator.doubao_detect_batch(TEXTS[:3]))
+    second = asyncio.run(translator.doubao_detect_batch(TEXTS))
+    assert len(stub.calls) == 2
+    # 第二次只发送未缓存的文本
+    assert sorted(packed_texts(stub.calls[1])) == sorted(TEXTS[3:])
+    assert [r.lang for r in second] == ['zh'] * 5
+    assert second[:3] == first
+    # 单条检测同样复用批量检测的缓存
+    asyncio.run(translator._cached_detect(TEXTS[4]))
+    assert len(stub.calls) == 2
+
+
+def test_local_detection_skips_api(make_translator):
+    translator, stub = make_translator()
+    results = asyncio.run(translator.doubao_detect_batch(['안녕하세요', '今天天气很好', 'ok', '我们使用Python开发']))
+    assert [r.details['source'] for r in results] == ['local', 'local', 'api', 'api']
+    assert sent_texts(stub.calls) == sorted(['ok', '我们使用Python开发'])
+
+
+def truncating_responder(messages):
+    """打包检测超过两条时少返回一条，迫使调用方二分"""
+    reply = echo_responder(messages)
+    if 'JSON' in messages[0]['content'] and len(packed_texts(messages)) > 2:
+        data = json.loads(reply)
+        data.popitem()
+        return json.dumps(data)
+    return reply
+
+
+def test_mismatched_pack_is_bisected(make_translator):
+    translator, stub = make_translator(responder=truncating_responder, local_detection=False)
+    results = asyncio.run(translator.doubao_detect_batch(TEXTS[:4]))
+    assert [r.lang for r in results] == ['zh'] * 4
+    # 4条的打包不匹配，二分为两个2条的打包
+    assert [len(packed_texts(messages)) for messages in stub.calls] == [4, 2, 2]
+    assert sent_texts(stub.calls[1:]) == sorted(TEXTS[:4])
+
+
+def test_bisect_down_to_single_detection(make_translator):
+    def responder(messages):
+        if 'JSON' in messages[0]['content']:
+            return 'not json'
+        return echo_responder(messages)
+
+    translator, stub = make_translator(responder=responder, local_detection=False)
+    results = asyncio.run(translator.doubao_detect_batch(TEXTS[:3]))
+    assert [r.lang for r in results] == ['zh'] * 3
+    # 3 -> 1 + 2 -> 1 + 1 + 1
+    assert sorted(len(packed_texts(messages)) for messages in stub.calls) == [1, 1, 1, 2, 3]
+
+
+def test_failed_pack_returns_none_and_is_not_cached(make_translator):
+    broken = {'bad': True}
+
+    def responder(messages):
+        if broken['bad'] and 'fourth one' in packed_texts(messages):
+            raise ValueError('boom')
+        return echo_responder(messages)
+
+    translator, stub = make_translator(responder=responder, local_detection=False)
+    results = asyncio.run(translator.doubao_detect_batch(TEXTS[:4], batch_size=2))
+    failed = [i for i, r in enumerate(results) if r is None]
+    # 包含失败文本的整个打包失败，其余打包不受影响
+    assert 3 in failed and len(failed) == 2
+    assert all(results[i].lang == 'zh' for i in range(4) if i not in failed)
+
+    broken['bad'] = False
+    calls = len(stub.calls)
+    retried = asyncio.run(translator.doubao_detect_batch(TEXTS[:4]))
+    assert [r.lang for r in retried] == ['zh'] * 4
+    # 只有失败的文本会再次发送
+    assert sent_texts(stub.calls[calls:]) == sorted(TEXTS[i] for i in failed)
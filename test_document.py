@@ -0,0 +1,112 @@
+"""
+文档翻译的离线测试
+"""
+import asyncio
+import json
+
+import pytest
+
+from doubaotrans import DocumentContext, _estimate_tokens
+
+from conftest import echo_responder
+
+
+def rolling_responder(messages):
+    """rolling模式返回译文、摘要和术语；其余请求交给默认桩"""
+    if 'summary' not in messages[0]['content']:
+        return echo_responder(messages)
+    user = messages[-1]['content']
+    payload = user[user.rfind('需要翻译的段落'):]
+    data = json.loads(payload[payload.find('{'):payload.rfind('}') + 1])
+    return json.dumps({'translations': {k: f'T({v})' for k, v in data.items()}, 'summary': '摘要', 'terms': {}},
+                      ensure_ascii=False)
+
+
+@pytest.mark.parametrize('mode', ['paragraph', 'window', 'rolling'])
+def test_progress_is_reported_in_paragraphs(make_translator, mode):
+    translator, _ = make_translator(responder=rolling_responder)
+    paragraphs = [f'第{i}段。' for i in range(7)]
+    progress = []
+
+    results = asyncio.run(translator.translate_document_with_context(
+        paragraphs, dest='en', src='zh', batch_size=3, mode=mode,
+        progress_callback=lambda done, total: progress.append((done, total))
+    ))
+
+    assert [r.origin for r in results] == paragraphs
+    assert all(not r.text.startswith('Translation failed') for r in results)
+    assert all(total == len(paragraphs) for _, total in progress)
+    assert progress[-1] == (7, 7)
+    if mode != 'paragraph':
+        assert sorted(done for done, _ in progress) == [3, 6, 7]
+
+
+def test_window_mode_sends_one_request_per_block(make_translator):
+    translator, stub = make_translator()
+    paragraphs = [f'第{i}段。' for i in range(7)]
+    results = asyncio.run(translator.translate_document_with_context(paragraphs, dest='en', src='zh',
+                                                                     batch_size=3, mode='window'))
+    assert len(stub.calls) == 3
+    assert [r.text for r in results] == [f'T({p})' for p in paragraphs]
+
+
+@pytest.mark.parametrize('max_tokens', [32, 64, 512])
+@pytest.mark.parametrize('summary', ['摘要' * 400, 'summary ' * 400, 'abc' * 100 + '汉' * 300])
+def test_context_render_stays_within_budget(max_tokens, summary):
+    context = DocumentContext(max_tokens=max_tokens)
+    context.update(summary=summary, terms={f'term{i}': f'术语{i}' for i in range(200)})
+    assert _estimate_tokens(context.summary) <= context.summary_budget
+    assert _estimate_tokens(context.render('term7 appears here')) <= max_tokens
+
+
+def test_context_summary_keeps_most_recent_text():
+    context = DocumentContext(max_tokens=20, summary_ratio=0.5)
+    context.update(summary='开头的内容' + '中间' * 20 + '最新的结尾')
+    assert context.summary.endswith('最新的结尾')
+    # 恰好填满预算，而不是按字符比例少保留
+    assert _estimate_tokens(context.summary) == context.summary_budget == 10
+    context.update(summary='新摘要')
+    assert context.summary == '新摘要'
+
+
+def test_context_terms_are_not_overwritten():
+    context = DocumentContext()
+    context.update(terms={' Alice ': '爱丽丝', 'Bob': '鲍勃', 'bad': 3, '': '空'})
+    context.update(terms={'Alice': '艾丽斯', 'Carol': '卡罗尔'})
+    assert dict(context.terms) == {'Alice': '爱丽丝', 'Bob': '鲍勃', 'Carol': '卡罗尔'}
+
+
+def test_context_prefers_terms_in_text_then_most_recent():
+    context = DocumentContext(max_tokens=30)
+    context.update(terms={f'term{i}': f'术语{i}' for i in range(10)})
+    rendered = context.render('only term2 is here')
+    lines = [line for line in rendered.splitlines() if line.startswith('- ')]
+    # 预算只够少数几条：文中出现的术语排在最前，其余按最近确定的顺序
+    assert lines[0] == '- term2 → 术语2'
+    assert lines[1:] == [f'- term{i} → 术语{i}' for i in range(9, 9 - len(lines) + 1, -1)]
+    assert 1 < len(lines) < 10
+
+
+def test_rolling_mode_prompt_respects_context_budget(make_translator):
+    def responder(messages):
+        if 'summary' not in messages[0]['content']:
+            return echo_responder(messages)
+        user = messages[-1]['content']
+        payload = user[user.rfind('需要翻译的段落'):]
+        data = json.loads(payload[payload.find('{'):payload.rfind('}') + 1])
+        return json.dumps({
+            'translations': {k: f'T({v})' for k, v in data.items()},
+            'summary': '很长的摘要' * 200,
+            'terms': {f'名词{k}{i}': f'noun{k}{i}' for k in data for i in range(50)}
+        }, ensure_ascii=False)
+
+    translator, stub = make_translator(responder=responder)
+    paragraphs = [f'第{i}段。' for i in range(6)]
+    asyncio.run(translator.translate_document_with_context(paragraphs, dest='en', src='zh', batch_size=2,
+                                                           mode='rolling', context_budget=48))
+    assert len(stub.calls) == 3
+    for messages in stub.calls[1:]:
+        user = messages[-1]['content']
+        assert '前文摘要' in user
+        context = user[user.find('前文摘要'):user.rfind('summary请控制在')].strip()
+        assert _estimate_tokens(context) <= 48
@@ -0,0 +1,89 @@
+"""
+术语匹配和本地术语校验的离线测试
+"""
+import asyncio
+import json
+
+from doubaotrans import GlossaryMatcher
+
+
+def test_enforce_glossary_is_case_insensitive(make_translator):
+    translator, _ = make_translator()
+    # 源文本中匹配到的是小写ai，模型原样保留成了AI
+    result = translator._enforce_glossary('AI models are improving', [('ai', '人工智能')])
+    assert result == '人工智能 models are improving'
+
+
+def test_enforce_glossary_respects_word_boundaries(make_translator):
+    translator, _ = make_translator()
+    result = translator._enforce_glossary('The main AI system', [('ai', 'artificial intelligence')])
+    assert result == 'The main artificial intelligence system'
+
+
+def test_enforce_glossary_keeps_translation_with_target(make_translator):
+    translator, _ = make_translator()
+    # 目标术语已出现（大小写不同）时不再替换
+    text = 'Artificial Intelligence and ai'
+    assert translator._enforce_glossary(text, [('ai', 'artificial intelligence')]) == text
+
+
+def test_enforce_glossary_target_inside_longer_word_is_not_present(make_translator):
+    translator, _ = make_translator()
+    # database中的data不算目标术语出现，仍需替换残留的源术语
+    result = translator._enforce_glossary('database 数据', [('数据', 'data')])
+    assert result == 'database data'
+
+
+def find_sources(matcher, text):
+    return [(text[start:end], matcher.terms[index][1]) for start, end, index in matcher.find(text)]
+
+
+def test_matcher_requires_latin_word_boundaries():
+    matcher = GlossaryMatcher([('ai', 'ai', '人工智能')])
+    assert matcher.find('maid') == []
+    assert matcher.find('AIR quality') == []
+    assert find_sources(matcher, 'AI, ai and (Ai)') == [('AI', 'ai'), ('ai', 'ai'), ('Ai', 'ai')]
+
+
+def test_matcher_prefers_leftmost_longest():
+    matcher = GlossaryMatcher([('ai', 'AI', '人工智能'), ('model', 'AI model', '人工智能模型')])
+    assert find_sources(matcher, 'An AI model beats AI') == [('AI model', 'AI model'), ('AI', 'AI')]
+
+
+def test_matcher_cjk_terms_need_no_boundaries():
+    matcher = GlossaryMatcher([('ai', '人工智能', 'AI'), ('chip', '芯片', 'chip')])
+    assert find_sources(matcher, '发展人工智能芯片技术') == [('人工智能', '人工智能'), ('芯片', '芯片')]
+
+
+def test_matcher_mixed_script_text():
+    matcher = GlossaryMatcher([('ai', 'ai', '人工智能'), ('chip', '芯片', 'chip'), ('gpu', 'GPU', '图形处理器')])
+    # 拉丁术语与汉字相邻时同样视为处于词边界
+    assert find_sources(matcher, '使用AI芯片和gpu集群') == [('AI', 'ai'), ('芯片', '芯片'), ('gpu', 'GPU')]
+    assert find_sources(matcher, 'GPUs和AI2') == []
+
+
+def test_matcher_rebuilt_after_add_term(make_translator):
+    translator, _ = make_translator()
+    translator.add_term('ai', {'en': 'AI', 'zh': '人工智能'})
+    assert translator._match_glossary_terms('AI and GPU', 'en', 'zh') == [('AI', '人工智能')]
+    translator.add_term('gpu', {'en': 'GPU', 'zh': '图形处理器'})
+    assert translator._match_glossary_terms('AI and GPU', 'en', 'zh') == [('AI', '人工智能'), ('GPU', '图形处理器')]
+
+
+def test_matcher_rebuilt_after_load_glossary(make_translator, tmp_path):
+    translator, _ = make_translator()
+    translator.add_term('ai', {'en': 'AI', 'zh': '人工智能'})
+    assert translator._match_glossary_terms('AI and GPU', 'en', 'zh') == [('AI', '人工智能')]
+    path = tmp_path / 'glossary.json'
+    path.write_text(json.dumps({'gpu': {'en': 'GPU', 'zh': '图形处理器'}}), encoding='utf-8')
+    translator.load_glossary(path)
+    assert translator._match_glossary_terms('AI and GPU', 'en', 'zh') == [('GPU', '图形处理器')]
+
+
+def test_apply_glossary_restores_terms(make_translator):
+    translator, stub = make_translator()
+    translator.add_term('ai', {'en': 'AI', 'zh': '人工智能'})
+    result = asyncio.run(translator.apply_glossary('AI helps the maid', 'en', 'zh'))
+    assert result.text == 'T(人工智能 helps the maid)'
+    assert result.origin == 'AI helps the maid'
+    assert '[[TERM_ai_]]' in stub.calls[0][-1]['content']
@@ -0,0 +1,79 @@
+"""
+对冲请求的离线测试
+"""
+import asyncio
+import time
+
+import httpx
+import openai
+
+from conftest import StubCompletions
+
+
+class ScheduledCompletions(StubCompletions):
+    """按delays依次为每次调用设置耗时，用完后不再等待"""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = list(delays)
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        self.delay = self.delays.pop(0) if self.delays else 0.0
+        return await super().create(model, messages, stream=stream, **kwargs)
+
+
+def hedging_translator(make_translator, **kwargs):
+    """返回延迟直方图已有样本、对冲预算充足的翻译器"""
+    translator, _ = make_translator(hedge_min_samples=2, hedge_budget_ratio=1.0, hedge_min_delay=0.01, **kwargs)
+    asyncio.run(translator.translate_batch(['预热一', '预热二'], dest='en', src='zh'))
+    return translator
+
+
+def install(translator, completions):
+    translator.client_manager.client.chat.completions = completions
+    return completions
+
+
+def test_hedge_cuts_slow_primary(make_translator):
+    translator = hedging_translator(make_translator)
+    stub = install(translator, ScheduledCompletions([0.5, 0.0]))
+    start = time.monotonic()
+    result = asyncio.run(translator.doubao_translate('你好', dest='en', src='zh', hedge=True))
+    assert time.monotonic() - start < 0.4
+    assert result.text == 'T(你好)'
+    assert len(stub.calls) == 2
+    stats = translator.hedge_policy.get_stats()
+    assert stats['hedges'] == 1 and stats['wins'] == 1
+
+
+def test_hedge_is_off_by_default(make_translator):
+    translator = hedging_translator(make_translator, performance_mode='fast')
+    stub = install(translator, ScheduledCompletions([0.1]))
+    asyncio.run(translator.doubao_translate('你好', dest='en', src='zh'))
+    assert len(stub.calls) == 1
+    stats = translator.hedge_policy.get_stats()
+    assert stats['hedges'] == 0 and stats['budget'] == 0
+
+
+def test_batch_does_not_hedge(make_translator):
+    translator = hedging_translator(make_translator)
+    stub = install(translator, ScheduledCompletions([0.1, 0.1]))
+    asyncio.run(translator.translate_batch(['你好', '世界'], dest='en', src='zh'))
+    assert len(stub.calls) == 2
+    assert translator.hedge_policy.get_stats()['hedges'] == 0
+
+
+def test_hedge_budget_deposited_once_per_call(make_translator):
+    request = httpx.Request('POST', 'https://example.invalid/chat/completions')
+    errors = [openai.InternalServerError('HTTP 503', response=httpx.Response(503, request=request), body=None)] * 2
+
+    def fail_twice(messages):
+        if errors:
+            raise errors.pop()
+        return 'hello'
+
+    translator, stub = make_translator(responder=fail_twice, retry_multiplier=0.001, hedge_budget_ratio=0.25)
+    asyncio.run(translator.doubao_translate('你好', dest='en', src='zh', hedge=True))
+    assert len(stub.calls) == 3
+    # 重试两次仍只为对冲预算存入一次
+    assert translator.hedge_policy.get_stats()['budget'] == 0.25
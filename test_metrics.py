@@ -0,0 +1,160 @@
+"""
+LatencyHistogram、Prometheus导出和请求指标记录的离线测试
+"""
+import asyncio
+import math
+import random
+import re
+
+import pytest
+
+from doubaotrans import LatencyHistogram, MetricsRegistry, PerformanceMetrics
+from test_hedge import ScheduledCompletions, hedging_translator, install
+from test_retry import api_error, failing
+
+MESSAGES = [{'role': 'system', 'content': '翻译'}, {'role': 'user', 'content': '你好'}]
+
+
+def exact_percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)), 1) - 1]
+
+
+@pytest.mark.parametrize('sub_buckets', [4, 16, 64])
+def test_percentile_within_bucket_error_bound(sub_buckets):
+    random.seed(sub_buckets)
+    # 覆盖0.5ms到约20s的对数均匀分布
+    values = [math.exp(random.uniform(math.log(0.0005), math.log(20))) for _ in range(5000)]
+    histogram = LatencyHistogram(sub_buckets=sub_buckets)
+    for value in values:
+        histogram.record(value)
+
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = exact_percentile(values, q)
+        estimate = histogram.percentile(q)
+        # 取桶上界，估计值不小于真实值，相对误差不超过1/sub_buckets
+        assert exact <= estimate <= exact * (1 + 1 / sub_buckets)
+    assert histogram.percentile(1.0) == max(values)
+
+
+def test_small_values_and_empty_histogram():
+    histogram = LatencyHistogram(unit=0.001)
+    assert histogram.percentile(0.5) == 0.0
+    histogram.record(0.0)
+    histogram.record(0.0005)
+    assert histogram.percentile(0.5) == 0.0005
+    assert histogram.summary()['count'] == 2
+
+
+def test_merge_matches_single_histogram():
+    values = [0.001 * i for i in range(1, 200)]
+    whole, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, value in enumerate(values):
+        whole.record(value)
+        (left if i % 2 else right).record(value)
+    left.merge(right)
+    assert left.counts == whole.counts
+    assert left.summary() == pytest.approx(whole.summary())
+
+
+def parse_prometheus(text):
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        name, value = line.rsplit(' ', 1)
+        samples[name] = float(value)
+    return samples
+
+
+def test_prometheus_histogram_format():
+    registry = MetricsRegistry()
+    registry.describe('latency_seconds', 'Latency')
+    values = [0.0003, 0.002, 0.002, 0.05, 1.5, 500.0]
+    for value in values:
+        registry.observe('latency_seconds', value, {'operation': 'translate', 'model': None})
+    text = registry.to_prometheus()
+
+    assert '# HELP latency_seconds Latency' in text
+    assert '# TYPE latency_seconds histogram' in text
+    # 值为None的标签不导出
+    assert 'model=' not in text
+
+    samples = parse_prometheus(text)
+    buckets = []
+    for name, value in samples.items():
+        match = re.fullmatch(r'latency_seconds_bucket\{operation="translate",le="([^"]+)"\}', name)
+        assert match or not name.startswith('latency_seconds_bucket'), name
+        if match:
+            buckets.append((float(match.group(1)), value))
+    assert [bound for bound, _ in buckets] == sorted(MetricsRegistry.EXPORT_BUCKETS) + [math.inf]
+
+    # 桶计数是累计值，与真实的不超过上界的样本数一致
+    counts = [count for _, count in buckets]
+    assert counts == sorted(counts)
+    for bound, count in buckets:
+        assert count == sum(1 for value in values if value <= bound)
+    assert samples['latency_seconds_bucket{operation="translate",le="+Inf"}'] == len(values)
+    assert samples['latency_seconds_count{operation="translate"}'] == len(values)
+    assert samples['latency_seconds_sum{operation="translate"}'] == pytest.approx(sum(values))
+
+
+def test_prometheus_counters_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.inc('events_total', 2, labels={'reason': 'say "hi"\n'})
+    registry.set_gauge('queue_depth', 3)
+    text = registry.to_prometheus()
+    assert '# TYPE events_total counter' in text
+    assert 'events_total{reason="say \\"hi\\"\\n"} 2' in text
+    assert '# TYPE queue_depth gauge' in text
+    assert 'queue_depth 3' in text
+
+
+def test_record_request_labels():
+    metrics = PerformanceMetrics()
+    metrics.record_request(0.1, True, 'translate', 'model-a', 'zh->en')
+    metrics.record_request(0.2, False, 'translate', 'model-a', 'zh->en', 'timeout')
+    summaries = {s['labels']['outcome']: s for s in metrics.registry.summaries(metrics.REQUEST_DURATION)}
+    assert set(summaries) == {'success', 'timeout'}
+    assert summaries['timeout']['labels'] == {
+        'operation': 'translate', 'model': 'model-a', 'lang_pair': 'zh->en', 'outcome': 'timeout'
+    }
+    assert metrics.get_metrics()['error_rate'] == 0.5
+
+
+def request_counts(translator):
+    histogram = translator.metrics.registry.histogram(translator.metrics.REQUEST_DURATION)
+    return translator.metrics.request_count, histogram.count
+
+
+def test_retried_request_recorded_once(make_translator):
+    translator, stub = make_translator(responder=failing([api_error(503), api_error(503)]),
+                                       retry_multiplier=0.001)
+    assert asyncio.run(translator._make_request(MESSAGES, operation='translate')) == 'hello'
+    assert len(stub.calls) == 3
+    assert request_counts(translator) == (1, 1)
+    histogram = translator.metrics.registry.histogram(translator.metrics.REQUEST_DURATION, outcome='success')
+    assert histogram.count == 1
+    # 用量只计入成功的那次调用
+    assert translator.metrics.prompt_tokens == 10
+
+
+def test_failed_retries_recorded_once(make_translator):
+    translator, stub = make_translator(responder=failing([api_error(503)] * 5),
+                                       max_retries=2, retry_multiplier=0.001)
+    with pytest.raises(Exception):
+        asyncio.run(translator._make_request(MESSAGES))
+    assert len(stub.calls) == 3
+    assert request_counts(translator) == (1, 1)
+    assert translator.metrics.get_metrics()['error_rate'] == 1.0
+
+
+def test_hedged_request_recorded_once(make_translator):
+    translator = hedging_translator(make_translator)
+    before = request_counts(translator)
+    stub = install(translator, ScheduledCompletions([0.3, 0.0]))
+    asyncio.run(translator.doubao_translate('你好', dest='en', src='zh', hedge=True))
+    assert len(stub.calls) == 2
+    assert request_counts(translator) == (before[0] + 1, before[1] + 1)
+    # 被取消的一方不计入用量
+    assert translator.metrics.get_usage_breakdown()['operations']['translate']['calls'] == before[0] + 1
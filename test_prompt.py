@@ -0,0 +1,88 @@
+"""
+PromptTemplate固定前缀的离线测试
+"""
+import asyncio
+
+from doubaotrans import PromptTemplate
+
+
+def system_bytes(messages):
+    assert messages[0]['role'] == 'system'
+    return messages[0]['content'].encode('utf-8')
+
+
+def test_build_keeps_prefix_byte_identical():
+    template = PromptTemplate('系统提示', '\n  固定指令  \n')
+    first = template.build('第一段文本')
+    second = template.build('完全不同的文本', '术语约束：AI → 人工智能')
+    assert system_bytes(first) == system_bytes(second) == '系统提示\n\n固定指令'.encode('utf-8')
+    # 约束紧跟前缀，payload放在最后
+    assert first[1]['content'] == '第一段文本'
+    assert second[1]['content'] == '术语约束：AI → 人工智能\n\n完全不同的文本'
+
+
+def test_translate_prefix_independent_of_text_and_languages(make_translator):
+    translator, stub = make_translator()
+
+    async def run():
+        await translator.doubao_translate('你好', dest='en', src='zh')
+        await translator.doubao_translate('Bonjour tout le monde', dest='ja', src='fr')
+        await translator.doubao_translate('こんにちは', dest='ko', src='ja')
+
+    asyncio.run(run())
+    assert len(stub.calls) == 3
+    assert len({system_bytes(messages) for messages in stub.calls}) == 1
+    assert all('你好' not in messages[0]['content'] for messages in stub.calls)
+
+
+def test_glossary_constraints_stay_out_of_prefix(make_translator):
+    translator, stub = make_translator()
+    translator.add_term('ai', {'en': 'AI', 'zh': '人工智能'})
+    translator.add_term('gpu', {'en': 'GPU', 'zh': '图形处理器'})
+
+    async def run():
+        await translator.translate_with_context('人工智能很重要', '背景一', dest='en', src='zh')
+        await translator.translate_with_context('图形处理器很快', '另一个背景', dest='en', src='zh')
+        await translator.translate_with_context('没有术语的句子', '背景三', dest='en', src='zh')
+
+    asyncio.run(run())
+    assert len({system_bytes(messages) for messages in stub.calls}) == 1
+    users = [messages[1]['content'] for messages in stub.calls]
+    assert 'AI' in users[0] and 'GPU' in users[1]
+    assert 'AI' not in users[2] and 'GPU' not in users[2]
+
+
+def test_packed_batch_prefix_is_shared(make_translator):
+    translator, stub = make_translator()
+
+    async def run():
+        await translator.translate_batch(['一', '二'], dest='en', src='zh', packed=True)
+        await translator.translate_batch(['三', '四', '五'], dest='de', src='zh', packed=True)
+
+    asyncio.run(run())
+    assert len(stub.calls) == 2
+    assert system_bytes(stub.calls[0]) == system_bytes(stub.calls[1])
+
+
+def test_style_prefix_is_stable_across_calls(make_translator):
+    translator, stub = make_translator()
+
+    async def run():
+        await translator.translate_with_context('第一句', '背景', dest='en', src='zh', style_guide='正式')
+        await translator.translate_with_context('第二句', '背景', dest='en', src='zh', style_guide='正式')
+        await translator.translate_with_context('第三句', '背景', dest='en', src='zh')
+
+    asyncio.run(run())
+    prefixes = [system_bytes(messages) for messages in stub.calls]
+    assert prefixes[0] == prefixes[1]
+    # 风格指南属于固定前缀的一部分，且只追加在无风格前缀之后
+    assert prefixes[0] != prefixes[2] and prefixes[0].startswith(prefixes[2])
+
+
+def test_document_blocks_share_prefix(make_translator):
+    translator, stub = make_translator()
+    paragraphs = [f'第{i}段。' for i in range(6)]
+    asyncio.run(translator.translate_document_with_context(paragraphs, dest='en', src='zh', batch_size=2,
+                                                           mode='window', style_guide='简洁'))
+    assert len(stub.calls) == 3
+    assert len({system_bytes(messages) for messages in stub.calls}) == 1
@@ -0,0 +1,98 @@
+"""
+TokenBucketRateLimiter和并发发起请求的离线测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from doubaotrans import TokenBucketRateLimiter
+
+MESSAGES = [{'role': 'system', 'content': '翻译'}, {'role': 'user', 'content': '你好'}]
+
+
+def test_paces_at_requests_per_second():
+    limiter = TokenBucketRateLimiter(requests_per_second=20)
+    delays = [limiter.reserve() for _ in range(5)]
+    assert delays == pytest.approx([0, 0.05, 0.1, 0.15, 0.2], abs=0.01)
+
+
+def test_paced_acquire_waits():
+    async def run():
+        limiter = TokenBucketRateLimiter(requests_per_second=20)
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(5)))
+        return time.monotonic() - start
+
+    assert 0.18 <= asyncio.run(run()) < 0.4
+
+
+def test_burst_capacity():
+    limiter = TokenBucketRateLimiter(requests_per_second=10, burst=3)
+    delays = [limiter.reserve() for _ in range(5)]
+    assert delays[:3] == [0, 0, 0]
+    assert delays[3:] == pytest.approx([0.1, 0.2], abs=0.01)
+
+
+def test_tokens_per_minute_cost():
+    limiter = TokenBucketRateLimiter(tokens_per_minute=600)
+    assert limiter.reserve(600) == 0
+    # 每秒补充10个令牌，60个令牌需要约6秒
+    assert limiter.reserve(60) == pytest.approx(6, abs=0.05)
+    # 不带令牌数的请求不受令牌预算限制
+    assert limiter.reserve() == 0
+
+
+def test_oversized_request_costs_one_full_bucket():
+    limiter = TokenBucketRateLimiter(tokens_per_minute=600)
+    assert limiter.reserve(10000) == 0
+    assert limiter.reserve(600) == pytest.approx(60, abs=0.1)
+
+
+def test_unlimited_by_default():
+    limiter = TokenBucketRateLimiter()
+    assert [limiter.reserve(10 ** 6) for _ in range(100)] == [0] * 100
+
+
+def test_requests_overlap_in_flight(make_translator):
+    translator, stub = make_translator(delay=0.2)
+
+    async def run():
+        start = time.monotonic()
+        results = await asyncio.gather(*(translator._make_request(MESSAGES) for _ in range(5)))
+        return results, time.monotonic() - start
+
+    results, elapsed = asyncio.run(run())
+    assert len(results) == 5 and len(stub.calls) == 5
+    # 串行执行需要1秒
+    assert elapsed < 0.5
+
+
+def test_paced_requests_still_overlap(make_translator):
+    translator, _ = make_translator(delay=0.3)
+    translator.rate_limiter.update(requests_per_second=20, burst=1)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(translator._make_request(MESSAGES) for _ in range(4)))
+        return time.monotonic() - start
+
+    # 按50ms间隔发起，最后一个约在0.15秒发出，整体约0.45秒
+    assert 0.4 <= asyncio.run(run()) < 0.9
+
+
+def test_rate_limited_request_holds_no_concurrency_slot(make_translator):
+    translator, stub = make_translator()
+    translator.rate_limiter.update(requests_per_second=2, burst=1)
+
+    async def run():
+        await translator._make_request(MESSAGES)
+        waiting = asyncio.ensure_future(translator._make_request(MESSAGES))
+        await asyncio.sleep(0.1)
+        # 第二个请求正在等待限流，不应占用并发槽位
+        inflight = translator.concurrency.inflight
+        await waiting
+        return inflight
+
+    assert asyncio.run(run()) == 0
+    assert len(stub.calls) == 2
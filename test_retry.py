@@ -0,0 +1,167 @@
+"""
+RetryPolicy和_make_request重试行为的离线测试
+"""
+import asyncio
+import email.utils
+import random
+import time
+
+import httpx
+import openai
+import pytest
+
+from doubaotrans import DoubaoAPIError, RetryPolicy, _retry_after_seconds
+
+
+def api_error(status, headers=None, message=None):
+    request = httpx.Request('POST', 'https://example.invalid/chat/completions')
+    response = httpx.Response(status, headers=headers, request=request)
+    error_class = {
+        400: openai.BadRequestError,
+        401: openai.AuthenticationError,
+        403: openai.PermissionDeniedError,
+        429: openai.RateLimitError,
+    }.get(status, openai.InternalServerError)
+    return error_class(message or f'HTTP {status}', response=response, body=None)
+
+
+def test_full_jitter_bounds():
+    random.seed(0)
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    for attempt in range(6):
+        cap = min(3.0, 0.5 * 2 ** attempt)
+        samples = [policy.backoff(attempt) for _ in range(500)]
+        assert all(0 <= sample <= cap for sample in samples)
+        # 全抖动在整个区间内取值，而不是集中在上限附近
+        assert min(samples) < cap * 0.1 and max(samples) > cap * 0.9
+
+
+def test_next_delay_uses_backoff_without_retry_after():
+    policy = RetryPolicy(base_delay=0.5, max_delay=8.0)
+    for attempt in range(3):
+        delay = policy.next_delay(api_error(503), attempt)
+        assert 0 <= delay <= 0.5 * 2 ** attempt
+
+
+def test_retry_after_takes_precedence():
+    policy = RetryPolicy(base_delay=0.01, max_delay=0.02)
+    assert policy.next_delay(api_error(429, {'Retry-After': '3'}), 0) == 3.0
+    # retry-after-ms比Retry-After更精确，优先使用
+    assert policy.next_delay(api_error(429, {'retry-after-ms': '1500', 'Retry-After': '10'}), 0) == 1.5
+
+
+def test_retry_after_http_date():
+    date = email.utils.formatdate(time.time() + 5, usegmt=True)
+    assert 3 <= _retry_after_seconds(api_error(503, {'Retry-After': date})) <= 5
+    assert _retry_after_seconds(api_error(503, {'Retry-After': 'soon'})) is None
+    assert _retry_after_seconds(ValueError('no response')) is None
+
+
+def test_retry_after_beyond_limit_gives_up():
+    policy = RetryPolicy(max_retry_after=30)
+    assert policy.next_delay(api_error(429, {'Retry-After': '60'}), 0) is None
+    # 放弃重试不消耗预算
+    assert policy.get_stats()['retries'] == 0
+
+
+def test_max_retries():
+    policy = RetryPolicy(max_retries=2)
+    assert policy.next_delay(api_error(503), 1) is not None
+    assert policy.next_delay(api_error(503), 2) is None
+
+
+def test_budget_exhaustion():
+    policy = RetryPolicy(budget_ratio=0.5, budget_burst=2)
+    assert policy.next_delay(api_error(503), 0) is not None
+    assert policy.next_delay(api_error(503), 0) is not None
+    assert policy.next_delay(api_error(503), 0) is None
+    assert policy.get_stats()['budget_exhausted'] == 1
+
+    # 每个首次请求存入budget_ratio个令牌，两个请求攒够一次重试
+    policy.on_request()
+    assert policy.next_delay(api_error(503), 0) is None
+    policy.on_request()
+    policy.on_request()
+    assert policy.next_delay(api_error(503), 0) is not None
+    assert policy.get_stats()['retries'] == 3
+
+
+def test_budget_is_capped_by_burst():
+    policy = RetryPolicy(budget_ratio=1.0, budget_burst=2)
+    for _ in range(10):
+        policy.on_request()
+    assert policy.get_stats()['budget'] == 2
+
+
+def test_retryable_errors():
+    request = httpx.Request('POST', 'https://example.invalid/chat/completions')
+    assert RetryPolicy.is_retryable(api_error(429))
+    assert RetryPolicy.is_retryable(api_error(502))
+    assert RetryPolicy.is_retryable(openai.APIConnectionError(request=request))
+    assert RetryPolicy.is_retryable(openai.APITimeoutError(request=request))
+    assert RetryPolicy.is_retryable(asyncio.TimeoutError())
+    assert not RetryPolicy.is_retryable(api_error(400))
+    assert not RetryPolicy.is_retryable(api_error(401))
+    assert not RetryPolicy.is_retryable(ValueError('bug'))
+
+
+MESSAGES = [{'role': 'system', 'content': '翻译'}, {'role': 'user', 'content': '你好'}]
+
+
+def failing(errors, result='hello'):
+    """依次抛出errors中的异常，之后返回result"""
+    errors = list(errors)
+
+    def responder(messages):
+        if errors:
+            raise errors.pop(0)
+        return result
+    return responder
+
+
+def test_make_request_retries_transient_errors(make_translator):
+    translator, stub = make_translator(responder=failing([api_error(503), api_error(429)]),
+                                       retry_multiplier=0.001)
+    assert asyncio.run(translator._make_request(MESSAGES)) == 'hello'
+    assert len(stub.calls) == 3
+    assert translator.retry_policy.get_stats()['retries'] == 2
+
+
+def test_make_request_waits_retry_after(make_translator):
+    translator, stub = make_translator(responder=failing([api_error(429, {'retry-after-ms': '200'})]))
+    start = time.monotonic()
+    assert asyncio.run(translator._make_request(MESSAGES)) == 'hello'
+    assert time.monotonic() - start >= 0.2
+    assert len(stub.calls) == 2
+
+
+def test_make_request_respects_max_retries(make_translator):
+    translator, stub = make_translator(responder=failing([api_error(503)] * 5),
+                                       max_retries=2, retry_multiplier=0.001)
+    with pytest.raises(DoubaoAPIError):
+        asyncio.run(translator._make_request(MESSAGES))
+    assert len(stub.calls) == 3
+
+
+def test_make_request_stops_when_budget_exhausted(make_translator):
+    translator, stub = make_translator(responder=failing([api_error(503)] * 5), retry_multiplier=0.001,
+                                       retry_budget_ratio=0, retry_budget_burst=1)
+    with pytest.raises(DoubaoAPIError):
+        asyncio.run(translator._make_request(MESSAGES))
+    assert len(stub.calls) == 2
+    assert translator.retry_policy.get_stats()['budget_exhausted'] == 1
+
+
+@pytest.mark.parametrize('error', [
+    api_error(401),
+    # 消息中包含auth的其他API错误同样按认证失败处理
+    api_error(403, message='authorization denied'),
+    api_error(400),
+])
+def test_make_request_does_not_retry_client_errors(make_translator, error):
+    translator, stub = make_translator(responder=failing([error]), retry_multiplier=0.001)
+    # 认证失败在_make_request中被包装为DoubaoAPIError，并且不重试
+    with pytest.raises(DoubaoAPIError):
+        asyncio.run(translator._make_request(MESSAGES))
+    assert len(stub.calls) == 1
+    assert translator.retry_policy.get_stats()['retries'] == 0
@@ -0,0 +1,101 @@
+"""
+TextSegmenter和长文本分段翻译的离线测试
+"""
+import asyncio
+
+import pytest
+
+from conftest import StubCompletions
+from doubaotrans import TextSegmenter, _estimate_tokens
+
+TEXTS = [
+    ('zh', '今天天气很好。明天会下雨吗？我们出去走走吧！\n\n虽然今天天气很好，但是明天会下雨，所以我们今天出去。'),
+    ('ja', '今日は晴れです。明日は雨でしょう。「本当？」と彼は聞いた。'),
+    ('th', 'สวัสดีครับ ยินดีต้อนรับ ขอบคุณมาก ลาก่อนนะครับ'),
+    ('en', 'Hello world. This is a test!  Another one? Yes, it is: quite long, really.\n  Next paragraph.'),
+    ('en', 'x' * 97),
+    ('zh', '汉' * 31),
+]
+
+
+@pytest.mark.parametrize('lang,text', TEXTS)
+@pytest.mark.parametrize('max_tokens', [3, 8, 1000])
+def test_split_roundtrips(lang, text, max_tokens):
+    segments = TextSegmenter(max_tokens).split(text, lang)
+    assert ''.join(segments) == text
+    assert all(segments)
+    assert all(_estimate_tokens(segment) <= max_tokens for segment in segments)
+
+
+def test_zh_sentence_rule():
+    segments = TextSegmenter(8).split('今天天气很好。明天会下雨吗？我们出去走走吧！', 'zh')
+    assert segments == ['今天天气很好。', '明天会下雨吗？', '我们出去走走吧！']
+
+
+def test_zh_clause_rule_for_long_sentence():
+    segments = TextSegmenter(10).split('虽然今天天气很好，但是明天会下雨，所以我们今天出去。', 'zh')
+    assert segments == ['虽然今天天气很好，', '但是明天会下雨，', '所以我们今天出去。']
+
+
+def test_ja_sentence_rule_keeps_closing_quote():
+    segments = TextSegmenter(9).split('今日は晴れです。「本当ですか？」明日は雨。', 'ja')
+    assert segments == ['今日は晴れです。', '「本当ですか？」', '明日は雨。']
+
+
+def test_th_splits_on_spaces():
+    text = 'สวัสดีครับ ยินดีต้อนรับ ขอบคุณมาก'
+    segments = TextSegmenter(4).split(text, 'th')
+    assert segments == ['สวัสดีครับ ', 'ยินดีต้อนรับ ', 'ขอบคุณมาก']
+
+
+def test_default_sentence_and_clause_rules():
+    segmenter = TextSegmenter(4)
+    assert segmenter.split('One two three. Four five six!', 'en') == ['One two three. ', 'Four five six!']
+    assert segmenter.split('One two three, four five six.', 'en') == ['One two three, ', 'four five six.']
+
+
+def test_hard_split_without_punctuation():
+    assert TextSegmenter(5).split('a' * 100, 'en') == ['a' * 20] * 5
+    assert TextSegmenter(10).split('汉' * 30, 'zh') == ['汉' * 10] * 3
+    # CJK字符和其他字符混排时按令牌数切分，而不是按字符数均分
+    segments = TextSegmenter(3).split('汉汉abcdefgh汉汉', 'zh')
+    assert segments == ['汉汉abcd', 'efgh汉汉']
+    assert all(_estimate_tokens(segment) <= 3 for segment in segments)
+
+
+def test_auto_language_uses_cjk_rules():
+    segments = TextSegmenter(8).split('今天天气很好。明天会下雨吗？')
+    assert segments == ['今天天气很好。', '明天会下雨吗？']
+
+
+class DelayedCompletions(StubCompletions):
+    """按片段文本设置每次调用的耗时，并记录各段完成的顺序"""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = delays
+        self.finished = []
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        segment = messages[-1]['content'].splitlines()[-1]
+        self.delay = self.delays.get(segment, 0.0)
+        completion = await super().create(model, messages, stream=stream, **kwargs)
+        self.finished.append(segment)
+        return completion
+
+
+def test_segments_stitched_in_order_when_finishing_out_of_order(make_translator):
+    translator, _ = make_translator(segment_max_tokens=6)
+    sentences = ['First sentence here.', 'Second sentence here.', 'Third sentence here.']
+    completions = DelayedCompletions({sentences[0]: 0.15, sentences[1]: 0.1})
+    translator.client_manager.client.chat.completions = completions
+
+    result = asyncio.run(translator.doubao_translate(' '.join(sentences), dest='zh', src='en'))
+    assert completions.finished == sentences[::-1]
+    assert result.text == ' '.join(f'T({sentence})' for sentence in sentences)
+
+
+def test_segments_joined_with_space_for_spaced_target(make_translator):
+    translator, _ = make_translator(segment_max_tokens=8)
+    result = asyncio.run(translator.doubao_translate('今天天气很好。明天会下雨吗？', dest='en', src='zh'))
+    assert result.text == 'T(今天天气很好。) T(明天会下雨吗？)'
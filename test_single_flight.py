@@ -0,0 +1,155 @@
+"""
+SingleFlight合并并发调用的离线测试
+"""
+import asyncio
+
+from conftest import echo_responder
+from doubaotrans import DoubaoAPIError, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    executions = 0
+
+    async def work():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return 'done'
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do('key', work) for _ in range(5)))
+        return results, flight
+
+    results, flight = asyncio.run(run())
+    assert results == ['done'] * 5
+    assert executions == 1
+    assert flight.get_stats() == {'inflight': 0, 'calls': 1, 'shared': 4}
+
+
+def test_join_counts_shared_waiters():
+    async def run():
+        flight = SingleFlight()
+        assert flight.join('key') is None
+        future = flight.claim('key')
+        assert flight.join('key') is future
+        flight.resolve('key', 'value')
+        return await future, flight
+
+    value, flight = asyncio.run(run())
+    assert value == 'value'
+    assert flight.get_stats() == {'inflight': 0, 'calls': 1, 'shared': 1}
+
+
+def test_detect_batch_joins_inflight_detection(make_translator):
+    translator, stub = make_translator(delay=0.05, local_detection=False)
+
+    async def run():
+        single = asyncio.ensure_future(translator.doubao_detect('共享的检测文本'))
+        await asyncio.sleep(0)
+        batch = await translator.doubao_detect_batch(['共享的检测文本', '另一段文本'])
+        return await single, batch
+
+    single, batch = asyncio.run(run())
+    assert [d.lang for d in batch] == ['zh', 'zh']
+    assert single.lang == 'zh'
+    # 单独检测一次，批量检测只发送未在进行中的文本
+    assert len(stub.calls) == 2
+    assert translator._inflight.get_stats()['shared'] == 1
+
+
+def test_call_cancelled_only_when_all_waiters_cancel():
+    started = []
+    cancelled = []
+
+    async def work():
+        started.append(1)
+        try:
+            await asyncio.sleep(0.05)
+            return 'done'
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do('key', work))
+        second = asyncio.ensure_future(flight.do('key', work))
+        await asyncio.sleep(0.01)
+        # 取消其中一个等待者，另一个仍然得到结果
+        first.cancel()
+        assert await second == 'done'
+        assert not cancelled
+
+        third = asyncio.ensure_future(flight.do('key', work))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.sleep(0.01)
+        return flight
+
+    flight = asyncio.run(run())
+    assert len(started) == 2
+    # 唯一的等待者被取消后调用随之取消并移除
+    assert cancelled == [1]
+    assert len(flight) == 0
+
+
+def test_claimed_call_survives_cancelled_joiner():
+    async def run():
+        flight = SingleFlight()
+        future = flight.claim('key')
+        joiner = asyncio.ensure_future(flight.do('key', None))
+        await asyncio.sleep(0)
+        joiner.cancel()
+        await asyncio.sleep(0)
+        assert not future.done()
+        flight.resolve('key', 'value')
+        return await future
+
+    assert asyncio.run(run()) == 'value'
+
+
+def test_failed_translation_fans_out_error_once(make_translator):
+    def responder(messages):
+        raise ValueError('upstream failed')
+
+    translator, stub = make_translator(responder=responder, delay=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            *(translator.doubao_translate('同一段文本', dest='en', src='zh') for _ in range(5)),
+            return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+    # 只请求一次，错误传给所有等待者
+    assert len(stub.calls) == 1
+    assert all(isinstance(error, DoubaoAPIError) and 'upstream failed' in str(error) for error in errors)
+    assert translator._inflight.get_stats() == {'inflight': 0, 'calls': 1, 'shared': 4}
+
+    # 失败不会被缓存或保留，之后的调用重新请求
+    stub.responder = echo_responder
+    result = asyncio.run(translator.doubao_translate('同一段文本', dest='en', src='zh'))
+    assert result.text == 'T(同一段文本)'
+    assert len(stub.calls) == 2
+
+
+def test_detect_checks_cache_before_single_flight(make_translator):
+    translator, stub = make_translator(local_detection=False)
+
+    async def run():
+        first = await asyncio.gather(*(translator.doubao_detect('需要检测的文本') for _ in range(3)))
+        second = await translator.doubao_detect('需要检测的文本')
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(stub.calls) == 1
+    assert [d.lang for d in first] == ['zh'] * 3
+    assert second.lang == 'zh'
+    # 第二次直接命中缓存，不再进入single-flight
+    assert translator._inflight.get_stats()['calls'] == 1
+    assert translator.get_cache_stats()['hits'] >= 1
+
+    # 单条检测的结果与批量检测共用缓存
+    asyncio.run(translator.doubao_detect_batch(['需要检测的文本']))
+    assert len(stub.calls) == 1
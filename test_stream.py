@@ -0,0 +1,132 @@
+"""
+流式翻译的离线测试
+"""
+import asyncio
+from collections.abc import AsyncGenerator
+from types import SimpleNamespace
+
+import pytest
+
+from doubaotrans import DoubaoAPIError, StreamTranslator, _estimate_tokens
+
+
+def test_stream_yields_growing_prefixes(make_translator):
+    translator, _ = make_translator()
+
+    async def run():
+        stream = await translator.doubao_translate('你好，世界', dest='en', src='zh', stream=True)
+        return [result.text async for result in stream]
+
+    texts = asyncio.run(run())
+    assert texts[-1] == 'T(你好，世界)'
+    assert all(texts[-1].startswith(text) for text in texts)
+
+
+def test_stream_supports_async_generator_protocol(make_translator):
+    translator, _ = make_translator()
+
+    async def run():
+        stream = await translator.doubao_translate('你好，世界', dest='en', src='zh', stream=True)
+        assert isinstance(stream, StreamTranslator)
+        assert isinstance(stream, AsyncGenerator)
+        assert stream.__aiter__() is stream
+        first = await stream.asend(None)
+        second = await stream.__anext__()
+        await stream.aclose()
+        try:
+            await stream.__anext__()
+        except StopAsyncIteration:
+            closed = True
+        else:
+            closed = False
+        return first, second, closed
+
+    first, second, closed = asyncio.run(run())
+    assert second.text.startswith(first.text)
+    assert closed
+
+
+def test_stream_deltas_reassemble_translation(make_translator):
+    translator, _ = make_translator()
+
+    async def run():
+        stream = await translator.doubao_translate('你好，世界', dest='en', src='zh', stream=True, stream_deltas=True)
+        events = [event async for event in stream]
+        return events, stream
+
+    events, stream = asyncio.run(run())
+    assert ''.join(event.delta for event in events) == 'T(你好，世界)'
+    assert events[-1].finished and events[-1].usage['total_tokens'] == 15
+    assert stream.translated_text == 'T(你好，世界)'
+
+
+def stream_outcomes(translator):
+    return sorted(s['labels']['outcome'] for s in translator.metrics.registry.summaries(translator.metrics.REQUEST_DURATION))
+
+
+def test_completed_stream_records_metrics_once(make_translator):
+    translator, _ = make_translator()
+
+    async def run():
+        stream = await translator.doubao_translate('你好，世界', dest='en', src='zh', stream=True)
+        return [result async for result in stream]
+
+    asyncio.run(run())
+    assert translator.metrics.request_count == 1
+    assert stream_outcomes(translator) == ['success']
+    # 使用响应中报告的用量
+    assert translator.metrics.prompt_tokens == 10 and translator.metrics.completion_tokens == 5
+
+
+def test_abandoned_stream_still_records_metrics(make_translator):
+    translator, _ = make_translator()
+
+    async def run():
+        stream = await translator.doubao_translate('你好，世界', dest='en', src='zh', stream=True)
+        async for _ in stream:
+            break
+        await stream.aclose()
+        return stream
+
+    stream = asyncio.run(run())
+    assert translator.metrics.request_count == 1
+    assert stream_outcomes(translator) == ['cancelled']
+    # 被放弃的流不计为错误
+    assert translator.metrics.get_metrics()['error_rate'] == 0
+    # 没有收到用量分块时按提示词和已收到的译文估算
+    breakdown = translator.metrics.get_usage_breakdown()['operations']['translate']
+    assert breakdown['calls'] == 1 and breakdown['prompt_tokens'] > 0
+    assert breakdown['completion_tokens'] == _estimate_tokens(stream.translated_text)
+
+
+def test_failed_stream_records_error_once(make_translator):
+    translator, stub = make_translator()
+
+    class FailingStream:
+        closed = False
+
+        def __aiter__(self):
+            return self._iterate()
+
+        async def _iterate(self):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content='T('))], usage=None)
+            raise ConnectionError('stream interrupted')
+
+        async def close(self):
+            FailingStream.closed = True
+
+    async def create(model, messages, stream=False, **kwargs):
+        return FailingStream()
+
+    stub.create = create
+
+    async def run():
+        stream = await translator.doubao_translate('你好', dest='en', src='zh', stream=True)
+        with pytest.raises(DoubaoAPIError):
+            async for _ in stream:
+                pass
+
+    asyncio.run(run())
+    assert translator.metrics.request_count == 1
+    assert stream_outcomes(translator) == ['error']
+    assert FailingStream.closed
@@ -0,0 +1,103 @@
+"""
+请求阶段追踪的离线测试
+"""
+import asyncio
+
+from conftest import echo_responder
+from doubaotrans import CallbackTracer, NoOpTracer
+from test_retry import api_error, failing
+
+
+def traced_translator(make_translator, **kwargs):
+    spans = []
+    translator, stub = make_translator(tracer=CallbackTracer(spans.append), **kwargs)
+    return translator, stub, spans
+
+
+def test_stage_sequence_for_auto_detected_translation(make_translator):
+    translator, _, spans = traced_translator(make_translator, local_detection=False)
+    asyncio.run(translator.doubao_translate('你好，世界', dest='en'))
+
+    # 各阶段在结束时上报，外层阶段排在其内部阶段之后
+    assert [span.stage for span in spans] == [
+        'cache',
+        'cache', 'rate_limit', 'concurrency', 'network', 'detect',
+        'rate_limit', 'concurrency', 'network',
+    ]
+    # 检测、缓存查询和网络调用属于同一次翻译，共享一个request_id
+    assert len({span.request_id for span in spans}) == 1
+    assert spans[0].request_id is not None
+
+    assert [span.attributes['hit'] for span in spans if span.stage == 'cache'] == [False, False]
+    detect = spans[5]
+    assert detect.attributes['source'] == 'api'
+    assert [span.attributes['operation'] for span in spans if span.stage == 'network'] == ['detect', 'translate']
+    assert spans[-1].attributes['lang_pair'] == 'zh->en'
+    assert all(span.duration >= 0 and span.error is None for span in spans)
+
+
+def test_cache_hit_has_no_network_span(make_translator):
+    translator, stub, spans = traced_translator(make_translator)
+
+    async def run():
+        await translator.doubao_translate('你好', dest='en', src='zh')
+        spans.clear()
+        await translator.doubao_translate('你好', dest='en', src='zh')
+
+    asyncio.run(run())
+    assert len(stub.calls) == 1
+    assert [span.stage for span in spans] == ['cache']
+    assert spans[0].attributes['hit'] is True
+
+
+def test_separate_calls_get_separate_request_ids(make_translator):
+    translator, _, spans = traced_translator(make_translator)
+
+    async def run():
+        await asyncio.gather(
+            translator.doubao_translate('第一句', dest='en', src='zh'),
+            translator.doubao_translate('第二句', dest='en', src='zh'),
+        )
+
+    asyncio.run(run())
+    network = [span for span in spans if span.stage == 'network']
+    assert len(network) == 2
+    assert network[0].request_id != network[1].request_id
+    for span in network:
+        # 每个请求ID下都有完整的缓存、限流、并发和网络阶段
+        stages = [s.stage for s in spans if s.request_id == span.request_id]
+        assert stages == ['cache', 'rate_limit', 'concurrency', 'network']
+
+
+def test_retry_span_and_failed_network_span(make_translator):
+    translator, _, spans = traced_translator(make_translator, responder=failing([api_error(503)]),
+                                             retry_multiplier=0.001)
+    asyncio.run(translator.doubao_translate('你好', dest='en', src='zh'))
+    stages = [span.stage for span in spans]
+    assert stages == ['cache', 'rate_limit', 'concurrency', 'network', 'retry',
+                      'rate_limit', 'concurrency', 'network']
+    assert spans[3].error is not None and spans[-1].error is None
+    assert spans[4].attributes['attempt'] == 1
+    assert len({span.request_id for span in spans}) == 1
+
+
+def test_glossary_spans(make_translator):
+    translator, _, spans = traced_translator(make_translator)
+    translator.add_term('ai', {'en': 'AI', 'zh': '人工智能'})
+    asyncio.run(translator.translate_batch(['人工智能'], dest='en', src='zh', use_glossary=True))
+    glossary = [span.attributes['action'] for span in spans if span.stage == 'glossary']
+    assert glossary == ['match', 'enforce']
+
+
+def test_callback_errors_do_not_break_translation(make_translator):
+    def broken(span):
+        raise RuntimeError('callback failed')
+
+    translator, _ = make_translator(tracer=CallbackTracer(broken))
+    result = asyncio.run(translator.doubao_translate('你好', dest='en', src='zh'))
+    assert result.text == 'T(你好)'
+
+
+def test_default_tracer_is_noop(make_translator):
+    translator, _ = make_translator(responder=echo_responder)
+    assert isinstance(translator.tracer, NoOpTracer)
@@ -0,0 +1,97 @@
+"""
+token用量、费用估算和分操作统计的离线测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import StubCompletions, echo_responder
+from doubaotrans import _usage_to_dict
+
+MODEL = 'test-model'
+PRICES = {MODEL: {'prompt': 0.8, 'completion': 2.0, 'cached': 0.16}}
+
+
+def test_estimate_cost(make_translator):
+    translator, _ = make_translator(model_name=MODEL, model_prices=PRICES)
+    usage = {'prompt_tokens': 1000, 'completion_tokens': 500, 'cached_tokens': 0}
+    assert translator._estimate_cost(usage) == pytest.approx(0.8 + 1.0)
+    # 命中前缀缓存的输入token按缓存单价计算
+    usage['cached_tokens'] = 600
+    assert translator._estimate_cost(usage) == pytest.approx(0.4 * 0.8 + 0.6 * 0.16 + 1.0)
+
+
+def test_cached_price_defaults_to_prompt_price(make_translator):
+    translator, _ = make_translator(model_name=MODEL, model_prices={MODEL: {'prompt': 1.0, 'completion': 3.0}})
+    usage = {'prompt_tokens': 2000, 'completion_tokens': 1000, 'cached_tokens': 1500}
+    assert translator._estimate_cost(usage) == pytest.approx(2.0 + 3.0)
+
+
+def test_unpriced_model_costs_nothing(make_translator):
+    translator, _ = make_translator(model_name='other-model', model_prices=PRICES)
+    assert translator._estimate_cost({'prompt_tokens': 1000, 'completion_tokens': 1000}) == 0.0
+    translator, _ = make_translator(model_name=MODEL)
+    assert translator._estimate_cost({'prompt_tokens': 1000, 'completion_tokens': 1000}) == 0.0
+
+
+def test_usage_to_dict_reads_cached_tokens():
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=64))
+    assert _usage_to_dict(usage) == {'prompt_tokens': 100, 'completion_tokens': 20,
+                                     'total_tokens': 120, 'cached_tokens': 64}
+    usage.prompt_tokens_details = {'cached_tokens': 32}
+    assert _usage_to_dict(usage)['cached_tokens'] == 32
+    usage.prompt_tokens_details = None
+    assert _usage_to_dict(usage)['cached_tokens'] == 0
+
+
+class CachedUsageCompletions(StubCompletions):
+    """每次调用报告100个输入token（其中40个命中缓存）和20个输出token"""
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        completion = await super().create(model, messages, stream=stream, **kwargs)
+        completion.usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120,
+                                           prompt_tokens_details=SimpleNamespace(cached_tokens=40))
+        return completion
+
+
+def test_usage_breakdown_by_operation_and_lang_pair(make_translator):
+    translator, _ = make_translator(model_name=MODEL, model_prices=PRICES, local_detection=False)
+    translator.client_manager.client.chat.completions = CachedUsageCompletions(echo_responder)
+
+    async def run():
+        await translator.doubao_translate('你好', dest='en', src='zh')
+        await translator.doubao_translate('世界', dest='en', src='zh')
+        await translator.doubao_translate('再见', dest='ja', src='zh')
+        await translator.doubao_detect('这是什么语言')
+
+    asyncio.run(run())
+    call_cost = (60 * 0.8 + 40 * 0.16 + 20 * 2.0) / 1000
+    breakdown = translator.metrics.get_usage_breakdown()
+
+    translate = breakdown['operations']['translate']
+    assert translate == pytest.approx({'calls': 3, 'prompt_tokens': 300, 'completion_tokens': 60,
+                                       'cached_tokens': 120, 'cost': 3 * call_cost})
+    assert breakdown['operations']['detect']['calls'] == 1
+    assert breakdown['lang_pairs']['zh->en']['calls'] == 2
+    assert breakdown['lang_pairs']['zh->ja']['cost'] == pytest.approx(call_cost)
+    # 检测请求没有语言对
+    assert sum(entry['calls'] for entry in breakdown['lang_pairs'].values()) == 3
+    assert translator.metrics.cost == pytest.approx(4 * call_cost)
+
+    # 返回的是副本，修改不影响内部统计
+    translate['calls'] = 0
+    assert translator.metrics.get_usage_breakdown()['operations']['translate']['calls'] == 3
+
+
+def test_usage_exported_to_prometheus(make_translator):
+    translator, _ = make_translator(model_name=MODEL, model_prices=PRICES)
+    asyncio.run(translator.doubao_translate('你好', dest='en', src='zh'))
+    exported = translator.metrics.to_prometheus()
+    assert 'doubao_tokens_total{lang_pair="zh->en",operation="translate",type="prompt"} 10' in exported
+    assert 'doubao_tokens_total{lang_pair="zh->en",operation="translate",type="completion"} 5' in exported
+    # 没有缓存命中时不导出cached
+    assert 'type="cached"' not in exported
+    cost = (10 * 0.8 + 5 * 2.0) / 1000
+    assert f'doubao_cost_total{{lang_pair="zh->en",operation="translate"}} {cost}' in exported
@@ -0,0 +1,114 @@
+"""
+工作队列的单项超时、重试、进度报告和取消的离线测试
+"""
+import asyncio
+
+from doubaotrans import BatchProcessor
+from test_document import rolling_responder
+
+
+def test_item_timeout_marks_item_failed():
+    async def work(item):
+        await asyncio.sleep(1 if item == 'slow' else 0)
+        return item.upper()
+
+    async def run():
+        processor = BatchProcessor(max_workers=2, batch_size=10, item_timeout=0.05)
+        results = await processor.process(['a', 'slow', 'b'], work)
+        return results, processor.errors
+
+    results, errors = asyncio.run(run())
+    assert results == ['A', None, 'B']
+    assert isinstance(errors[1], asyncio.TimeoutError)
+
+
+def test_item_retries_until_success():
+    attempts = {}
+
+    async def flaky(item):
+        attempts[item] = attempts.get(item, 0) + 1
+        if attempts[item] < 3:
+            raise RuntimeError('temporary')
+        return item
+
+    async def run(retries):
+        processor = BatchProcessor(max_workers=1, batch_size=10, item_retries=retries)
+        return await processor.process(['x'], flaky), processor.errors
+
+    results, errors = asyncio.run(run(2))
+    assert results == ['x'] and not errors
+    assert attempts['x'] == 3
+
+    attempts.clear()
+    results, errors = asyncio.run(run(1))
+    assert results == [None] and isinstance(errors[0], RuntimeError)
+    assert attempts['x'] == 2
+
+
+def test_retry_after_timeout():
+    calls = []
+
+    async def slow_once(item):
+        calls.append(item)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return item
+
+    async def run():
+        processor = BatchProcessor(max_workers=1, batch_size=10, item_timeout=0.05, item_retries=1)
+        return await processor.process(['y'], slow_once)
+
+    assert asyncio.run(run()) == ['y']
+    assert len(calls) == 2
+
+
+def test_progress_callback_reports_every_item():
+    progress = []
+
+    async def run():
+        processor = BatchProcessor(max_workers=3, batch_size=10, progress_callback=lambda d, t: progress.append((d, t)))
+        return await processor.process(list(range(5)), identity)
+
+    async def identity(item):
+        return item
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert progress == [(i, 5) for i in range(1, 6)]
+
+
+def test_progress_callback_returning_false_cancels_remaining():
+    processed = []
+
+    async def work(item):
+        processed.append(item)
+        return item
+
+    async def stop_after_two(done, total):
+        return done < 2
+
+    async def run():
+        processor = BatchProcessor(max_workers=1, batch_size=10, progress_callback=stop_after_two)
+        results = await processor.process(list(range(6)), work)
+        return results, processor
+
+    results, processor = asyncio.run(run())
+    assert processor.cancelled
+    assert processed == [0, 1]
+    assert results == [0, 1, None, None, None, None]
+    assert processor.queue.empty()
+
+
+def test_document_progress_callback_cancels_remaining_paragraphs(make_translator):
+    translator, stub = make_translator(responder=rolling_responder)
+    paragraphs = [f'第{i}段。' for i in range(6)]
+
+    # rolling模式按顺序逐块翻译，第一块完成后回调返回False
+    results = asyncio.run(translator.translate_document_with_context(
+        paragraphs, dest='en', src='zh', batch_size=2, mode='rolling',
+        progress_callback=lambda done, total: done < 2
+    ))
+
+    assert len(stub.calls) == 1
+    assert [r.text for r in results[:2]] == ['T(第0段。)', 'T(第1段。)']
+    assert all(r.text == 'Translation failed: cancelled' for r in results[2:])
+    assert [r.origin for r in results] == paragraphs